@@ -1,10 +1,26 @@
 import os
+import sys
 import json
-from flask import Flask, request, jsonify
+import time
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-from backend.agent import WebAgent
-from backend.utils import tavily_tool_wrapper, aggregate_and_summarize
-from tavily import TavilyClient
+from backend.tavily_gateway import get_tavily_gateway
+from backend.providers import provider_stats
+from backend.prompt_cache import prompt_cache_stats
+from backend.cache import cache_stats
+from backend.http_pool import http_pool_stats
+from backend.cassettes import cassette_stats
+from backend.metrics import CONTENT_TYPE, render_metrics, record_error, record_request
+from backend.tracing import TRACE_HEADER, TRACE_DEBUG_ENABLED, begin_trace, end_trace, current_trace
+from backend.accounting import begin_account, end_account, current_account, add_stage
+from backend.diagnostics import PROFILE_HEADER, capture_slow_request, profile_requested, RequestProfiler
+from backend.query_log import normalize_query, log_query, query_log_stats
+from backend.ratelimit import key_pool_stats
+from backend.admission import admission_controller, AdmissionRejected
+from backend.pipeline import SEARCH_MODES, run_search, execute_search
+from backend.jobs import JobManager, create_job_store
+from backend.batch import parse_batch, run_batch
+from backend.warmup import warmup_mode, warm_up, start_background_warmup, warmup_state
 from dotenv import load_dotenv
 
 # Загрузка переменных окружения
@@ -21,22 +37,224 @@ CORS(app, resources={
             "http://bootcamp2025.tarassov.me:8000"
         ],
         "methods": ["POST", "GET", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
+        "allow_headers": ["Content-Type", "X-Trace-Id"],
+        "expose_headers": ["X-Trace-Id", "Server-Timing"]
+    },
+    r"/jobs*": {
+        "origins": [
+            "http://localhost", 
+            "http://localhost:80", 
+            "http://localhost:8000",
+            "http://bootcamp2025.tarassov.me", 
+            "http://bootcamp2025.tarassov.me:8000"
+        ],
+        "methods": ["POST", "GET", "OPTIONS"],
+        "allow_headers": ["Content-Type", "X-Trace-Id"],
+        "expose_headers": ["X-Trace-Id", "Server-Timing"]
     },
     r"/health": {
         "origins": "*"
     }
 })
 
-# Инициализация Tavily клиента
-tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+# Общий шлюз Tavily: предохранитель и отдача последних сохранённых результатов
+tavily_client = get_tavily_gateway()
+
+# Фоновые задания для долгих запросов (POST /jobs, GET /jobs/<id>)
+job_manager = JobManager(
+    create_job_store(),
+    execute_search,
+    workers=int(os.getenv("JOB_WORKERS", "4")),
+    ttl=float(os.getenv("JOB_TTL", "3600")),
+    capacity_wait=float(os.getenv("JOB_CAPACITY_WAIT", "600")),
+    stale_after=float(os.getenv("JOB_STALE_AFTER", "60"))
+)
+
+# Максимальное время ожидания изменения задания в long-poll, секунды
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "30"))
+
+# Служебные эндпоинты не трассируются
+UNTRACED_PATHS = ("/health", "/metrics")
+
+
+@app.before_request
+def start_request_trace():
+    """Трасса запроса: идентификатор из заголовка X-Trace-Id или новый"""
+    if request.path not in UNTRACED_PATHS:
+        g.trace_state = begin_trace(f"{request.method} {request.path}",
+                                    trace_id=request.headers.get(TRACE_HEADER))
+
+
+# Учёт времени по этапам и ресурсов ведётся для синхронных эндпоинтов поиска
+ACCOUNTED_PATHS = ("/search/fast", "/search/deep", "/search/social",
+                   "/search/academic", "/search/finance", "/search/auto")
+
+
+@app.before_request
+def start_request_account():
+    if request.path not in ACCOUNTED_PATHS:
+        return
+    g.account_token = begin_account()
+    # CPU-профиль запроса по заголовку администратора или по выборке
+    if profile_requested(request.headers.get(PROFILE_HEADER)):
+        trace = current_trace()
+        profiler = RequestProfiler(trace.trace_id if trace else str(int(time.time() * 1000)))
+        if profiler.start():
+            g.profiler = profiler
+
+
+@app.after_request
+def capture_diagnostics(response):
+    """
+    Сохранить длительность запроса в метриках, профиль запроса, контекст
+    медленного запроса (порог по режиму) и запись журнала запросов
+    """
+    account = current_account()
+    if account is None:
+        return response
+    profiler = g.pop("profiler", None)
+    profile = profiler.stop() if profiler else None
+    if profile:
+        response.headers["X-Profile-Id"] = profiler.profile_id
+
+    body = response.get_json(silent=True) if response.is_json else None
+    body = body if isinstance(body, dict) else {}
+    data = request.get_json(silent=True)
+    data = data if isinstance(data, dict) else {}
+    requested_mode = request.path.rsplit("/", 1)[-1]
+    trace = current_trace()
+    elapsed = time.monotonic() - account.started
+    record_request(elapsed, mode=account.labels.get("mode", body.get("mode_selected", requested_mode)),
+                   model=account.labels.get("model", ""))
+    timings = account.timings()
+    routing = {key: body[key] for key in ("mode_selected", "mode_requested", "degraded", "degraded_reason")
+               if key in body} or None
+    capture_slow_request({
+        "path": request.path,
+        "trace_id": trace.trace_id if trace else None,
+        "query": data.get("query"),
+        "mode": body.get("mode_selected", requested_mode),
+        "routing": routing,
+        "status": response.status_code,
+        "elapsed": elapsed,
+        "timings": timings,
+        "agent_steps": trace.tree() if trace else None,
+        "profile": profile
+    })
+    breakdown = account.breakdown()
+    log_query({
+        # Время поступления запроса: по нему loadtest воспроизводит интервалы между запросами
+        "timestamp": time.time() - elapsed,
+        "trace_id": trace.trace_id if trace else None,
+        "endpoint": requested_mode,
+        "query": normalize_query(data.get("query")),
+        "mode": body.get("mode_selected", requested_mode),
+        "routing": routing,
+        "status": response.status_code,
+        "error": body.get("error") if response.status_code >= 400 else None,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        **timings,
+        "tool_calls": breakdown.get("tool_calls", {}),
+        "cache": breakdown.get("cache", {})
+    })
+    return response
+
+
+@app.after_request
+def attach_server_timing(response):
+    """Server-Timing: время этапов (route, agent, tools, sources, summarize, serialize) и счётчики ресурсов"""
+    account = current_account()
+    if account is not None:
+        response.headers["Server-Timing"] = account.server_timing()
+    return response
+
+
+@app.teardown_request
+def finish_request_account(error=None):
+    token = g.pop("account_token", None)
+    if token is not None:
+        end_account(token)
+
+
+def timings_requested() -> bool:
+    """Поле timings в ответе запрашивается параметром ?timings=1 или "timings": true в теле"""
+    if request.args.get("timings") in ("1", "true"):
+        return True
+    data = request.get_json(silent=True)
+    return isinstance(data, dict) and data.get("timings") is True
+
+
+def search_response(result: dict) -> Response:
+    """JSON-ответ поиска с учётом времени сериализации и (по запросу) полем timings"""
+    start = time.monotonic()
+    response = jsonify(result)
+    add_stage("serialize", time.monotonic() - start)
+    account = current_account()
+    if account is not None and timings_requested():
+        response = jsonify({**result, "timings": account.timings()})
+    return response
+
+
+@app.after_request
+def attach_trace(response):
+    """Идентификатор трассы в заголовке ответа; с ?debug=trace - дерево спанов в теле"""
+    trace = current_trace()
+    if trace is None:
+        return response
+    response.headers[TRACE_HEADER] = trace.trace_id
+    if TRACE_DEBUG_ENABLED and request.args.get("debug") == "trace" and response.is_json:
+        body = response.get_json(silent=True)
+        if isinstance(body, dict):
+            body["trace"] = {"trace_id": trace.trace_id, "spans": trace.tree()}
+            response.set_data(json.dumps(body, ensure_ascii=False))
+    return response
+
+
+@app.teardown_request
+def finish_request_trace(error=None):
+    """Завершить трассу и передать спаны экспортёру"""
+    end_trace(g.pop("trace_state", None), error)
+
 
 @app.route('/health')
 def health():
-    """Проверка состояния сервиса"""
-    return jsonify({"status": "healthy"})
+    """Проверка состояния сервиса и прогрева (pending, running, done, failed)"""
+    return jsonify({"status": "healthy", "warmup": warmup_state()["status"]})
+
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(e):
+    """Перегрузка: 429 при заполненной очереди, 503 при истечении срока ожидания"""
+    record_error(e, "admission", mode=e.mode)
+    response = jsonify({"error": e.reason, "mode": e.mode, "retry_after": e.retry_after})
+    response.status_code = e.status
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+@app.route('/stats')
+def stats():
+    """Состояние апстримов (предохранители, хеджирование, API-ключи, кэши, пулы соединений) и очередей допуска"""
+    return jsonify({
+        "tavily": tavily_client.stats(),
+        "llm": provider_stats(),
+        "prompt_cache": prompt_cache_stats(),
+        "caches": cache_stats(),
+        "http_pools": http_pool_stats(),
+        "cassette": cassette_stats(),
+        "query_log": query_log_stats(),
+        "rate_limits": key_pool_stats(),
+        "admission": admission_controller.stats(),
+        "warmup": warmup_state()
+    })
+
+
+@app.route('/metrics')
+def metrics():
+    """Метрики процесса в формате Prometheus: задержки этапов поиска, инструменты, токены, кэши, ошибки"""
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
 
 @app.route('/search/fast', methods=['POST'])
+@admission_controller.limit("fast")
 def fast_search():
     """
     Быстрый поиск - базовый поиск с минимальной обработкой
@@ -48,27 +266,12 @@ def fast_search():
         return jsonify({"error": "Query is required"}), 400
     
     try:
-        # Использование агента для быстрого поиска
-        agent = WebAgent(model_type=os.getenv("MODEL_TYPE", "openai"))
-        result = agent.run(query, mode="fast")
-        
-        # Получение источников через Tavily search
-        search_results = tavily_client.search(query, max_results=3)
-        sources = []
-        if 'results' in search_results:
-            sources = [
-                {"title": r.get('title', ''), "url": r.get('url', '')} 
-                for r in search_results['results']
-            ]
-        
-        return jsonify({
-            "response": result["response"],
-            "sources": sources
-        })
+        return search_response(run_search(query, mode="fast"))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/search/deep', methods=['POST'])
+@admission_controller.limit("deep")
 def deep_search():
     """
     Глубокий анализ - продвинутый режим с многошаговым рассуждением
@@ -80,46 +283,12 @@ def deep_search():
         return jsonify({"error": "Query is required"}), 400
     
     try:
-        # Использование агента для глубокого анализа
-        agent = WebAgent(model_type=os.getenv("MODEL_TYPE", "openai"))
-        result = agent.run(query, mode="deep")
-        
-        # Получение расширенных источников через Tavily search
-        search_results = tavily_client.search(
-            query, 
-            max_results=5,
-            include_raw_content=True
-        )
-        
-        # Агрегация и суммирование результатов
-        sources = []
-        contents = []
-        if 'results' in search_results:
-            for r in search_results['results']:
-                sources.append({
-                    "title": r.get('title', ''), 
-                    "url": r.get('url', ''),
-                    "score": r.get('score', 0)
-                })
-                if r.get('raw_content'):
-                    contents.append(r['raw_content'])
-        
-        # Создание расширенного ответа с суммированием
-        if contents:
-            summary = aggregate_and_summarize(query, contents, tavily_client)
-            response_text = summary
-        else:
-            response_text = result["response"]
-        
-        return jsonify({
-            "response": response_text,
-            "sources": sources,
-            "fact_check_notes": "Проверка фактов выполнена с использованием нескольких источников"
-        })
+        return search_response(run_search(query, mode="deep"))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/search/social', methods=['POST'])
+@admission_controller.limit("social")
 def social_search():
     """
     Социальный анализ - анализ мнений с Reddit, X, VK, Habr
@@ -131,34 +300,12 @@ def social_search():
         return jsonify({"error": "Query is required"}), 400
     
     try:
-        # Использование агента для социального анализа
-        agent = WebAgent(model_type=os.getenv("MODEL_TYPE", "openai"))
-        result = agent.run(query, mode="social")
-        
-        # Получение источников социальных сетей через Tavily search
-        search_results = tavily_client.search(
-            query,
-            max_results=5,
-            include_domains=["reddit.com", "twitter.com", "x.com", "vk.com", "habr.com"],
-            time_range="week"
-        )
-        
-        sources = []
-        if 'results' in search_results:
-            sources = [
-                {"title": r.get('title', ''), "url": r.get('url', '')} 
-                for r in search_results['results']
-            ]
-        
-        return jsonify({
-            "response": result["response"],
-            "sources": sources,
-            "analysis_type": "social_media_analysis"
-        })
+        return search_response(run_search(query, mode="social"))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/search/academic', methods=['POST'])
+@admission_controller.limit("academic")
 def academic_search():
     """
     Академический поиск - поиск в arXiv / Semantic Scholar
@@ -170,34 +317,12 @@ def academic_search():
         return jsonify({"error": "Query is required"}), 400
     
     try:
-        # Использование агента для академического поиска
-        agent = WebAgent(model_type=os.getenv("MODEL_TYPE", "openai"))
-        result = agent.run(query, mode="academic")
-        
-        # Получение академических источников через Tavily search
-        search_results = tavily_client.search(
-            query,
-            max_results=5,
-            include_domains=["arxiv.org", "semanticscholar.org"],
-            time_range="year"
-        )
-        
-        sources = []
-        if 'results' in search_results:
-            sources = [
-                {"title": r.get('title', ''), "url": r.get('url', '')} 
-                for r in search_results['results']
-            ]
-        
-        return jsonify({
-            "response": result["response"],
-            "sources": sources,
-            "analysis_type": "academic_research"
-        })
+        return search_response(run_search(query, mode="academic"))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/search/finance', methods=['POST'])
+@admission_controller.limit("finance")
 def finance_search():
     """
     Финансовый анализ - данные из Yahoo Finance / TradingView
@@ -209,31 +334,7 @@ def finance_search():
         return jsonify({"error": "Query is required"}), 400
     
     try:
-        # Использование агента для финансового анализа
-        agent = WebAgent(model_type=os.getenv("MODEL_TYPE", "openai"))
-        result = agent.run(query, mode="finance")
-        
-        # Получение финансовых источников через Tavily search
-        search_results = tavily_client.search(
-            query,
-            max_results=5,
-            topic="finance",
-            include_domains=["finance.yahoo.com", "bloomberg.com", "reuters.com"],
-            time_range="day"
-        )
-        
-        sources = []
-        if 'results' in search_results:
-            sources = [
-                {"title": r.get('title', ''), "url": r.get('url', '')} 
-                for r in search_results['results']
-            ]
-        
-        return jsonify({
-            "response": result["response"],
-            "sources": sources,
-            "analysis_type": "financial_analysis"
-        })
+        return search_response(run_search(query, mode="finance"))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -250,84 +351,87 @@ def auto_search():
         return jsonify({"error": "Query is required"}), 400
     
     try:
-        # Определение подходящего режима поиска
-        router_agent = WebAgent(model_type=os.getenv("MODEL_TYPE", "openai"))
-        selected_mode = router_agent.route_query(query)
-        
-        # Выполнение поиска в выбранном режиме
-        agent = WebAgent(model_type=os.getenv("MODEL_TYPE", "openai"))
-        result = agent.run(query, mode=selected_mode)
-        
-        # Получение источников в зависимости от режима
-        search_params = {
-            "max_results": 5
-        }
-        
-        # Настройка параметров поиска в зависимости от режима
-        if selected_mode == "social":
-            search_params.update({
-                "include_domains": ["reddit.com", "twitter.com", "x.com", "vk.com", "habr.com"],
-                "time_range": "week"
-            })
-        elif selected_mode == "academic":
-            search_params.update({
-                "include_domains": ["arxiv.org", "semanticscholar.org"],
-                "time_range": "year"
-            })
-        elif selected_mode == "finance":
-            search_params.update({
-                "topic": "finance",
-                "include_domains": ["finance.yahoo.com", "bloomberg.com", "reuters.com"],
-                "time_range": "day"
-            })
-        elif selected_mode == "deep":
-            search_params.update({
-                "include_raw_content": True
-            })
-        
-        # Выполнение поиска для получения источников
-        search_results = tavily_client.search(query, **search_params)
-        
-        # Обработка источников
-        sources = []
-        contents = []
-        if 'results' in search_results:
-            for r in search_results['results']:
-                sources.append({
-                    "title": r.get('title', ''),
-                    "url": r.get('url', ''),
-                    "score": r.get('score', 0)
-                })
-                if r.get('raw_content') and selected_mode == "deep":
-                    contents.append(r['raw_content'])
-        
-        # Для глубокого анализа агрегируем и суммируем результаты
-        if selected_mode == "deep" and contents:
-            summary = aggregate_and_summarize(query, contents, tavily_client)
-            response_text = summary
-        else:
-            response_text = result["response"]
-        
-        # Подготовка ответа
-        response_data = {
-            "response": response_text,
-            "sources": sources,
-            "mode_selected": selected_mode
-        }
-        
-        # Добавляем специфичные для режима поля
-        if selected_mode == "deep":
-            response_data["fact_check_notes"] = "Проверка фактов выполнена с использованием нескольких источников"
-        elif selected_mode == "social":
-            response_data["analysis_type"] = "social_media_analysis"
-        elif selected_mode == "academic":
-            response_data["analysis_type"] = "academic_research"
-        elif selected_mode == "finance":
-            response_data["analysis_type"] = "financial_analysis"
-        
-        return jsonify(response_data)
+        # Маршрутизация (под нагрузкой deep понижается до fast или ограничивается
+        # по бюджету инструментов) и выполнение в выбранном режиме
+        return search_response(execute_search(query, mode="auto"))
+    except AdmissionRejected:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
+@app.route('/search/batch', methods=['POST'])
+def batch_search():
+    """
+    Пакетный поиск - список запросов выполняется параллельно,
+    результаты отдаются потоком NDJSON по мере готовности
+    """
+    data = request.get_json()
+    
+    try:
+        batch = parse_batch(data or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    def generate():
+        for line in run_batch(batch["items"], batch["concurrency"]):
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Фоновое задание поиска - ответ сразу с идентификатором задания,
+    результат забирается через GET /jobs/<id>
+    """
+    data = request.get_json()
+    query = data.get('query')
+    mode = data.get('mode', 'deep')
+    
+    if not query:
+        return jsonify({"error": "Query is required"}), 400
+    if mode not in SEARCH_MODES + ("auto",):
+        return jsonify({"error": f"Unknown mode: {mode}"}), 400
+    
+    job = job_manager.submit(query, mode)
+    response = jsonify({
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/jobs/{job['id']}"
+    })
+    response.status_code = 202
+    response.headers["Location"] = f"/jobs/{job['id']}"
+    return response
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Статус и результат фонового задания
+
+    Параметры long-poll: wait - сколько секунд ждать изменения (не более JOB_MAX_WAIT),
+    version - последняя известная клиенту версия задания
+    """
+    wait = min(request.args.get('wait', 0, type=float), JOB_MAX_WAIT)
+    version = request.args.get('version', -1, type=int)
+    
+    job = job_manager.get(job_id, wait=wait, version=version)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    return jsonify(job)
+
 if __name__ == '__main__':
+    # Отчёт о холодном старте: python app.py --startup-report [--json] [--no-warmup]
+    if "--startup-report" in sys.argv:
+        from backend.startup import main
+        sys.exit(main([arg for arg in sys.argv[1:] if arg != "--startup-report"]))
+    
+    if warmup_mode() == "background":
+        start_background_warmup()
+    elif warmup_mode() == "sync":
+        warm_up()
+    
+    # Сервер разработки; в продакшене: gunicorn -c gunicorn.conf.py wsgi:app
     app.run(host='0.0.0.0', port=8000, debug=True)
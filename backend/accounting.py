@@ -0,0 +1,123 @@
+import time
+import threading
+import contextvars
+from collections import defaultdict
+from typing import Dict, Any, Optional
+
+# Этапы запроса в порядке вывода в Server-Timing
+STAGES = ("route", "agent", "tools", "sources", "summarize", "serialize")
+
+# Счётчики ресурсов запроса
+COUNTERS = ("llm_calls", "tokens_in", "tokens_out", "tavily_calls", "bytes_fetched")
+
+
+class RequestAccount:
+    """
+    Учёт времени по этапам и расходованных ресурсов одного запроса
+
+    Время этапа - сумма длительностей его шагов; параллельные вызовы
+    инструментов складываются, поэтому tools может превышать время запроса.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages: Dict[str, float] = defaultdict(float)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.breakdowns: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        # Метки поиска (mode, model) для метрик уровня запроса
+        self.labels: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] += seconds
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def tally(self, group: str, key: str, amount: int = 1):
+        """Счётчик с разбивкой: вызовы по инструментам (tool_calls), исходы кэшей (cache)"""
+        with self._lock:
+            self.breakdowns[group][key] += amount
+
+    def breakdown(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {group: dict(values) for group, values in self.breakdowns.items()}
+
+    def timings(self) -> Dict[str, Any]:
+        """Время этапов (мс), общее время и счётчики ресурсов"""
+        with self._lock:
+            stages = {name: round(self.stages[name] * 1000, 1) for name in STAGES if name in self.stages}
+            counters = {name: self.counters.get(name, 0) for name in COUNTERS}
+        return {
+            "stages_ms": stages,
+            "total_ms": round((time.monotonic() - self.started) * 1000, 1),
+            **counters
+        }
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing: длительность этапов и счётчики в desc"""
+        timings = self.timings()
+        entries = [f"{name};dur={value}" for name, value in timings["stages_ms"].items()]
+        entries.append(f"total;dur={timings['total_ms']}")
+        entries.extend(f'{name};desc="{timings[name]}"' for name in COUNTERS)
+        return ", ".join(entries)
+
+
+_account: contextvars.ContextVar = contextvars.ContextVar("request_account", default=None)
+
+
+def begin_account() -> contextvars.Token:
+    """Начать учёт ресурсов запроса в текущем контексте"""
+    return _account.set(RequestAccount())
+
+
+def end_account(token: contextvars.Token):
+    _account.reset(token)
+
+
+def current_account() -> Optional[RequestAccount]:
+    return _account.get()
+
+
+def add_stage(name: str, seconds: float):
+    """Добавить время этапа к учёту текущего запроса (вне запроса ничего не делает)"""
+    account = _account.get()
+    if account is not None:
+        account.add_stage(name, seconds)
+
+
+def count(name: str, amount: int = 1):
+    """Увеличить счётчик ресурса текущего запроса (вне запроса ничего не делает)"""
+    account = _account.get()
+    if account is not None:
+        account.count(name, amount)
+
+
+def tally(group: str, key: str, amount: int = 1):
+    """Увеличить счётчик с разбивкой в учёте текущего запроса (вне запроса ничего не делает)"""
+    account = _account.get()
+    if account is not None:
+        account.tally(group, key, amount)
+
+
+def label(**labels: str):
+    """Запомнить метки поиска в учёте текущего запроса (вне запроса ничего не делает)"""
+    account = _account.get()
+    if account is not None:
+        account.labels.update(labels)
+
+
+__all__ = [
+    'STAGES',
+    'COUNTERS',
+    'RequestAccount',
+    'begin_account',
+    'end_account',
+    'current_account',
+    'add_stage',
+    'count',
+    'tally',
+    'label'
+]
@@ -0,0 +1,269 @@
+import os
+import json
+import math
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Any, Optional
+
+from backend.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_WAIT_SECONDS, ADMISSION_REJECTIONS
+
+# Параметры изоляции режимов по умолчанию:
+# concurrency - одновременных запусков режима, queue - мест в очереди ожидания,
+# queue_timeout - сколько секунд запрос может ждать в очереди,
+# priority - приоритет в общей очереди (меньше - раньше)
+DEFAULT_BULKHEADS: Dict[str, Dict[str, Any]] = {
+    "fast": {"concurrency": 16, "queue": 32, "queue_timeout": 5.0, "priority": 0},
+    "social": {"concurrency": 6, "queue": 16, "queue_timeout": 15.0, "priority": 1},
+    "finance": {"concurrency": 6, "queue": 16, "queue_timeout": 15.0, "priority": 1},
+    "academic": {"concurrency": 4, "queue": 12, "queue_timeout": 20.0, "priority": 2},
+    "deep": {"concurrency": 4, "queue": 8, "queue_timeout": 30.0, "priority": 3},
+}
+
+
+class AdmissionRejected(Exception):
+    """Запрос не допущен к выполнению: очередь переполнена или истёк срок ожидания"""
+
+    def __init__(self, mode: str, status: int, retry_after: int, reason: str):
+        self.mode = mode
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+        super().__init__(reason)
+
+
+class _Waiter:
+    __slots__ = ("mode", "priority", "seq", "active")
+
+    def __init__(self, mode: str, priority: int, seq: int):
+        self.mode = mode
+        self.priority = priority
+        self.seq = seq
+        self.active = True
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """
+    Допуск запросов к выполнению с изоляцией режимов (bulkheads)
+
+    У каждого режима свой лимит одновременных запусков и своя ограниченная
+    очередь ожидания со сроком ожидания; общий лимит ограничивает число запусков
+    в процессе. Освободившийся слот получает ожидающий запрос с наивысшим
+    приоритетом, поэтому быстрые запросы обгоняют стоящую в очереди глубокую работу.
+    С export_metrics состояние пулов, время ожидания и отказы пишутся в метрики
+    admission_* (их /metrics суммирует по воркерам).
+    """
+
+    def __init__(self, bulkheads: Optional[Dict[str, Dict[str, Any]]] = None, max_concurrent: int = 16,
+                 export_metrics: bool = False):
+        self.bulkheads = bulkheads or DEFAULT_BULKHEADS
+        self.max_concurrent = max_concurrent
+        self.export_metrics = export_metrics
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._in_flight = {mode: 0 for mode in self.bulkheads}
+        self._queued = {mode: 0 for mode in self.bulkheads}
+        self._total_in_flight = 0
+        self._stats = {
+            mode: {"admitted": 0, "rejected_queue_full": 0, "rejected_timeout": 0,
+                   "wait_total": 0.0, "wait_max": 0.0, "recent_waits": deque(maxlen=200),
+                   "avg_duration": None}
+            for mode in self.bulkheads
+        }
+
+    def _bulkhead(self, mode: str) -> Dict[str, Any]:
+        return self.bulkheads.get(mode) or self.bulkheads["fast"]
+
+    def _key(self, mode: str) -> str:
+        return mode if mode in self.bulkheads else "fast"
+
+    def _has_capacity(self, mode: str) -> bool:
+        return (self._total_in_flight < self.max_concurrent
+                and self._in_flight[mode] < self._bulkhead(mode)["concurrency"])
+
+    def _is_next(self, waiter: _Waiter) -> bool:
+        """Ожидающий может стартовать, если для него есть слот и нет более приоритетного претендента"""
+        if not self._has_capacity(waiter.mode):
+            return False
+        for other in self._waiters:
+            if other.active and other is not waiter and other < waiter and self._has_capacity(other.mode):
+                return False
+        return True
+
+    def _publish(self, mode: str):
+        if self.export_metrics:
+            ADMISSION_IN_FLIGHT.set(self._in_flight[mode], mode=mode)
+            ADMISSION_QUEUED.set(self._queued[mode], mode=mode)
+
+    def _reject(self, mode: str, reason: str):
+        self._stats[mode][f"rejected_{reason}"] += 1
+        if self.export_metrics:
+            ADMISSION_REJECTIONS.inc(mode=mode, reason=reason)
+
+    def _retry_after(self, mode: str) -> int:
+        avg = self._stats[mode]["avg_duration"] or 1.0
+        concurrency = max(self._bulkhead(mode)["concurrency"], 1)
+        return max(int(math.ceil(avg * (self._queued[mode] + 1) / concurrency)), 1)
+
+    def acquire(self, mode: str, priority: Optional[int] = None) -> float:
+        """
+        Занять слот выполнения для режима, при необходимости подождав в очереди
+
+        Returns:
+            Время ожидания в очереди, секунды
+
+        Raises:
+            AdmissionRejected: 429, если очередь режима заполнена; 503, если истёк срок ожидания
+        """
+        mode = self._key(mode)
+        bulkhead = self._bulkhead(mode)
+        priority = bulkhead["priority"] if priority is None else priority
+        start = time.monotonic()
+
+        with self._cond:
+            waiter = _Waiter(mode, priority, next(self._seq))
+            heapq.heappush(self._waiters, waiter)
+            if not self._is_next(waiter):
+                if self._queued[mode] >= bulkhead["queue"]:
+                    self._remove(waiter)
+                    self._reject(mode, "queue_full")
+                    raise AdmissionRejected(mode, 429, self._retry_after(mode),
+                                            f"Очередь режима {mode} заполнена")
+                self._queued[mode] += 1
+                self._publish(mode)
+                deadline = start + bulkhead["queue_timeout"]
+                try:
+                    while not self._is_next(waiter):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._remove(waiter)
+                            self._reject(mode, "timeout")
+                            raise AdmissionRejected(mode, 503, self._retry_after(mode),
+                                                    f"Истёк срок ожидания в очереди режима {mode}")
+                        self._cond.wait(remaining)
+                finally:
+                    self._queued[mode] -= 1
+                    self._publish(mode)
+
+            self._remove(waiter)
+            self._in_flight[mode] += 1
+            self._total_in_flight += 1
+            self._publish(mode)
+
+            waited = time.monotonic() - start
+            if self.export_metrics:
+                ADMISSION_WAIT_SECONDS.observe(waited, mode=mode)
+            stats = self._stats[mode]
+            stats["admitted"] += 1
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
+            stats["recent_waits"].append(waited)
+            return waited
+
+    def _remove(self, waiter: _Waiter):
+        waiter.active = False
+        self._waiters = [w for w in self._waiters if w.active]
+        heapq.heapify(self._waiters)
+        # Удаление ожидающего может открыть дорогу следующему
+        self._cond.notify_all()
+
+    def release(self, mode: str, duration: Optional[float] = None):
+        """Освободить слот выполнения режима"""
+        mode = self._key(mode)
+        with self._cond:
+            self._in_flight[mode] -= 1
+            self._total_in_flight -= 1
+            self._publish(mode)
+            if duration is not None:
+                stats = self._stats[mode]
+                avg = stats["avg_duration"]
+                stats["avg_duration"] = duration if avg is None else 0.8 * avg + 0.2 * duration
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, mode: str, priority: Optional[int] = None):
+        """Контекст выполнения запроса режима под контролем допуска"""
+        self.acquire(mode, priority)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(mode, time.monotonic() - start)
+
+    def limit(self, mode: str):
+        """Декоратор эндпоинта с фиксированным режимом"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                with self.admit(mode):
+                    return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def in_flight(self, mode: str) -> int:
+        with self._cond:
+            return self._in_flight[self._key(mode)]
+
+    def queue_depth(self, mode: Optional[str] = None) -> int:
+        with self._cond:
+            if mode is None:
+                return sum(self._queued.values())
+            return self._queued[self._key(mode)]
+
+    def stats(self) -> Dict[str, Any]:
+        """Глубина очередей, число выполняемых запросов и время ожидания по режимам"""
+        with self._cond:
+            modes = {}
+            for mode, stats in self._stats.items():
+                waits = sorted(stats["recent_waits"])
+                modes[mode] = {
+                    "concurrency": self._bulkhead(mode)["concurrency"],
+                    "queue_limit": self._bulkhead(mode)["queue"],
+                    "in_flight": self._in_flight[mode],
+                    "queue_depth": self._queued[mode],
+                    "admitted": stats["admitted"],
+                    "rejected_queue_full": stats["rejected_queue_full"],
+                    "rejected_timeout": stats["rejected_timeout"],
+                    "wait_avg": round(stats["wait_total"] / stats["admitted"], 4) if stats["admitted"] else 0.0,
+                    "wait_p95": round(waits[int(0.95 * (len(waits) - 1))], 4) if waits else 0.0,
+                    "wait_max": round(stats["wait_max"], 4)
+                }
+            return {
+                "in_flight": self._total_in_flight,
+                "max_concurrent": self.max_concurrent,
+                "modes": modes
+            }
+
+
+def load_bulkheads() -> Dict[str, Dict[str, Any]]:
+    """
+    Параметры изоляции режимов с переопределениями из ADMISSION_CONFIG
+    (JSON вида {"deep": {"concurrency": 2, "queue_timeout": 10}})
+    """
+    bulkheads = {mode: dict(params) for mode, params in DEFAULT_BULKHEADS.items()}
+    overrides = os.getenv("ADMISSION_CONFIG")
+    if overrides:
+        try:
+            for mode, params in json.loads(overrides).items():
+                bulkheads.setdefault(mode, dict(DEFAULT_BULKHEADS["fast"])).update(params)
+        except (ValueError, AttributeError) as e:
+            print(f"Некорректный ADMISSION_CONFIG: {e}")
+    return bulkheads
+
+
+admission_controller = AdmissionController(
+    load_bulkheads(),
+    max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "16")),
+    export_metrics=True
+)
+
+
+__all__ = ['DEFAULT_BULKHEADS', 'AdmissionRejected', 'AdmissionController', 'load_bulkheads', 'admission_controller']
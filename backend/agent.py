@@ -1,10 +1,10 @@
 import os
+import json
+import threading
 from typing import Dict, Any, List, Optional
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from tavily import TavilyClient
 from backend.prompts import (
     SIMPLE_PROMPT,
     REASONING_PROMPT,
@@ -12,16 +12,135 @@ from backend.prompts import (
     ACADEMIC_PROMPT,
     FINANCE_PROMPT,
     SUMMARIZER_PROMPT,
-    ROUTING_PROMPT
+    ROUTING_PROMPT,
+    dynamic_suffix
 )
+from backend.prompt_cache import system_message, cache_usage, cached_ratio
 from backend.utils import aggregate_and_summarize
-from langchain_tavily import TavilySearch, TavilyExtract, TavilyCrawl
+from backend.search_policy import assess_results
+from backend.model_policy import load_model_policy, resolve_model
+from backend.providers import FailoverChatModel, KeyedChatModel, configured_providers, hedging_enabled
+from backend.tavily_gateway import get_tavily_gateway
+from backend.http_pool import get_http_client, pool_setting
+from backend.metrics import stage, record_tokens
+from backend.tracing import span, annotate
 from typing_extensions import TypedDict
 from langgraph.graph.message import add_messages
 from typing import Annotated
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
+    tool_iterations: int
+    tool_budget: Optional[int]
+    stop_reason: Optional[str]
+
+# Бюджет итераций инструментов по умолчанию - тот же, что до досрочной
+# остановки: предел рекурсии LangGraph (25 шагов) при двух шагах на итерацию
+AGENT_MAX_ITERATIONS = int(os.getenv("AGENT_MAX_ITERATIONS", "12"))
+
+# Настройки досрочной остановки цикла агента для каждого режима: пороги
+# достаточности найденных данных (max_iterations задаётся только явно)
+EARLY_STOP_SETTINGS: Dict[str, Dict[str, Any]] = {
+    "fast": {"enabled": True, "min_top_score": 0.6, "min_strong_results": 2,
+             "min_coverage": 0.6, "min_domains": 1},
+    "deep": {"enabled": True, "min_top_score": 0.75, "min_strong_results": 4,
+             "min_coverage": 0.8, "min_domains": 3},
+    "social": {"enabled": True, "min_top_score": 0.6, "min_strong_results": 3,
+               "min_coverage": 0.6, "min_domains": 2},
+    "academic": {"enabled": True, "min_top_score": 0.7, "min_strong_results": 3,
+                 "min_coverage": 0.7, "min_domains": 1},
+    "finance": {"enabled": True, "min_top_score": 0.6, "min_strong_results": 2,
+                "min_coverage": 0.6, "min_domains": 2},
+}
+
+FINAL_ANSWER_INSTRUCTION = (
+    "Собранных данных достаточно. Не вызывайте больше инструменты и сформируйте "
+    "окончательный ответ на исходный вопрос на основе уже найденных источников."
+)
+
+def get_early_stop_settings(mode: str) -> Dict[str, Any]:
+    """
+    Получить настройки досрочной остановки для режима
+
+    Значения по умолчанию можно переопределить через AGENT_EARLY_STOP_CONFIG
+    (JSON вида {"deep": {"min_domains": 4}}), а AGENT_EARLY_STOP=0 отключает проверку.
+    Бюджет итераций (max_iterations) - AGENT_MAX_ITERATIONS, если не задан для режима.
+    """
+    settings = {**EARLY_STOP_SETTINGS.get(mode, EARLY_STOP_SETTINGS["fast"]), "max_iterations": AGENT_MAX_ITERATIONS}
+    overrides = os.getenv("AGENT_EARLY_STOP_CONFIG")
+    if overrides:
+        try:
+            settings.update(json.loads(overrides).get(mode, {}))
+        except (ValueError, AttributeError) as e:
+            print(f"Некорректный AGENT_EARLY_STOP_CONFIG: {e}")
+    if os.getenv("AGENT_EARLY_STOP", "1").lower() in ("0", "false", "no"):
+        settings["enabled"] = False
+    return settings
+
+def resynthesis_enabled(mode: str) -> bool:
+    """
+    Заменять ли черновой ответ модели выбора инструментов синтезом финальной
+    модели (AGENT_RESYNTHESIS_MODES, например "deep,academic")
+
+    Повторный синтез - ещё один полный вызов LLM на запрос, поэтому по умолчанию
+    выключен: финальная модель отвечает, когда цикл останавливается по
+    достаточности данных или бюджету, а ответ, который модель шага tools дала
+    сама, возвращается как есть.
+    """
+    modes = {m.strip() for m in os.getenv("AGENT_RESYNTHESIS_MODES", "").split(",") if m.strip()}
+    return mode in modes
+
+def _tavily_tools(**search_kwargs) -> list:
+    """
+    Инструменты Tavily для агента, работающие через общий шлюз Tavily
+
+    Args:
+        search_kwargs: Фиксированные параметры TavilySearch для режима
+    """
+    # Модули инструментов загружаются при первой сборке графа
+    from langchain_tavily import TavilySearch, TavilyExtract, TavilyCrawl
+    from backend.tavily_tools import (
+        GATEWAY_API_KEY,
+        GatewaySearchAPIWrapper,
+        GatewayExtractAPIWrapper,
+        GatewayCrawlAPIWrapper
+    )
+    return [
+        TavilySearch(api_wrapper=GatewaySearchAPIWrapper(tavily_api_key=GATEWAY_API_KEY), **search_kwargs),
+        TavilyExtract(apiwrapper=GatewayExtractAPIWrapper(tavily_api_key=GATEWAY_API_KEY)),
+        TavilyCrawl(api_wrapper=GatewayCrawlAPIWrapper(tavily_api_key=GATEWAY_API_KEY))
+    ]
+
+def _extract_query(messages: list) -> str:
+    """Найти исходный запрос пользователя в истории сообщений"""
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            return message.content
+    return ""
+
+def _collect_search_results(messages: list) -> List[Dict[str, Any]]:
+    """Собрать результаты поиска (со score) из всех ответов инструментов"""
+    results = []
+    for message in messages:
+        if not isinstance(message, ToolMessage):
+            continue
+        try:
+            payload = json.loads(message.content) if isinstance(message.content, str) else message.content
+        except ValueError:
+            continue
+        if isinstance(payload, dict):
+            results.extend(r for r in payload.get("results", []) if isinstance(r, dict) and "score" in r)
+    return results
+
+def _traced_node(name: str, node):
+    """Узел графа, выполнение которого записывается спаном node:<name> текущей трассы"""
+    def traced(state: State, config: RunnableConfig):
+        with span(f"node:{name}"):
+            return node.invoke(state, config) if hasattr(node, "invoke") else node(state)
+    return traced
+
+# Режимы агента, для каждого из которых компилируется свой граф
+AGENT_MODES = ("fast", "deep", "social", "academic", "finance")
 
 class WebAgent:
     """
@@ -35,46 +154,106 @@ class WebAgent:
     
     def __init__(self, model_type: str = "openai"):
         self.model_type = model_type
-        self.tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-        
-        # Инициализация модели в зависимости от типа
-        if model_type == "anthropic":
-            self.model = ChatAnthropic(
-                model="claude-3-5-sonnet-20240620",
-                temperature=0,
-                max_tokens=4096,
-                api_key=os.getenv("ANTHROPIC_API_KEY")
-            )
-        else:
-            # Для OpenAI используем модель из переменных окружения или по умолчанию
-            model_name = os.getenv("NANO_MODEL", "gpt-3.5-turbo")
-            self.model = ChatOpenAI(
+        # Общий для процесса шлюз Tavily (предохранитель и устаревшие ответы)
+        self.tavily_client = get_tavily_gateway()
+        
+        # Политика выбора модели и лимита токенов для каждого режима и шага
+        self.model_policy = load_model_policy()
+        self._models: Dict[tuple, Any] = {}
+        # Скомпилированные графы режимов переиспользуются между запусками
+        self._graphs: Dict[str, tuple] = {}
+        self._graphs_lock = threading.Lock()
+        
+        # Модель по умолчанию - модель выбора инструментов быстрого режима
+        self.model = self.get_model("fast", "tools")
+
+    def _create_model(self, provider: str, model_name: str, max_tokens: int, api_key: Optional[str] = None):
+        """
+        Создать клиент модели в зависимости от провайдера (SDK провайдера импортируется
+        при первом вызове); клиенты всех моделей и ключей провайдера делят один пул
+        HTTP-соединений
+        """
+        if provider == "anthropic":
+            from backend.chat_models import PooledChatAnthropic
+            return PooledChatAnthropic(
                 model=model_name,
                 temperature=0,
-                max_tokens=4096,
-                api_key=os.getenv("OPENAI_API_KEY"),
-                base_url=os.getenv("OPENAI_BASE_URL") if os.getenv("OPENAI_BASE_URL") else None
+                max_tokens=max_tokens,
+                api_key=api_key or os.getenv("ANTHROPIC_API_KEY")
+            )
+        # Для OpenAI-совместимых API учитываем базовый URL из переменных окружения
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
+            model=model_name,
+            temperature=0,
+            max_tokens=max_tokens,
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL") if os.getenv("OPENAI_BASE_URL") else None,
+            http_client=get_http_client("openai"),
+            # Таймаут чтения пула; таймаут соединения SDK OpenAI задаёт сам
+            timeout=float(pool_setting("openai", "READ_TIMEOUT"))
+        )
+
+    def model_spec(self, mode: str, step: str, provider: Optional[str] = None) -> Dict[str, Any]:
+        """Получить имя модели и лимит токенов для режима и шага по политике"""
+        return resolve_model(self.model_policy, mode, step, provider or self.model_type)
+
+    def get_model(self, mode: str, step: str):
+        """
+        Получить модель для режима и шага агента
+
+        Модель работает поверх пула провайдеров (основной из MODEL_TYPE и резервные
+        из LLM_FALLBACK_PROVIDERS) с автоматическим переключением, у каждого
+        провайдера - пул API-ключей с лимитом запросов; для режимов из
+        LLM_HEDGE_MODES шаги выбора инструментов хеджируются. Модели с одинаковыми
+        параметрами переиспользуются в рамках агента.
+        """
+        specs = []
+        for provider in configured_providers(self.model_type):
+            spec = self.model_spec(mode, step, provider)
+            specs.append((provider, spec["model"], spec["max_tokens"]))
+        hedge = step == "tools" and hedging_enabled(mode)
+        key = (tuple(specs), hedge)
+        if key not in self._models:
+            self._models[key] = FailoverChatModel(
+                [(provider, self._keyed_model(provider, name, max_tokens)) for provider, name, max_tokens in specs],
+                hedge=hedge
             )
+        return self._models[key]
 
-    def _get_model_with_tools(self, tools):
+    def _keyed_model(self, provider: str, model_name: str, max_tokens: int) -> KeyedChatModel:
+        """Модель провайдера, которая берёт API-ключ из общего пула для каждого вызова"""
+        return KeyedChatModel(
+            provider,
+            lambda api_key: self._create_model(provider, model_name, max_tokens, api_key)
+        )
+
+    def _get_model_with_tools(self, tools, mode: str = "fast"):
         """Получить модель с привязанными инструментами"""
-        return self.model.bind_tools(tools)
+        return self.get_model(mode, "tools").bind_tools(tools)
 
-    def build_graph(self) -> StateGraph:
+    def _build_tool_graph(self, tools: list, mode: str) -> StateGraph:
         """
-        Создать граф для стандартного режима (быстрый поиск или глубокий анализ)
+        Создать граф агента с инструментами и проверкой достаточности данных
+
+        Цикл: agent -> tools -> evidence -> agent ... Узел evidence после каждого
+        шага инструментов оценивает найденные результаты и, если данных уже
+        достаточно (или исчерпан бюджет итераций), переводит граф в узел final,
+        где модель формирует окончательный ответ без инструментов.
+        
+        Если политика назначает для финального синтеза другую модель, чем для
+        выбора инструментов, и режим указан в AGENT_RESYNTHESIS_MODES, черновой
+        ответ модели шага tools тоже заменяется синтезом в узле final.
         """
         from langgraph.prebuilt import ToolNode
         
-        # Определение инструментов для стандартного режима
-        tools = [
-            TavilySearch(),
-            TavilyExtract(),
-            TavilyCrawl()
-        ]
-        
         tool_node = ToolNode(tools)
-        model_with_tools = self._get_model_with_tools(tools)
+        model_with_tools = self._get_model_with_tools(tools, mode)
+        final_model = self.get_model(mode, "final")
+        tools_model_name = self.model_spec(mode, "tools")["model"]
+        final_model_name = self.model_spec(mode, "final")["model"]
+        needs_synthesis = final_model_name != tools_model_name and resynthesis_enabled(mode)
+        settings = get_early_stop_settings(mode)
         
         # Определение состояния графа
         workflow = StateGraph(State)
@@ -82,14 +261,56 @@ class WebAgent:
         # Добавление узлов
         def call_model(state: State) -> dict:
             messages = state["messages"]
-            response = model_with_tools.invoke(messages)
+            with stage("agent_iteration", model=tools_model_name):
+                response = model_with_tools.invoke(messages)
+                record_tokens(response, tools_model_name)
             return {"messages": [response]}
+        
+        def check_evidence(state: State) -> dict:
+            iterations = state.get("tool_iterations", 0) + 1
+            stop_reason = None
+            
+            if settings["enabled"]:
+                assessment = assess_results(
+                    _extract_query(state["messages"]),
+                    _collect_search_results(state["messages"]),
+                    min_top_score=settings["min_top_score"],
+                    min_strong_results=settings["min_strong_results"],
+                    min_coverage=settings["min_coverage"],
+                    min_domains=settings["min_domains"]
+                )
+                if assessment["sufficient"]:
+                    stop_reason = "evidence"
+                    print(f"[agent] mode={mode} данных достаточно после {iterations} итераций: {assessment}")
+            
+            # Бюджет итераций можно уменьшить для отдельного запуска (например, под нагрузкой)
+            budget = state.get("tool_budget") or settings["max_iterations"]
+            if stop_reason is None and iterations >= budget:
+                stop_reason = "budget"
+                print(f"[agent] mode={mode} исчерпан бюджет в {iterations} итераций")
             
-        workflow.add_node("agent", call_model)
-        workflow.add_node("tools", tool_node)
+            annotate(iteration=iterations, stop_reason=stop_reason)
+            return {"tool_iterations": iterations, "stop_reason": stop_reason}
+        
+        def final_answer(state: State) -> dict:
+            messages = state["messages"]
+            # Черновой ответ дешёвой модели заменяется синтезом финальной модели
+            if isinstance(messages[-1], AIMessage) and not messages[-1].tool_calls:
+                messages = messages[:-1]
+            messages = messages + [HumanMessage(content=FINAL_ANSWER_INSTRUCTION)]
+            with stage("final", model=final_model_name):
+                response = final_model.invoke(messages)
+                record_tokens(response, final_model_name)
+            return {"messages": [response]}
+            
+        workflow.add_node("agent", _traced_node("agent", call_model))
+        workflow.add_node("tools", _traced_node("tools", tool_node))
+        workflow.add_node("evidence", _traced_node("evidence", check_evidence))
+        workflow.add_node("final", _traced_node("final", final_answer))
         
         # Добавление ребер
-        workflow.add_edge("tools", "agent")
+        workflow.add_edge("tools", "evidence")
+        workflow.add_edge("final", END)
         
         # Условное ребро для определения, нужно ли использовать инструменты
         def should_continue(state: dict) -> str:
@@ -97,230 +318,134 @@ class WebAgent:
             last_message = messages[-1]
             if hasattr(last_message, 'tool_calls') and len(last_message.tool_calls) > 0:
                 return "tools"
-            return END
+            return "final" if needs_synthesis else END
+        
+        # Условное ребро для досрочного завершения цикла
+        def should_stop(state: dict) -> str:
+            return "final" if state.get("stop_reason") else "agent"
             
         workflow.add_conditional_edges(
             "agent",
             should_continue,
             {
                 "tools": "tools",
+                "final": "final",
                 END: END
             }
         )
+        workflow.add_conditional_edges(
+            "evidence",
+            should_stop,
+            {
+                "final": "final",
+                "agent": "agent"
+            }
+        )
         
         # Установка начального узла
         workflow.set_entry_point("agent")
         
         return workflow
+
+    def build_graph(self, mode: str = "fast") -> StateGraph:
+        """
+        Создать граф для стандартного режима (быстрый поиск или глубокий анализ)
+        """
+        # Определение инструментов для стандартного режима
+        tools = _tavily_tools()
+        return self._build_tool_graph(tools, mode)
     
     def build_social_graph(self) -> StateGraph:
         """
         Создать граф для социального анализа
         """
-        from langgraph.prebuilt import ToolNode
-        
         # Инструменты для социального анализа (с фокусом на социальные платформы)
-        tools = [
-            TavilySearch(
-                include_domains=["reddit.com", "twitter.com", "x.com", "vk.com", "habr.com"],
-                time_range="week"
-            ),
-            TavilyExtract(),
-            TavilyCrawl()
-        ]
-        
-        tool_node = ToolNode(tools)
-        model_with_tools = self._get_model_with_tools(tools)
-        
-        # Определение состояния графа
-        workflow = StateGraph(State)
-        
-        # Добавление узлов
-        def call_model(state: State) -> dict:
-            messages = state["messages"]
-            response = model_with_tools.invoke(messages)
-            return {"messages": [response]}
-            
-        workflow.add_node("agent", call_model)
-        workflow.add_node("tools", tool_node)
-        
-        # Добавление ребер
-        workflow.add_edge("tools", "agent")
-        
-        # Условное ребро для определения, нужно ли использовать инструменты
-        def should_continue(state: dict) -> str:
-            messages = state["messages"]
-            last_message = messages[-1]
-            if hasattr(last_message, 'tool_calls') and len(last_message.tool_calls) > 0:
-                return "tools"
-            return END
-            
-        workflow.add_conditional_edges(
-            "agent",
-            should_continue,
-            {
-                "tools": "tools",
-                END: END
-            }
+        tools = _tavily_tools(
+            include_domains=["reddit.com", "twitter.com", "x.com", "vk.com", "habr.com"],
+            time_range="week"
         )
-        
-        # Установка начального узла
-        workflow.set_entry_point("agent")
-        
-        return workflow
+        return self._build_tool_graph(tools, "social")
     
     def build_academic_graph(self) -> StateGraph:
         """
         Создать граф для академического поиска
         """
-        from langgraph.prebuilt import ToolNode
-        
         # Инструменты для академического поиска (с фокусом на академические источники)
-        tools = [
-            TavilySearch(
-                include_domains=["arxiv.org", "semanticscholar.org"],
-                time_range="year"
-            ),
-            TavilyExtract(),
-            TavilyCrawl()
-        ]
-        
-        tool_node = ToolNode(tools)
-        model_with_tools = self._get_model_with_tools(tools)
-        
-        # Определение состояния графа
-        workflow = StateGraph(State)
-        
-        # Добавление узлов
-        def call_model(state: State) -> dict:
-            messages = state["messages"]
-            response = model_with_tools.invoke(messages)
-            return {"messages": [response]}
-            
-        workflow.add_node("agent", call_model)
-        workflow.add_node("tools", tool_node)
-        
-        # Добавление ребер
-        workflow.add_edge("tools", "agent")
-        
-        # Условное ребро для определения, нужно ли использовать инструменты
-        def should_continue(state: dict) -> str:
-            messages = state["messages"]
-            last_message = messages[-1]
-            if hasattr(last_message, 'tool_calls') and len(last_message.tool_calls) > 0:
-                return "tools"
-            return END
-            
-        workflow.add_conditional_edges(
-            "agent",
-            should_continue,
-            {
-                "tools": "tools",
-                END: END
-            }
+        tools = _tavily_tools(
+            include_domains=["arxiv.org", "semanticscholar.org"],
+            time_range="year"
         )
-        
-        # Установка начального узла
-        workflow.set_entry_point("agent")
-        
-        return workflow
+        return self._build_tool_graph(tools, "academic")
     
     def build_finance_graph(self) -> StateGraph:
         """
         Создать граф для финансового анализа
         """
-        from langgraph.prebuilt import ToolNode
-        
         # Инструменты для финансового анализа (с фокусом на финансовые источники)
-        tools = [
-            TavilySearch(
-                topic="finance",
-                include_domains=["finance.yahoo.com", "bloomberg.com", "reuters.com"],
-                time_range="day"
-            ),
-            TavilyExtract(),
-            TavilyCrawl()
-        ]
-        
-        tool_node = ToolNode(tools)
-        model_with_tools = self._get_model_with_tools(tools)
-        
-        # Определение состояния графа
-        workflow = StateGraph(State)
-        
-        # Добавление узлов
-        def call_model(state: State) -> dict:
-            messages = state["messages"]
-            response = model_with_tools.invoke(messages)
-            return {"messages": [response]}
-            
-        workflow.add_node("agent", call_model)
-        workflow.add_node("tools", tool_node)
-        
-        # Добавление ребер
-        workflow.add_edge("tools", "agent")
-        
-        # Условное ребро для определения, нужно ли использовать инструменты
-        def should_continue(state: dict) -> str:
-            messages = state["messages"]
-            last_message = messages[-1]
-            if hasattr(last_message, 'tool_calls') and len(last_message.tool_calls) > 0:
-                return "tools"
-            return END
-            
-        workflow.add_conditional_edges(
-            "agent",
-            should_continue,
-            {
-                "tools": "tools",
-                END: END
-            }
+        tools = _tavily_tools(
+            topic="finance",
+            include_domains=["finance.yahoo.com", "bloomberg.com", "reuters.com"],
+            time_range="day"
         )
-        
-        # Установка начального узла
-        workflow.set_entry_point("agent")
-        
-        return workflow
+        return self._build_tool_graph(tools, "finance")
+
+    def _mode_workflow(self, mode: str) -> tuple:
+        """Граф и системный промпт режима"""
+        if mode == "social":
+            return self.build_social_graph(), SOCIAL_PROMPT
+        if mode == "academic":
+            return self.build_academic_graph(), ACADEMIC_PROMPT
+        if mode == "finance":
+            return self.build_finance_graph(), FINANCE_PROMPT
+        if mode == "deep":
+            return self.build_graph(mode="deep"), REASONING_PROMPT
+        # fast/simple mode
+        return self.build_graph(mode="fast"), SIMPLE_PROMPT
 
-    def run(self, query: str, mode: str = "fast") -> Dict[str, Any]:
+    def compiled_graph(self, mode: str) -> tuple:
+        """
+        Скомпилированный граф режима и его системный промпт
+
+        Граф компилируется при первом обращении и переиспользуется всеми
+        последующими запусками агента (в том числе параллельными).
+        """
+        key = mode if mode in AGENT_MODES else "fast"
+        if key not in self._graphs:
+            with self._graphs_lock:
+                if key not in self._graphs:
+                    workflow, system_prompt = self._mode_workflow(key)
+                    self._graphs[key] = (workflow.compile(), system_prompt)
+        return self._graphs[key]
+
+    def preload(self):
+        """Скомпилировать графы всех режимов заранее"""
+        for mode in AGENT_MODES:
+            self.compiled_graph(mode)
+
+    def run(self, query: str, mode: str = "fast", tool_budget: Optional[int] = None) -> Dict[str, Any]:
         """
         Запустить агент с заданным запросом и режимом
         
         Args:
             query: Поисковый запрос пользователя
             mode: Режим работы ("fast", "deep", "social", "academic", "finance")
+            tool_budget: Бюджет итераций инструментов вместо бюджета режима по умолчанию
             
         Returns:
             Словарь с результатами поиска
         """
-        # Выбор подходящего графа в зависимости от режима
-        if mode == "social":
-            workflow = self.build_social_graph()
-            system_prompt = SOCIAL_PROMPT
-        elif mode == "academic":
-            workflow = self.build_academic_graph()
-            system_prompt = ACADEMIC_PROMPT
-        elif mode == "finance":
-            workflow = self.build_finance_graph()
-            system_prompt = FINANCE_PROMPT
-        elif mode == "deep":
-            workflow = self.build_graph()
-            system_prompt = REASONING_PROMPT
-        else:  # fast/simple mode
-            workflow = self.build_graph()
-            system_prompt = SIMPLE_PROMPT
-            
-        # Компиляция графа
-        app = workflow.compile()
+        app, system_prompt = self.compiled_graph(mode)
         
-        # Подготовка сообщений
+        # Подготовка сообщений: стабильный кэшируемый префикс и дата запроса в конце
         messages = [
-            SystemMessage(content=system_prompt),
+            system_message(system_prompt, dynamic_suffix()),
             HumanMessage(content=query)
         ]
         
-        # Запуск графа
-        result = app.invoke({"messages": messages})
+        # Запуск графа: итерация - три шага (agent, tools, evidence), плюс итоговый ответ
+        budget = tool_budget or get_early_stop_settings(mode)["max_iterations"]
+        result = app.invoke({"messages": messages, "tool_budget": tool_budget},
+                            config={"recursion_limit": 3 * budget + 2})
         
         # Извлечение последнего сообщения
         last_message = result["messages"][-1]
@@ -328,9 +453,39 @@ class WebAgent:
         # Агрегация и суммирование результатов
         response_text = last_message.content if hasattr(last_message, 'content') else str(last_message)
         
+        # Статистика цикла агента: сколько итераций бюджета осталось невыполненными
+        # после решения о досрочной остановке. Это верхняя граница экономии, а не
+        # сама экономия: без остановки агент мог закончить раньше исчерпания бюджета
+        iterations = result.get("tool_iterations", 0)
+        early_stopped = result.get("stop_reason") == "evidence"
+        input_tokens = cache_read = 0
+        for message in result["messages"]:
+            if isinstance(message, AIMessage):
+                usage = cache_usage(message)
+                input_tokens += usage["input_tokens"]
+                cache_read += usage["cache_read"]
+        agent_stats = {
+            "tool_iterations": iterations,
+            "early_stopped": early_stopped,
+            "iterations_unused": max(budget - iterations, 0) if early_stopped else 0,
+            "models": {
+                "tools": self.model_spec(mode, "tools")["model"],
+                "final": self.model_spec(mode, "final")["model"]
+            },
+            "prompt_cache": {
+                "input_tokens": input_tokens,
+                "cache_read": cache_read,
+                "cached_ratio": cached_ratio(input_tokens, cache_read)
+            }
+        }
+        if early_stopped:
+            print(f"[agent] mode={mode} досрочная остановка после {iterations} итераций "
+                  f"(не использовано {agent_stats['iterations_unused']} из {budget})")
+        
         return {
             "response": response_text,
-            "sources": []  # Источники будут добавлены в app.py
+            "sources": [],  # Источники будут добавлены в app.py
+            "agent_stats": agent_stats
         }
 
     def route_query(self, query: str) -> str:
@@ -443,3 +598,21 @@ class WebAgent:
         except Exception as e:
             print(f"Routing error: {e}")
             return 'fast'  # Safe fallback
+
+
+_agents: Dict[str, WebAgent] = {}
+_agents_lock = threading.Lock()
+
+
+def get_agent(model_type: str = "openai") -> WebAgent:
+    """
+    Получить общий для процесса агент провайдера
+
+    Модели и скомпилированные графы общего агента создаются один раз
+    и переиспользуются всеми запросами процесса.
+    """
+    if model_type not in _agents:
+        with _agents_lock:
+            if model_type not in _agents:
+                _agents[model_type] = WebAgent(model_type=model_type)
+    return _agents[model_type]
@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Iterator, Optional, Callable
+
+from backend.agent import get_agent
+from backend.admission import AdmissionRejected
+from backend.pipeline import SEARCH_MODES, execute_search
+from backend.tavily_gateway import get_tavily_gateway
+
+# Ограничения пакетной обработки
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "200"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+
+def parse_batch(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Проверить тело запроса пакетного поиска
+
+    Args:
+        payload: {"queries": ["...", {"query": "...", "mode": "fast"}], "mode": "auto", "concurrency": 4}
+
+    Returns:
+        Словарь {"items": [{"query", "mode"}], "concurrency"}
+
+    Raises:
+        ValueError: некорректное тело запроса
+    """
+    queries = payload.get("queries")
+    if not isinstance(queries, list) or not queries:
+        raise ValueError("queries must be a non-empty list")
+    if len(queries) > BATCH_MAX_ITEMS:
+        raise ValueError(f"Too many queries: {len(queries)} > {BATCH_MAX_ITEMS}")
+
+    default_mode = payload.get("mode", "auto")
+    items = []
+    for entry in queries:
+        if isinstance(entry, str):
+            entry = {"query": entry}
+        if not isinstance(entry, dict) or not entry.get("query"):
+            raise ValueError("Each item must be a query string or an object with query")
+        mode = entry.get("mode", default_mode)
+        if mode not in SEARCH_MODES + ("auto",):
+            raise ValueError(f"Unknown mode: {mode}")
+        items.append({"query": entry["query"], "mode": mode})
+
+    concurrency = payload.get("concurrency")
+    if concurrency is None:
+        concurrency = BATCH_CONCURRENCY
+    elif isinstance(concurrency, bool) or not isinstance(concurrency, int):
+        raise ValueError("concurrency must be an integer")
+    return {"items": items, "concurrency": max(1, min(concurrency, BATCH_MAX_CONCURRENCY))}
+
+
+def _execute_with_retry(runner: Callable[..., Dict[str, Any]], item: Dict[str, Any],
+                        abandoned: threading.Event, **kwargs) -> Dict[str, Any]:
+    """
+    Пакет - офлайн-нагрузка: при отказе допуска элемент ждёт, а не проваливается,
+    пока клиент не отключился
+    """
+    while True:
+        try:
+            return runner(item["query"], item["mode"], **kwargs)
+        except AdmissionRejected as e:
+            if abandoned.wait(e.retry_after):
+                raise
+
+
+def run_batch(items: List[Dict[str, Any]],
+              concurrency: int = BATCH_CONCURRENCY,
+              runner: Optional[Callable[..., Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Выполнить пакет запросов параллельно, выдавая результаты по мере готовности
+
+    Запросы "auto" маршрутизируются одним проходом до начала выполнения, один
+    агент используется для всех элементов, а одинаковые вызовы Tavily внутри
+    пакета выполняются один раз. Если генератор закрыт до конца (клиент
+    NDJSON отключился), ещё не начатые элементы отменяются, а ожидающие
+    допуска прекращают ждать; уже выполняющиеся завершаются в фоне.
+
+    Args:
+        items: Элементы {"query", "mode"} из parse_batch
+        concurrency: Сколько элементов выполняется одновременно
+        runner: Функция выполнения (по умолчанию execute_search)
+
+    Yields:
+        {"index", "query", "mode", "result"} или {"index", "query", "mode", "error"}
+        для каждого элемента, последним - {"summary": {...}}
+    """
+    runner = runner or execute_search
+    start = time.monotonic()
+    agent = get_agent(os.getenv("MODEL_TYPE", "openai"))
+    routed = [agent.route_query(item["query"]) if item["mode"] == "auto" else None for item in items]
+
+    succeeded = 0
+    abandoned = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="search-batch")
+    try:
+        with get_tavily_gateway().shared_calls() as shared:
+            futures = {}
+            for index, item in enumerate(items):
+                # Каждый поток получает копию контекста с общим набором вызовов Tavily
+                context = contextvars.copy_context()
+                future = executor.submit(context.run, _execute_with_retry, runner, item, abandoned,
+                                         agent=agent, routed_mode=routed[index])
+                futures[future] = index
+
+            for future in as_completed(futures):
+                index = futures[future]
+                line = {"index": index, "query": items[index]["query"], "mode": items[index]["mode"]}
+                try:
+                    line["result"] = future.result()
+                    succeeded += 1
+                except Exception as e:
+                    line["error"] = str(e)
+                yield line
+
+            yield {"summary": {
+                "total": len(items),
+                "succeeded": succeeded,
+                "failed": len(items) - succeeded,
+                "tavily_calls": shared.calls,
+                "tavily_calls_shared": shared.shared,
+                "elapsed": round(time.monotonic() - start, 3)
+            }}
+    finally:
+        # Брошенный пакет не занимает слоты допуска и квоту апстримов: не ждём остальные элементы
+        abandoned.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+__all__ = ['parse_batch', 'run_batch']
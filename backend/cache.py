@@ -0,0 +1,441 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def make_cache_key(*parts: Any) -> str:
+    """
+    Построить стабильный ключ кэша из произвольных JSON-сериализуемых частей
+
+    Args:
+        parts: Части ключа (имя метода, запрос, параметры)
+
+    Returns:
+        Хэш SHA-1 от канонического JSON-представления
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCache:
+    """
+    Потокобезопасный LRU-кэш в памяти процесса с ограничением по времени жизни
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_with_age(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        Получить значение и его возраст в секундах
+
+        Returns:
+            Кортеж (значение, возраст) или None, если записи нет или она устарела
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            age = time.time() - stored_at
+            if self.ttl is not None and age > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value, age
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_with_age(key)
+        return entry[0] if entry else None
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None):
+        with self._lock:
+            self._entries[key] = (stored_at or time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses}
+
+
+class DiskCache:
+    """
+    Кэш на диске (SQLite в режиме WAL), общий для всех воркеров узла
+
+    Значения хранятся как JSON, сжатый zlib; записи разных кэшей в одном файле
+    различаются пространством имён. Запись старше ttl не отдаётся. Раз в
+    evict_every записей или после evict_bytes записанных байт удаляются
+    просроченные записи, а если файл со всеми пространствами больше max_bytes -
+    давно не читавшиеся; освобождённые страницы возвращаются файловой системе
+    (auto_vacuum=INCREMENTAL), журнал WAL усекается. Очистка идёт в фоновом
+    потоке процесса, а не в потоке запроса, выполнившего запись. Каждый
+    поток и каждый процесс (в том числе после fork) открывает своё соединение;
+    одновременные записи нескольких процессов упорядочивает блокировка SQLite.
+    Ошибки SQLite не пробрасываются: запрос обслуживается как при промахе.
+    """
+
+    def __init__(self, path: str, namespace: str = "default", ttl: Optional[float] = None,
+                 max_bytes: int = 512 * 1024 * 1024, compress_level: int = 6, busy_timeout: float = 5.0,
+                 evict_every: int = 200, evict_bytes: Optional[int] = None, touch_interval: float = 60.0):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self.busy_timeout = busy_timeout
+        self.evict_every = evict_every
+        # По умолчанию очистка после записи 2% лимита: файл превышает max_bytes ненамного
+        self.evict_bytes = evict_bytes if evict_bytes is not None else max(max_bytes // 50, 1)
+        # Время чтения обновляется не чаще touch_interval, чтобы чтения не превращались в записи
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._written_bytes = 0
+        # Фоновая очистка: поток запускается в каждом процессе (в том числе после fork)
+        self._evict_pending = False
+        self._maintainer_pid = None
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.evicted = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "stored_at REAL NOT NULL, expires_at REAL, accessed_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._execute("CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            # Соединение родителя после fork не используется
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            # Действует только для нового файла (до создания таблиц)
+            connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def _execute(self, sql: str, args: Tuple = ()) -> Optional[list]:
+        try:
+            return self._connection().execute(sql, args).fetchall()
+        except sqlite3.Error as e:
+            with self._lock:
+                self.errors += 1
+            print(f"[cache] {self.namespace}: ошибка SQLite {self.path}: {e}")
+            return None
+
+    def get_with_age(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        Получить значение и его возраст в секундах
+
+        Returns:
+            Кортеж (значение, возраст) или None, если записи нет или она устарела
+        """
+        rows = self._execute(
+            "SELECT value, stored_at, expires_at, accessed_at FROM entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        )
+        now = time.time()
+        if not rows or (rows[0][2] is not None and rows[0][2] < now):
+            with self._lock:
+                self.misses += 1
+            return None
+        blob, stored_at, _, accessed_at = rows[0]
+        try:
+            value = json.loads(zlib.decompress(blob))
+        except (zlib.error, ValueError) as e:
+            print(f"[cache] {self.namespace}: повреждённая запись {key}: {e}")
+            self._execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+            with self._lock:
+                self.misses += 1
+            return None
+        if now - accessed_at >= self.touch_interval:
+            self._execute("UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                          (now, self.namespace, key))
+        with self._lock:
+            self.hits += 1
+        return value, max(now - stored_at, 0.0)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_with_age(key)
+        return entry[0] if entry else None
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None):
+        stored_at = stored_at or time.time()
+        payload = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+        blob = zlib.compress(payload, self.compress_level)
+        expires_at = stored_at + self.ttl if self.ttl is not None else None
+        self._execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, value, size, stored_at, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.namespace, key, blob, len(blob), stored_at, expires_at, time.time())
+        )
+        with self._lock:
+            self._writes += 1
+            self._written_bytes += len(blob)
+            evict = self._writes % self.evict_every == 0 or self._written_bytes >= self.evict_bytes
+            if evict:
+                self._written_bytes = 0
+        if evict:
+            self._schedule_evict()
+
+    def _schedule_evict(self):
+        with self._lock:
+            self._evict_pending = True
+            self._idle.clear()
+            start = self._maintainer_pid != os.getpid()
+            self._maintainer_pid = os.getpid()
+        if start:
+            threading.Thread(target=self._maintain, name=f"disk-cache-{self.namespace}", daemon=True).start()
+        self._wake.set()
+
+    def _maintain(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                pending, self._evict_pending = self._evict_pending, False
+            if pending:
+                self.evict()
+            with self._lock:
+                if not self._evict_pending:
+                    self._idle.set()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Дождаться окончания запланированной фоновой очистки"""
+        return self._idle.wait(timeout)
+
+    def evict(self) -> int:
+        """
+        Удалить просроченные записи всех пространств, затем, пока файл больше
+        max_bytes, - давно не читавшиеся (до 90% лимита), и уменьшить файл
+
+        Returns:
+            Число удалённых записей
+        """
+        removed = 0
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                removed += connection.execute("DELETE FROM entries WHERE expires_at < ?", (time.time(),)).rowcount
+                total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                used = self._used_bytes(connection)
+                if total and used > self.max_bytes:
+                    # Кроме значений файл занимают ключи, индексы и неполные страницы:
+                    # лимит на сумму значений уменьшается в той же пропорции
+                    target = self.max_bytes * 0.9 * total / used
+                    victims = []
+                    for namespace, key, size in connection.execute(
+                            "SELECT namespace, key, size FROM entries ORDER BY accessed_at").fetchall():
+                        if total <= target:
+                            break
+                        victims.append((namespace, key))
+                        total -= size
+                    connection.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+                    removed += len(victims)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            if removed:
+                # executescript выполняет прагму до конца (execute освобождает одну страницу за шаг)
+                connection.executescript("PRAGMA incremental_vacuum;")
+            # Без усечения WAL остаётся размером с самую большую пачку записей
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        except sqlite3.Error as e:
+            with self._lock:
+                self.errors += 1
+            print(f"[cache] {self.namespace}: очистка {self.path} не удалась: {e}")
+            return 0
+        with self._lock:
+            self.evicted += removed
+        return removed
+
+    @staticmethod
+    def _used_bytes(connection: sqlite3.Connection) -> int:
+        """Занятые страницы файла, байты (без свободных, которые вернёт vacuum)"""
+        page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+        pages = connection.execute("PRAGMA page_count").fetchone()[0]
+        free = connection.execute("PRAGMA freelist_count").fetchone()[0]
+        return (pages - free) * page_size
+
+    def file_bytes(self) -> int:
+        """Размер файла кэша вместе с журналом WAL, байты"""
+        size = 0
+        for path in (self.path, self.path + "-wal"):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def __len__(self) -> int:
+        rows = self._execute("SELECT COUNT(*) FROM entries WHERE namespace = ?", (self.namespace,))
+        return rows[0][0] if rows else 0
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self._execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?",
+                             (self.namespace,))
+        entries, size = rows[0] if rows else (0, 0)
+        return {"path": self.path, "entries": entries, "bytes": size, "file_bytes": self.file_bytes(), "hits": self.hits,
+                "misses": self.misses, "evicted": self.evicted, "errors": self.errors}
+
+
+class TieredCache:
+    """
+    Двухуровневый кэш: память процесса и общий для воркеров кэш на диске
+
+    Запись сохраняется на обоих уровнях. Чтение сначала идёт в память, затем на
+    диск; запись, прочитанная с диска promote_hits раз, копируется в память
+    процесса с исходным временем сохранения, поэтому её возраст и срок жизни
+    не меняются. Запись в памяти старше max_age перепроверяется на диске:
+    другой воркер мог сохранить более свежую.
+    """
+
+    def __init__(self, memory: MemoryCache, disk: Optional[DiskCache] = None, promote_hits: int = 2):
+        self.memory = memory
+        self.disk = disk
+        self.promote_hits = promote_hits
+        self._disk_hits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.promoted = 0
+
+    def get_with_age(self, key: str, max_age: Optional[float] = None) -> Optional[Tuple[Any, float]]:
+        """
+        Получить значение и его возраст в секундах
+
+        Args:
+            key: Ключ записи
+            max_age: Возраст, после которого запись в памяти перепроверяется на диске
+
+        Returns:
+            Кортеж (значение, возраст) - самая свежая из найденных копий, или None
+        """
+        cached = self.memory.get_with_age(key)
+        if self.disk is None or (cached is not None and (max_age is None or cached[1] <= max_age)):
+            return cached
+        entry = self.disk.get_with_age(key)
+        if entry is None or (cached is not None and cached[1] <= entry[1]):
+            return cached
+        if cached is not None or self._hot(key):
+            value, age = entry
+            self.memory.set(key, value, stored_at=time.time() - age)
+        return entry
+
+    def _hot(self, key: str) -> bool:
+        with self._lock:
+            hits = self._disk_hits.get(key, 0) + 1
+            if hits < self.promote_hits:
+                # Счётчики ограничены размером кэша в памяти
+                if len(self._disk_hits) >= self.memory.max_entries:
+                    self._disk_hits.clear()
+                self._disk_hits[key] = hits
+                return False
+            self._disk_hits.pop(key, None)
+            self.promoted += 1
+            return True
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_with_age(key)
+        return entry[0] if entry else None
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None):
+        stored_at = stored_at or time.time()
+        self.memory.set(key, value, stored_at=stored_at)
+        if self.disk is not None:
+            self.disk.set(key, value, stored_at=stored_at)
+
+    def __len__(self) -> int:
+        return len(self.memory)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+            "promoted": self.promoted
+        }
+
+
+_caches: Dict[str, TieredCache] = {}
+
+
+def disk_cache_path() -> Optional[str]:
+    """Файл общего кэша на диске (CACHE_DISK_PATH; off - только память процесса)"""
+    path = os.getenv("CACHE_DISK_PATH", "cache/cache.sqlite3")
+    return None if path in ("", "off") else path
+
+
+def create_cache(namespace: str, max_entries: int, ttl: Optional[float] = None) -> TieredCache:
+    """
+    Создать кэш с уровнем в памяти процесса и общим уровнем на диске
+
+    Args:
+        namespace: Пространство имён записей в общем файле (tavily, answers)
+        max_entries: Размер уровня в памяти
+        ttl: Время жизни записи на обоих уровнях, секунды
+
+    Returns:
+        TieredCache; без CACHE_DISK_PATH - только с уровнем в памяти
+    """
+    path = disk_cache_path()
+    disk = None
+    if path is not None:
+        disk = DiskCache(
+            path,
+            namespace=namespace,
+            ttl=ttl,
+            max_bytes=int(os.getenv("CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024))),
+            compress_level=int(os.getenv("CACHE_DISK_COMPRESS_LEVEL", "6")),
+            busy_timeout=float(os.getenv("CACHE_DISK_BUSY_TIMEOUT", "5"))
+        )
+    cache = TieredCache(MemoryCache(max_entries=max_entries, ttl=ttl), disk,
+                        promote_hits=int(os.getenv("CACHE_PROMOTE_HITS", "2")))
+    _caches[namespace] = cache
+    return cache
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Состояние уровней последних созданных кэшей по пространствам имён"""
+    return {namespace: cache.stats() for namespace, cache in _caches.items()}
+
+
+__all__ = [
+    'make_cache_key',
+    'MemoryCache',
+    'DiskCache',
+    'TieredCache',
+    'disk_cache_path',
+    'create_cache',
+    'cache_stats'
+]
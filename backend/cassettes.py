@@ -0,0 +1,225 @@
+import os
+import re
+import json
+import gzip
+import time
+import base64
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional
+
+# Заголовки ответа, которые не сохраняются: тело в кассете уже раскодировано и целиком
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive",
+                    "date", "set-cookie"}
+
+
+# Дата в промптах (prompts.current_date, формат "%A, %B %d, %Y") не входит в ключ:
+# иначе кассета перестаёт воспроизводиться на следующий день после записи
+_PROMPT_DATE = re.compile(
+    r"\b(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday), "
+    r"(?:January|February|March|April|May|June|July|August|September|October|November|December) "
+    r"\d{2}, \d{4}\b"
+)
+
+
+def cassette_mode() -> str:
+    """Режим кассет: record, replay или off (CASSETTE_MODE)"""
+    mode = os.getenv("CASSETTE_MODE", "off").lower()
+    return mode if mode in ("record", "replay") else "off"
+
+
+def cassette_path() -> str:
+    return os.getenv("CASSETTE_FILE", "cassettes/upstream.jsonl.gz")
+
+
+def request_key(upstream: str, method: str, url: str, body: bytes) -> str:
+    """
+    Ключ запроса для сопоставления при воспроизведении
+
+    Учитываются апстрим, метод, путь с параметрами и тело (JSON - с
+    упорядоченными ключами, дата промпта заменена меткой); заголовки, в том
+    числе ключи API, не учитываются.
+    """
+    try:
+        canonical_text = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False)
+        canonical = _PROMPT_DATE.sub("<date>", canonical_text).encode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        canonical = body
+    digest = hashlib.sha256()
+    for part in (upstream.encode(), method.upper().encode(), url.encode("utf-8"), canonical):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _encode_body(content: bytes) -> Dict[str, str]:
+    try:
+        return {"body": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_base64": base64.b64encode(content).decode("ascii")}
+
+
+def _decode_body(entry: Dict[str, Any]) -> bytes:
+    if "body_base64" in entry:
+        return base64.b64decode(entry["body_base64"])
+    return entry.get("body", "").encode("utf-8")
+
+
+class Cassette:
+    """
+    Файл записанных пар запрос/ответ апстримов (JSON Lines в gzip)
+
+    Каждая запись дописывается отдельным gzip-членом, поэтому файл читается
+    целиком даже после аварийного завершения записи. При воспроизведении
+    повторные запросы с одним ключом получают записанные ответы по порядку,
+    после последнего - снова с первого.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._positions: Dict[str, int] = {}
+        self.stats = {"recorded": 0, "replayed": 0, "misses": 0}
+
+    def load(self) -> "Cassette":
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry["key"], []).append(entry)
+        return self
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def record(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line)
+            self._entries.setdefault(entry["key"], []).append(entry)
+            self.stats["recorded"] += 1
+
+    def next(self, key: str) -> Optional[Dict[str, Any]]:
+        """Очередной записанный ответ для ключа или None"""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.stats["misses"] += 1
+                return None
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            self.stats["replayed"] += 1
+            return entries[position % len(entries)]
+
+
+_cassette: Optional[Cassette] = None
+_cassette_key = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Cassette:
+    """Кассета процесса (CASSETTE_FILE); в режиме replay загружается при первом обращении"""
+    global _cassette, _cassette_key
+    key = (cassette_path(), cassette_mode())
+    if _cassette is None or _cassette_key != key:
+        with _cassette_lock:
+            if _cassette is None or _cassette_key != key:
+                path, mode = key
+                cassette = Cassette(path)
+                if mode == "replay":
+                    cassette.load()
+                    print(f"[cassette] воспроизведение {path}: {len(cassette)} ответов")
+                else:
+                    print(f"[cassette] запись в {path}")
+                _cassette, _cassette_key = cassette, key
+    return _cassette
+
+
+def cassette_stats() -> Optional[Dict[str, Any]]:
+    if cassette_mode() == "off" or _cassette is None:
+        return None
+    return {"mode": cassette_mode(), "path": _cassette.path, **_cassette.stats}
+
+
+def cassette_transport(upstream: str, transport):
+    """
+    Обернуть транспорт апстрима записью или воспроизведением кассеты (CASSETTE_MODE)
+
+    В режиме record запрос уходит в апстрим, а ответ целиком сохраняется вместе с
+    временем ответа. В режиме replay сеть не используется: ответ берётся из кассеты,
+    с CASSETTE_REPLAY_LATENCY > 0 - с исходной задержкой, умноженной на это значение;
+    запрос, которого нет в кассете, завершается CassetteMiss.
+    """
+    import httpx
+
+    mode = cassette_mode()
+    if mode == "off":
+        return transport
+
+    class CassetteMiss(httpx.TransportError):
+        pass
+
+    class CassetteTransport(httpx.BaseTransport):
+        def __init__(self, inner):
+            self.inner = inner
+
+        def handle_request(self, request):
+            body = request.read()
+            url = request.url.raw_path.decode("ascii")
+            key = request_key(upstream, request.method, url, body)
+            cassette = get_cassette()
+
+            if mode == "replay":
+                entry = cassette.next(key)
+                if entry is None:
+                    raise CassetteMiss(f"нет записи в кассете {cassette.path}: {upstream} {request.method} {url}",
+                                       request=request)
+                scale = float(os.getenv("CASSETTE_REPLAY_LATENCY", "0"))
+                if scale > 0:
+                    time.sleep(entry["elapsed"] * scale)
+                # Поток, а не content: тело читается клиентом и учитывается в bytes_fetched
+                return httpx.Response(entry["status"], headers=entry["headers"],
+                                      stream=httpx.ByteStream(_decode_body(entry)), request=request)
+
+            start = time.monotonic()
+            response = self.inner.handle_request(request)
+            try:
+                content = response.read()
+            finally:
+                response.close()
+            elapsed = time.monotonic() - start
+            headers = {name: value for name, value in response.headers.items()
+                       if name.lower() not in _DROPPED_HEADERS}
+            cassette.record({
+                "key": key,
+                "upstream": upstream,
+                "method": request.method,
+                "url": url,
+                "status": response.status_code,
+                "headers": headers,
+                "elapsed": round(elapsed, 4),
+                **_encode_body(content)
+            })
+            return httpx.Response(response.status_code, headers=headers, stream=httpx.ByteStream(content),
+                                  request=request)
+
+        def close(self):
+            self.inner.close()
+
+    return CassetteTransport(transport)
+
+
+__all__ = [
+    'cassette_mode',
+    'cassette_path',
+    'request_key',
+    'Cassette',
+    'get_cassette',
+    'cassette_stats',
+    'cassette_transport'
+]
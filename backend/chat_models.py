@@ -0,0 +1,20 @@
+from functools import cached_property
+
+import anthropic
+from langchain_anthropic import ChatAnthropic
+
+from backend.http_pool import get_http_client, http_timeout
+
+
+class PooledChatAnthropic(ChatAnthropic):
+    """ChatAnthropic, отправляющий запросы через общий пул HTTP-соединений процесса"""
+
+    @cached_property
+    def _client(self) -> anthropic.Client:
+        params = dict(self._client_params)
+        if self.default_request_timeout is None:
+            params["timeout"] = http_timeout("anthropic")
+        return anthropic.Client(**params, http_client=get_http_client("anthropic"))
+
+
+__all__ = ['PooledChatAnthropic']
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import random
+import pstats
+import cProfile
+import threading
+from io import StringIO
+from typing import Dict, Any, Optional
+
+from backend.tracing import JsonlFileExporter
+
+# Пороги медленного запроса по режимам, секунды; SLOW_REQUEST_THRESHOLDS (JSON) переопределяет
+DEFAULT_SLOW_THRESHOLDS = {
+    "fast": 15.0,
+    "deep": 90.0,
+    "social": 30.0,
+    "academic": 30.0,
+    "finance": 30.0,
+    "auto": 30.0,
+}
+
+# Заголовок, которым администратор запрашивает профиль запроса (значение - PROFILE_TOKEN)
+PROFILE_HEADER = "X-Profile"
+
+# Сколько функций профиля включать в сводку
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "25"))
+
+
+def slow_thresholds() -> Dict[str, float]:
+    thresholds = dict(DEFAULT_SLOW_THRESHOLDS)
+    raw = os.getenv("SLOW_REQUEST_THRESHOLDS")
+    if raw:
+        try:
+            thresholds.update({mode: float(value) for mode, value in json.loads(raw).items()})
+        except (ValueError, AttributeError) as e:
+            print(f"Некорректный SLOW_REQUEST_THRESHOLDS: {e}")
+    return thresholds
+
+
+def slow_threshold(mode: str) -> float:
+    """Порог медленного запроса для режима, секунды"""
+    thresholds = slow_thresholds()
+    return thresholds.get(mode, thresholds["auto"])
+
+
+_slow_log: Optional[JsonlFileExporter] = None
+_slow_log_lock = threading.Lock()
+
+
+def _get_slow_log() -> Optional[JsonlFileExporter]:
+    global _slow_log
+    path = os.getenv("SLOW_REQUEST_LOG", "slow_requests.jsonl")
+    if path in ("", "off"):
+        return None
+    if _slow_log is None or _slow_log.path != path:
+        with _slow_log_lock:
+            if _slow_log is None or _slow_log.path != path:
+                _slow_log = JsonlFileExporter(
+                    path,
+                    max_bytes=int(os.getenv("SLOW_REQUEST_LOG_MAX_BYTES", str(50 * 1024 * 1024))),
+                    backups=int(os.getenv("SLOW_REQUEST_LOG_BACKUPS", "3"))
+                )
+    return _slow_log
+
+
+def capture_slow_request(record: Dict[str, Any]) -> bool:
+    """
+    Сохранить контекст запроса, если он медленнее порога своего режима
+
+    Args:
+        record: Контекст запроса: mode, elapsed (секунды), query, routing,
+            stage timings, дерево спанов агента и т.д.
+
+    Returns:
+        True, если запрос записан в журнал медленных запросов
+    """
+    threshold = slow_threshold(record.get("mode") or "auto")
+    if record["elapsed"] < threshold:
+        return False
+    slow_log = _get_slow_log()
+    if slow_log is None:
+        return False
+    record = {"timestamp": time.time(), "threshold": threshold, **record}
+    try:
+        slow_log.export([record])
+    except Exception as e:
+        print(f"[diagnostics] не удалось записать медленный запрос: {e}")
+        return False
+    print(f"[diagnostics] медленный запрос mode={record.get('mode')} {record['elapsed']:.1f} с > {threshold:.0f} с")
+    return True
+
+
+def profile_requested(header_value: Optional[str]) -> bool:
+    """
+    Профилировать ли запрос: заголовок X-Profile с PROFILE_TOKEN
+    или случайная выборка с долей PROFILE_SAMPLE_RATE
+    """
+    token = os.getenv("PROFILE_TOKEN")
+    if token and header_value == token:
+        return True
+    rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    return rate > 0 and random.random() < rate
+
+
+# cProfile в 3.12+ допускает один активный профилировщик на процесс,
+# поэтому одновременно профилируется не больше одного запроса
+_profile_slot = threading.Lock()
+
+
+class RequestProfiler:
+    """
+    CPU-профиль одного запроса (cProfile потока запроса)
+
+    Профилируется поток, обрабатывающий запрос; вызовы инструментов, которые
+    LangGraph выполняет в своих потоках, в профиль не попадают.
+    """
+
+    def __init__(self, profile_id: str):
+        self.profile_id = profile_id
+        self._profile = cProfile.Profile()
+        self._active = False
+
+    def start(self) -> bool:
+        """Начать профилирование; False, если уже профилируется другой запрос"""
+        if not _profile_slot.acquire(blocking=False):
+            return False
+        try:
+            self._profile.enable()
+        except ValueError:
+            _profile_slot.release()
+            return False
+        self._active = True
+        return True
+
+    def stop(self) -> Optional[Dict[str, Any]]:
+        """
+        Остановить профилирование и сохранить профиль в PROFILE_DIR
+
+        Returns:
+            {"path", "top"}: файл .prof (для pstats/snakeviz) и сводка
+            самых затратных функций по суммарному времени
+        """
+        if not self._active:
+            return None
+        self._profile.disable()
+        self._active = False
+        _profile_slot.release()
+
+        directory = os.getenv("PROFILE_DIR", "profiles")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.profile_id}.prof")
+        self._profile.dump_stats(path)
+
+        output = StringIO()
+        stats = pstats.Stats(self._profile, stream=output)
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+        return {"path": path, "top": output.getvalue()}
+
+
+__all__ = [
+    'DEFAULT_SLOW_THRESHOLDS',
+    'PROFILE_HEADER',
+    'slow_thresholds',
+    'slow_threshold',
+    'capture_slow_request',
+    'profile_requested',
+    'RequestProfiler'
+]
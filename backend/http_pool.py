@@ -0,0 +1,302 @@
+import os
+import time
+import socket
+import threading
+from typing import Dict, Any
+
+from backend.tracing import record_span
+from backend.accounting import current_account
+from backend.cassettes import cassette_transport
+from backend.resilience import current_cancel_scope
+
+# Базовые адреса апстримов (для прогрева соединений и клиента Tavily)
+UPSTREAM_BASE_URLS = {
+    "tavily": lambda: os.getenv("TAVILY_BASE_URL", "https://api.tavily.com"),
+    "openai": lambda: os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1",
+    "anthropic": lambda: os.getenv("ANTHROPIC_API_URL") or os.getenv("ANTHROPIC_BASE_URL") or "https://api.anthropic.com",
+}
+
+# Параметры пула по умолчанию; <UPSTREAM>_HTTP_<NAME> переопределяет HTTP_<NAME> для апстрима
+POOL_DEFAULTS = {
+    "MAX_CONNECTIONS": "100",
+    "MAX_KEEPALIVE": "20",
+    "KEEPALIVE_EXPIRY": "60",
+    "CONNECT_TIMEOUT": "5",
+    "READ_TIMEOUT": "120",
+    "HTTP2": "0",
+}
+
+_clients: Dict[str, Any] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+_http2_upstreams = set()
+_lock = threading.Lock()
+
+
+def pool_setting(upstream: str, name: str) -> str:
+    """Значение параметра пула для апстрима: <UPSTREAM>_HTTP_<NAME>, затем HTTP_<NAME>"""
+    value = os.getenv(f"{upstream.upper()}_HTTP_{name}")
+    if value is None:
+        value = os.getenv(f"HTTP_{name}", POOL_DEFAULTS[name])
+    return value
+
+
+def _http2_enabled(upstream: str) -> bool:
+    if pool_setting(upstream, "HTTP2").lower() not in ("1", "true", "yes"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        print(f"[http] {upstream}: HTTP/2 требует пакет h2 (pip install 'httpx[http2]'), используется HTTP/1.1")
+        return False
+    return True
+
+
+def http_timeout(upstream: str):
+    """Таймауты запросов к апстриму по умолчанию"""
+    import httpx
+    return httpx.Timeout(float(pool_setting(upstream, "READ_TIMEOUT")),
+                         connect=float(pool_setting(upstream, "CONNECT_TIMEOUT")))
+
+
+def _counters(upstream: str) -> Dict[str, int]:
+    return _stats.setdefault(upstream, {
+        "requests": 0, "responses": 0, "errors": 0, "connections_opened": 0, "tls_handshakes": 0
+    })
+
+
+def _traced_transport(upstream: str, transport):
+    """
+    Транспорт, записывающий каждый HTTP-вызов апстрима спаном текущей трассы
+    и учитывающий полученные байты тела ответа в учёте запроса
+    """
+    import httpx
+
+    class CountingStream(httpx.SyncByteStream):
+        def __init__(self, stream, account):
+            self.stream = stream
+            self.account = account
+
+        def __iter__(self):
+            for chunk in self.stream:
+                self.account.count("bytes_fetched", len(chunk))
+                yield chunk
+
+        def close(self):
+            self.stream.close()
+
+    class TracedTransport(httpx.BaseTransport):
+        def __init__(self, inner):
+            self.inner = inner
+
+        def handle_request(self, request):
+            # Отменённый вызов (проигравший хедж) не отправляет новых запросов
+            scope = current_cancel_scope()
+            if scope is not None:
+                scope.check()
+            start = time.time()
+            try:
+                response = self.inner.handle_request(request)
+            except Exception as e:
+                record_span(f"http:{upstream}", start, time.time() - start, error=f"{type(e).__name__}: {e}",
+                            method=request.method, url=str(request.url.copy_with(query=None)))
+                raise
+            record_span(f"http:{upstream}", start, time.time() - start,
+                        method=request.method, url=str(request.url.copy_with(query=None)),
+                        status=response.status_code)
+            account = current_account()
+            if account is not None:
+                response.stream = CountingStream(response.stream, account)
+            return response
+
+        def close(self):
+            self.inner.close()
+
+    return TracedTransport(transport)
+
+
+def _cancellable_backend(backend):
+    """
+    Сетевой уровень httpcore, соединения которого можно оборвать при отмене
+    вызова: пока поток ждёт ответа, отмена области (CancelScope) закрывает
+    сокет, и апстрим видит разрыв соединения вместо дочитанного ответа
+    """
+    import httpcore
+
+    class CancellableStream(httpcore.NetworkStream):
+        def __init__(self, inner):
+            self.inner = inner
+
+        def _abort(self):
+            sock = self.inner.get_extra_info("socket")
+            if sock is not None:
+                try:
+                    # shutdown на уровне дескриптора прерывает чтение в другом потоке (и для TLS)
+                    socket.socket.shutdown(sock, socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+        def _guarded(self, operation, *args, **kwargs):
+            scope = current_cancel_scope()
+            if scope is None:
+                return operation(*args, **kwargs)
+            with scope.guard(self._abort):
+                return operation(*args, **kwargs)
+
+        def read(self, max_bytes, timeout=None):
+            return self._guarded(self.inner.read, max_bytes, timeout)
+
+        def write(self, buffer, timeout=None):
+            return self._guarded(self.inner.write, buffer, timeout)
+
+        def close(self):
+            self.inner.close()
+
+        def start_tls(self, ssl_context, server_hostname=None, timeout=None):
+            return CancellableStream(self.inner.start_tls(ssl_context, server_hostname, timeout))
+
+        def get_extra_info(self, info):
+            return self.inner.get_extra_info(info)
+
+    class CancellableBackend(httpcore.NetworkBackend):
+        def __init__(self, inner):
+            self.inner = inner
+
+        def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+            return CancellableStream(self.inner.connect_tcp(host, port, timeout, local_address, socket_options))
+
+        def connect_unix_socket(self, path, timeout=None, socket_options=None):
+            return CancellableStream(self.inner.connect_unix_socket(path, timeout, socket_options))
+
+        def sleep(self, seconds):
+            self.inner.sleep(seconds)
+
+    return CancellableBackend(backend)
+
+
+def _create_client(upstream: str):
+    import httpx
+
+    def trace(event: str, info: Dict[str, Any]):
+        # Открытие TCP-соединения и TLS-рукопожатие - признак того, что соединение не переиспользовано
+        if event == "connection.connect_tcp.complete":
+            with _lock:
+                _counters(upstream)["connections_opened"] += 1
+        elif event == "connection.start_tls.complete":
+            with _lock:
+                _counters(upstream)["tls_handshakes"] += 1
+
+    def on_request(request):
+        request.extensions["trace"] = trace
+        with _lock:
+            _counters(upstream)["requests"] += 1
+
+    def on_response(response):
+        with _lock:
+            counters = _counters(upstream)
+            counters["responses"] += 1
+            if response.status_code >= 500:
+                counters["errors"] += 1
+
+    http2 = _http2_enabled(upstream)
+    if http2:
+        _http2_upstreams.add(upstream)
+    transport = httpx.HTTPTransport(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=int(pool_setting(upstream, "MAX_CONNECTIONS")),
+            max_keepalive_connections=int(pool_setting(upstream, "MAX_KEEPALIVE")),
+            keepalive_expiry=float(pool_setting(upstream, "KEEPALIVE_EXPIRY"))
+        )
+    )
+    # Пул httpcore создаёт соединения через этот сетевой уровень
+    transport._pool._network_backend = _cancellable_backend(transport._pool._network_backend)
+    return httpx.Client(
+        transport=_traced_transport(upstream, cassette_transport(upstream, transport)),
+        timeout=http_timeout(upstream),
+        event_hooks={"request": [on_request], "response": [on_response]}
+    )
+
+
+def get_http_client(upstream: str):
+    """
+    Общий для процесса HTTP-клиент апстрима (tavily, openai, anthropic)
+
+    Клиент потокобезопасен и держит пул keep-alive соединений, поэтому TLS-
+    рукопожатие выполняется один раз на соединение, а не на каждый вызов.
+    Создаётся при первом обращении; после fork воркер создаёт собственный.
+    """
+    client = _clients.get(upstream)
+    if client is None:
+        with _lock:
+            client = _clients.get(upstream)
+            if client is None:
+                client = _clients[upstream] = _create_client(upstream)
+    return client
+
+
+def _pool_connections(client) -> Dict[str, int]:
+    # Состояние соединений httpcore; без пула (например, MockTransport) - пусто
+    transport = getattr(client, "_transport", None)
+    while hasattr(transport, "inner"):
+        transport = transport.inner
+    pool = getattr(transport, "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+def http_pool_stats() -> Dict[str, Any]:
+    """Статистика пулов: запросы, новые соединения, доля переиспользованных и открытые соединения"""
+    with _lock:
+        clients = dict(_clients)
+        counters = {upstream: dict(values) for upstream, values in _stats.items()}
+    stats = {}
+    for upstream, client in clients.items():
+        values = counters.get(upstream, {})
+        requests = values.get("requests", 0)
+        opened = values.get("connections_opened", 0)
+        stats[upstream] = {
+            **values,
+            "reused_ratio": round(max(requests - opened, 0) / requests, 3) if requests else 0.0,
+            "connections": _pool_connections(client),
+            "max_connections": int(pool_setting(upstream, "MAX_CONNECTIONS")),
+            "max_keepalive": int(pool_setting(upstream, "MAX_KEEPALIVE")),
+            "http2": upstream in _http2_upstreams
+        }
+    return stats
+
+
+def warm_pool(upstream: str, timeout: float = 5.0) -> int:
+    """
+    Открыть соединение с апстримом заранее: любой ответ (в том числе 401/404)
+    оставляет в пуле готовое TLS-соединение
+
+    Returns:
+        HTTP-статус ответа
+    """
+    response = get_http_client(upstream).get(UPSTREAM_BASE_URLS[upstream](), timeout=timeout)
+    return response.status_code
+
+
+def reset_http_clients():
+    """Забыть клиенты (после fork соединения родителя не используются)"""
+    global _lock
+    _clients.clear()
+    _stats.clear()
+    _http2_upstreams.clear()
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_http_clients)
+
+
+__all__ = [
+    'UPSTREAM_BASE_URLS',
+    'pool_setting',
+    'http_timeout',
+    'get_http_client',
+    'http_pool_stats',
+    'warm_pool',
+    'reset_http_clients'
+]
@@ -0,0 +1,395 @@
+import os
+import abc
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable
+
+from backend.admission import AdmissionRejected
+from backend.tracing import start_trace, current_trace_id
+
+# Статусы фонового задания
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+
+class JobStore(abc.ABC):
+    """
+    Хранилище фоновых заданий
+
+    Задание - словарь с полями id, mode, query, status, stage, version,
+    created_at, updated_at, expires_at, result, error, owner_pid. Поле version
+    растёт при каждом изменении, по нему клиенты ждут обновления (long-poll);
+    updated_at обновляется и пульсом процесса-владельца без смены версии.
+    """
+
+    @abc.abstractmethod
+    def create(self, job: Dict[str, Any]):
+        """Сохранить новое задание"""
+
+    @abc.abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Задание по id или None, если его нет или срок хранения истёк"""
+
+    @abc.abstractmethod
+    def update(self, job_id: str, **fields) -> Optional[Dict[str, Any]]:
+        """Изменить поля задания и увеличить version; None, если задания нет"""
+
+    @abc.abstractmethod
+    def purge_expired(self) -> int:
+        """Удалить задания с истёкшим сроком хранения; число удалённых"""
+
+    @abc.abstractmethod
+    def touch(self, job_ids: List[str]):
+        """Обновить updated_at незавершённых заданий (пульс владельца), не меняя version"""
+
+    @abc.abstractmethod
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """Незавершённые задания (queued и running) с неистёкшим сроком"""
+
+    def wait(self, job_id: str, version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Дождаться версии задания новее version или завершения задания
+
+        Returns:
+            Задание (возможно, не изменившееся, если истёк timeout) или None
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["version"] > version or job["status"] in FINISHED:
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            time.sleep(min(0.2, remaining))
+
+
+class MemoryJobStore(JobStore):
+    """Хранилище заданий в памяти процесса"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+
+    def create(self, job: Dict[str, Any]):
+        with self._cond:
+            self._jobs[job["id"]] = dict(job)
+            self._cond.notify_all()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or _expired(job):
+                return None
+            return dict(job)
+
+    def update(self, job_id: str, **fields) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(fields, version=job["version"] + 1, updated_at=time.time())
+            self._cond.notify_all()
+            return dict(job)
+
+    def purge_expired(self) -> int:
+        with self._cond:
+            expired = [job_id for job_id, job in self._jobs.items() if _expired(job)]
+            for job_id in expired:
+                del self._jobs[job_id]
+            return len(expired)
+
+    def touch(self, job_ids: List[str]):
+        now = time.time()
+        with self._cond:
+            for job_id in job_ids:
+                job = self._jobs.get(job_id)
+                if job is not None and job["status"] not in FINISHED:
+                    job["updated_at"] = now
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            return [dict(job) for job in self._jobs.values() if job["status"] not in FINISHED and not _expired(job)]
+
+    def wait(self, job_id: str, version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or _expired(job):
+                    return None
+                remaining = deadline - time.monotonic()
+                if job["version"] > version or job["status"] in FINISHED or remaining <= 0:
+                    return dict(job)
+                self._cond.wait(remaining)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Хранилище заданий в файле SQLite
+
+    Позволяет нескольким процессам-воркерам на одном хосте видеть общие задания:
+    задание выполняет процесс, принявший его, а статус доступен из любого.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Схема создаётся отдельным подключением: хранилище может быть создано
+        # в мастер-процессе до fork, а подключения SQLite нельзя делить между процессами
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Подключение на поток; после fork подключение родителя не используется
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, job: Dict[str, Any]):
+        self._connect().execute(
+            "INSERT INTO jobs (id, data, expires_at) VALUES (?, ?, ?)",
+            (job["id"], json.dumps(job, ensure_ascii=False), job.get("expires_at"))
+        )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = json.loads(row[0])
+        return None if _expired(job) else job
+
+    def update(self, job_id: str, **fields) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            job = json.loads(row[0])
+            job.update(fields, version=job["version"] + 1, updated_at=time.time())
+            conn.execute(
+                "UPDATE jobs SET data = ?, expires_at = ? WHERE id = ?",
+                (json.dumps(job, ensure_ascii=False), job.get("expires_at"), job_id)
+            )
+            conn.execute("COMMIT")
+            return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def purge_expired(self) -> int:
+        cursor = self._connect().execute(
+            "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+        )
+        return cursor.rowcount
+
+    def touch(self, job_ids: List[str]):
+        if not job_ids:
+            return
+        self._connect().executemany(
+            "UPDATE jobs SET data = json_set(data, '$.updated_at', ?) "
+            "WHERE id = ? AND json_extract(data, '$.status') IN (?, ?)",
+            [(time.time(), job_id, QUEUED, RUNNING) for job_id in job_ids]
+        )
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT data FROM jobs WHERE json_extract(data, '$.status') IN (?, ?)", (QUEUED, RUNNING)
+        ).fetchall()
+        jobs = [json.loads(row[0]) for row in rows]
+        return [job for job in jobs if not _expired(job)]
+
+
+def _expired(job: Dict[str, Any]) -> bool:
+    return job.get("expires_at") is not None and job["expires_at"] < time.time()
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobManager:
+    """
+    Фоновое выполнение поисковых запросов
+
+    Задание ставится в хранилище и сразу возвращается клиенту, пул потоков
+    выполняет его функцией runner(query, mode, progress). Runner проходит тот же
+    контроль допуска, что и синхронные эндпоинты; при отказе допуска задание
+    повторяется через Retry-After, пока не истечёт capacity_wait секунд, затем
+    завершается ошибкой. Завершённые задания хранятся ttl секунд.
+
+    Процесс-владелец раз в stale_after / 4 секунд обновляет updated_at своих
+    незавершённых заданий. Задание, чей владелец завершился (воркер gunicorn
+    перезапущен по max_requests) или не подавал пульс дольше stale_after,
+    при чтении и очистке помечается failed. Незавершённое задание в любом
+    случае удаляется через capacity_wait + ttl секунд после создания.
+    """
+
+    def __init__(self, store: JobStore, runner: Callable[[str, str, Callable[[str], None]], Dict[str, Any]],
+                 workers: int = 4, ttl: float = 3600.0, capacity_wait: float = 600.0, stale_after: float = 60.0):
+        self.store = store
+        self.runner = runner
+        self.ttl = ttl
+        self.capacity_wait = capacity_wait
+        self.stale_after = stale_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search-job")
+        self._active: set = set()
+        self._active_lock = threading.Lock()
+        self._heartbeat_pid: Optional[int] = None
+
+    def submit(self, query: str, mode: str) -> Dict[str, Any]:
+        """Создать задание и поставить его в очередь выполнения"""
+        self.purge()
+        self._start_heartbeat()
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "mode": mode,
+            "query": query,
+            "status": QUEUED,
+            "stage": None,
+            "version": 0,
+            "created_at": now,
+            "updated_at": now,
+            # Срок хранения отсчитывается от завершения; брошенное задание удаляется не позже этого срока
+            "expires_at": now + self.capacity_wait + self.ttl,
+            "result": None,
+            "error": None,
+            # Трасса выполнения задания пишется с идентификатором трассы запроса на создание
+            "trace_id": current_trace_id(),
+            "owner_pid": os.getpid()
+        }
+        self.store.create(job)
+        with self._active_lock:
+            self._active.add(job["id"])
+        self._executor.submit(self._run, job["id"], query, mode, job["trace_id"])
+        return job
+
+    def get(self, job_id: str, wait: float = 0.0, version: int = -1) -> Optional[Dict[str, Any]]:
+        """
+        Получить задание; при wait > 0 дождаться изменения после версии version
+        """
+        job = self.store.wait(job_id, version, wait) if wait > 0 else self.store.get(job_id)
+        return self._fail_if_abandoned(job)
+
+    def purge(self) -> int:
+        """Пометить брошенные задания failed и удалить задания с истёкшим сроком"""
+        for job in self.store.unfinished():
+            self._fail_if_abandoned(job)
+        return self.store.purge_expired()
+
+    def _abandoned(self, job: Dict[str, Any]) -> bool:
+        if job["status"] in FINISHED:
+            return False
+        if time.time() - job["updated_at"] > self.stale_after:
+            return True
+        owner = job.get("owner_pid")
+        return owner is not None and owner != os.getpid() and not _process_alive(owner)
+
+    def _fail_if_abandoned(self, job: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if job is None or not self._abandoned(job):
+            return job
+        print(f"[jobs] задание {job['id']} брошено процессом {job.get('owner_pid')}")
+        failed = self.store.update(job["id"], status=FAILED, stage=None,
+                                   error="процесс, выполнявший задание, завершился",
+                                   expires_at=time.time() + self.ttl)
+        return failed or job
+
+    def _start_heartbeat(self):
+        # После fork (preload_app) поток пульса запускает каждый воркер
+        if self._heartbeat_pid == os.getpid():
+            return
+        with self._active_lock:
+            if self._heartbeat_pid == os.getpid():
+                return
+            self._heartbeat_pid = os.getpid()
+            self._active = set()
+        threading.Thread(target=self._heartbeat, name="search-job-heartbeat", daemon=True).start()
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.stale_after / 4)
+            with self._active_lock:
+                job_ids = list(self._active)
+            try:
+                self.store.touch(job_ids)
+            except Exception as e:
+                print(f"[jobs] не удалось обновить пульс заданий: {e}")
+
+    def _run(self, job_id: str, query: str, mode: str, trace_id: Optional[str] = None):
+        try:
+            with start_trace("job", trace_id=trace_id, job_id=job_id, mode=mode):
+                self._execute(job_id, query, mode)
+        finally:
+            with self._active_lock:
+                self._active.discard(job_id)
+
+    def _execute(self, job_id: str, query: str, mode: str):
+        progress = lambda stage: self.store.update(job_id, status=RUNNING, stage=stage)
+        deadline = time.monotonic() + self.capacity_wait
+        try:
+            while True:
+                try:
+                    result = self.runner(query, mode, progress)
+                    break
+                except AdmissionRejected as e:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise RuntimeError(f"нет свободной мощности за {self.capacity_wait:.0f} с: {e.reason}") from e
+                    self.store.update(job_id, status=QUEUED, stage="waiting_for_capacity")
+                    # Retry-After бывает нулевым: не крутить цикл вхолостую
+                    time.sleep(min(max(e.retry_after, 0.1), remaining))
+            self.store.update(job_id, status=SUCCEEDED, stage=None, result=result,
+                              expires_at=time.time() + self.ttl)
+        except Exception as e:
+            print(f"[jobs] задание {job_id} завершилось ошибкой: {e}")
+            self.store.update(job_id, status=FAILED, stage=None, error=str(e),
+                              expires_at=time.time() + self.ttl)
+
+
+def create_job_store() -> JobStore:
+    """Хранилище заданий по JOB_STORE: memory (по умолчанию) или sqlite (файл JOB_STORE_PATH)"""
+    if os.getenv("JOB_STORE", "memory").lower() == "sqlite":
+        return SQLiteJobStore(os.getenv("JOB_STORE_PATH", "data/jobs.sqlite3"))
+    return MemoryJobStore()
+
+
+__all__ = [
+    'QUEUED',
+    'RUNNING',
+    'SUCCEEDED',
+    'FAILED',
+    'JobStore',
+    'MemoryJobStore',
+    'SQLiteJobStore',
+    'JobManager',
+    'create_job_store'
+]
@@ -0,0 +1,100 @@
+import os
+from typing import Dict, Any, List
+
+# Пороги деградации (переопределяются переменными окружения)
+DEGRADE_ENABLED = os.getenv("LOAD_DEGRADE", "1").lower() not in ("0", "false", "no")
+LLM_P90_SLOW = float(os.getenv("LOAD_LLM_P90_SLOW", "20"))
+TAVILY_P90_SLOW = float(os.getenv("LOAD_TAVILY_P90_SLOW", "8"))
+DEGRADED_DEEP_TOOL_BUDGET = int(os.getenv("DEGRADED_DEEP_TOOL_BUDGET", "3"))
+DEGRADED_TOOL_BUDGET = int(os.getenv("DEGRADED_TOOL_BUDGET", "2"))
+
+# Режимы, для которых под нагрузкой сокращается бюджет инструментов
+BUDGETED_MODES = ("academic", "finance")
+
+
+def current_load(admission_stats: Dict[str, Any],
+                 llm_stats: Dict[str, Any],
+                 tavily_stats: Dict[str, Any],
+                 llm_provider: str) -> Dict[str, Any]:
+    """
+    Собрать снимок нагрузки узла из статистики допуска и апстримов
+
+    Args:
+        admission_stats: AdmissionController.stats()
+        llm_stats: provider_stats()
+        tavily_stats: TavilyGateway.stats()
+        llm_provider: Основной провайдер LLM (MODEL_TYPE)
+
+    Returns:
+        Снимок нагрузки для plan_mode
+    """
+    llm = llm_stats.get("providers", {}).get(f"llm:{llm_provider}", {})
+    tavily = tavily_stats.get("breaker", {})
+    return {
+        "in_flight": admission_stats.get("in_flight", 0),
+        "max_concurrent": admission_stats.get("max_concurrent", 0),
+        "modes": admission_stats.get("modes", {}),
+        "llm_p90": llm.get("p90"),
+        "tavily_p90": tavily.get("p90"),
+        "upstream_open": llm.get("state") == "open" or tavily.get("state") == "open"
+    }
+
+
+def _upstream_reasons(load: Dict[str, Any]) -> List[str]:
+    reasons = []
+    if load.get("llm_p90") is not None and load["llm_p90"] > LLM_P90_SLOW:
+        reasons.append(f"LLM p90 {load['llm_p90']:.1f}s")
+    if load.get("tavily_p90") is not None and load["tavily_p90"] > TAVILY_P90_SLOW:
+        reasons.append(f"Tavily p90 {load['tavily_p90']:.1f}s")
+    if load.get("upstream_open"):
+        reasons.append("upstream circuit open")
+    return reasons
+
+
+def plan_mode(mode: str, load: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Выбрать режим выполнения с учётом нагрузки
+
+    - deep при сильной перегрузке (глубокая очередь или занятые слоты при
+      медленных апстримах) понижается до fast, при умеренной - выполняется
+      как ограниченный deep с малым бюджетом инструментов;
+    - academic и finance под нагрузкой выполняются с сокращённым бюджетом.
+
+    Args:
+        mode: Режим, выбранный маршрутизатором
+        load: Снимок нагрузки из current_load
+
+    Returns:
+        Словарь {"mode", "tool_budget", "degraded", "reason"}
+    """
+    plan = {"mode": mode, "tool_budget": None, "degraded": False, "reason": None}
+    if not DEGRADE_ENABLED:
+        return plan
+
+    mode_load = load.get("modes", {}).get(mode, {})
+    reasons = []
+    queue_depth = mode_load.get("queue_depth", 0)
+    if queue_depth > 0:
+        reasons.append(f"{mode} queue depth {queue_depth}")
+    if mode_load and mode_load.get("in_flight", 0) >= mode_load.get("concurrency", 1):
+        reasons.append(f"{mode} in flight {mode_load['in_flight']}/{mode_load['concurrency']}")
+    if load.get("max_concurrent") and load.get("in_flight", 0) >= load["max_concurrent"]:
+        reasons.append(f"node in flight {load['in_flight']}/{load['max_concurrent']}")
+    upstream = _upstream_reasons(load)
+
+    if mode == "deep":
+        severe = queue_depth >= max(mode_load.get("queue_limit", 2) // 2, 1) or (reasons and upstream)
+        if severe:
+            plan.update(mode="fast", degraded=True, reason="; ".join(reasons + upstream))
+        elif reasons or upstream:
+            plan.update(tool_budget=DEGRADED_DEEP_TOOL_BUDGET, degraded=True,
+                        reason="; ".join(reasons + upstream))
+    elif mode in BUDGETED_MODES and (reasons or upstream):
+        plan.update(tool_budget=DEGRADED_TOOL_BUDGET, degraded=True, reason="; ".join(reasons + upstream))
+
+    if plan["degraded"]:
+        print(f"[load] {mode} -> {plan['mode']} (бюджет {plan['tool_budget']}): {plan['reason']}")
+    return plan
+
+
+__all__ = ['current_load', 'plan_mode']
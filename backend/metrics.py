@@ -0,0 +1,574 @@
+import os
+import glob
+import json
+import time
+import bisect
+import atexit
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: без межпроцессной блокировки
+    fcntl = None
+
+from backend.tracing import span, annotate
+from backend import accounting
+
+# Метрики можно отключить (METRICS=0): вызовы записи становятся пустыми
+METRICS_ENABLED = os.getenv("METRICS", "1").lower() not in ("0", "false", "no")
+
+# Границы корзин гистограмм задержки, секунды
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+# Границы корзин числа вызовов инструментов на запрос
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13)
+# Границы корзин времени ожидания в очереди допуска, секунды
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Период записи снимка метрик процесса в PROMETHEUS_MULTIPROC_DIR, секунды
+METRICS_SNAPSHOT_INTERVAL = float(os.getenv("METRICS_SNAPSHOT_INTERVAL", "1"))
+
+# Этапы метрик в учёте времени запроса (Server-Timing)
+ACCOUNT_STAGES = {
+    "routing": "route",
+    "agent_iteration": "agent",
+    "final": "agent",
+    "sources": "sources",
+    "summarize": "summarize",
+}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def multiproc_dir() -> Optional[str]:
+    """Каталог снимков метрик воркеров (PROMETHEUS_MULTIPROC_DIR); None - метрики только процесса"""
+    return os.getenv("PROMETHEUS_MULTIPROC_DIR") or None
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Counter:
+    """Монотонный счётчик с метками в формате Prometheus"""
+
+    kind = "counter"
+    # Суммировать только снимки живых процессов (для текущих значений, а не накопленных)
+    live_only = False
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        self.on_change = lambda: None
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self.on_change()
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self) -> List[list]:
+        """Значения для снимка процесса: [[метки, значение], ...]"""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, values: Dict[Tuple[str, ...], float], snapshot: List[list]):
+        """Прибавить снимок другого процесса к накопленным значениям"""
+        for key, value in snapshot:
+            values[tuple(key)] = values.get(tuple(key), 0) + value
+
+    def dump(self, values: Dict[Tuple[str, ...], float]) -> List[list]:
+        """Снимок из значений, накопленных merge"""
+        return [[list(key), value] for key, value in values.items()]
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], float]] = None) -> List[str]:
+        if values is None:
+            with self._lock:
+                values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Gauge(Counter):
+    """
+    Текущее значение с метками (например, глубина очереди); по воркерам
+    суммируются значения только живых процессов
+    """
+
+    kind = "gauge"
+    live_only = True
+
+    def set(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+        self.on_change()
+
+
+class Histogram:
+    """Гистограмма с накопительными корзинами, суммой и числом наблюдений"""
+
+    kind = "histogram"
+    live_only = False
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Для каждого набора меток: счётчики корзин (последняя - +Inf), сумма
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+        self.on_change = lambda: None
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+        self.on_change()
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return sum(entry[0]) if entry else 0
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self) -> List[list]:
+        """Значения для снимка процесса: [[метки, счётчики корзин, сумма], ...]"""
+        with self._lock:
+            return [[list(key), list(counts), total[0]] for key, (counts, total) in self._values.items()]
+
+    def merge(self, values: Dict[Tuple[str, ...], Tuple[List[int], float]], snapshot: List[list]):
+        """Прибавить снимок другого процесса к накопленным значениям"""
+        for key, counts, total in snapshot:
+            current = values.get(tuple(key))
+            if current is None:
+                values[tuple(key)] = (list(counts), total)
+            else:
+                values[tuple(key)] = ([a + b for a, b in zip(current[0], counts)], current[1] + total)
+
+    def dump(self, values: Dict[Tuple[str, ...], Tuple[List[int], float]]) -> List[list]:
+        """Снимок из значений, накопленных merge"""
+        return [[list(key), list(counts), total] for key, (counts, total) in values.items()]
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], Tuple[List[int], float]]] = None) -> List[str]:
+        if values is None:
+            with self._lock:
+                values = {key: (list(counts), total[0]) for key, (counts, total) in self._values.items()}
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Набор метрик, отдаваемый в текстовом формате Prometheus
+
+    Без PROMETHEUS_MULTIPROC_DIR отдаются значения процесса. С ним каждый
+    процесс, записавший метрики, раз в METRICS_SNAPSHOT_INTERVAL секунд
+    сохраняет снимок своих значений в отдельный файл каталога, а render
+    любого воркера суммирует снимки всех процессов. Снимки завершившихся
+    воркеров при чтении сворачиваются в общий файл AGGREGATE_FILE и
+    удаляются, поэтому счётчики и гистограммы не убывают при перезапуске
+    воркеров, а число файлов не растёт; текущие значения (Gauge) завершившихся
+    воркеров отбрасываются. Каталог очищается при старте сервера
+    (gunicorn.conf.py). Значения, унаследованные воркером от мастера при
+    fork, обнуляются: они учтены в снимке мастера.
+    """
+
+    AGGREGATE_FILE = "metrics_aggregate.json"
+
+    def __init__(self, directory: Optional[str] = None):
+        self._metrics: Dict[str, Any] = {}
+        # Явный каталог (для тестов) или PROMETHEUS_MULTIPROC_DIR
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._writer_pid: Optional[int] = None
+        self._snapshot_path: Optional[str] = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def directory(self) -> Optional[str]:
+        return self._directory or multiproc_dir()
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        metric.on_change = self._changed
+        return metric
+
+    def _changed(self):
+        self._dirty = True
+        if self._writer_pid != os.getpid() and self.directory:
+            self._start_writer()
+
+    def _start_writer(self):
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+            # Время старта в имени: воркер с тем же pid не затирает снимок завершившегося
+            self._snapshot_path = os.path.join(self.directory, f"metrics_{os.getpid()}_{time.time_ns()}.json")
+        threading.Thread(target=self._write_loop, args=(os.getpid(),), name="metrics-snapshot", daemon=True).start()
+        atexit.register(self.write_snapshot)
+
+    def _write_loop(self, pid: int):
+        while self._writer_pid == pid:
+            time.sleep(METRICS_SNAPSHOT_INTERVAL)
+            if self._dirty or not os.path.exists(self._snapshot_path):
+                self.write_snapshot()
+
+    def _after_fork(self):
+        for metric in self._metrics.values():
+            metric.reset()
+        self._dirty = False
+        self._writer_pid = None
+        self._snapshot_path = None
+
+    def write_snapshot(self):
+        """Сохранить значения процесса в его файл каталога снимков"""
+        path = self._snapshot_path
+        if path is None or self._writer_pid != os.getpid():
+            return
+        self._dirty = False
+        data = {name: metric.snapshot() for name, metric in self._metrics.items()}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            self._dirty = True
+            print(f"[metrics] не удалось сохранить снимок {path}: {e}")
+
+    @contextmanager
+    def _directory_lock(self, directory: str, exclusive: bool):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(directory, "metrics.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _snapshots(self, directory: str) -> List[Tuple[str, bool]]:
+        """Файлы снимков процессов и признак того, что процесс жив"""
+        snapshots = []
+        for path in glob.glob(os.path.join(glob.escape(directory), "metrics_*_*.json")):
+            pid = os.path.basename(path).split("_")[1]
+            snapshots.append((path, not pid.isdigit() or _pid_alive(int(pid))))
+        return snapshots
+
+    @staticmethod
+    def _load(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _fold_dead(self, directory: str):
+        """Прибавить снимки завершившихся процессов к общему файлу и удалить их"""
+        dead = [path for path, alive in self._snapshots(directory) if not alive]
+        if not dead:
+            return
+        with self._directory_lock(directory, exclusive=True):
+            aggregate_path = os.path.join(directory, self.AGGREGATE_FILE)
+            merged: Dict[str, Any] = {}
+            for path in [aggregate_path] + [path for path in dead if os.path.exists(path)]:
+                data = self._load(path) or {}
+                for name, snapshot in data.items():
+                    metric = self._metrics.get(name)
+                    if metric is not None and not metric.live_only:
+                        metric.merge(merged.setdefault(name, {}), snapshot)
+            data = {name: self._metrics[name].dump(values) for name, values in merged.items()}
+            try:
+                with open(aggregate_path + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(aggregate_path + ".tmp", aggregate_path)
+                for path in dead:
+                    if os.path.exists(path):
+                        os.remove(path)
+            except OSError as e:
+                print(f"[metrics] не удалось свернуть снимки завершившихся воркеров: {e}")
+
+    def _collect(self, directory: str) -> Dict[str, Any]:
+        """Сумма снимков всех процессов по метрикам"""
+        self.write_snapshot()
+        self._fold_dead(directory)
+        merged: Dict[str, Any] = {name: {} for name in self._metrics}
+        # Общий файл и снимки читаются под той же блокировкой, что и сворачивание,
+        # иначе снимок мог бы быть учтён дважды или пропущен
+        with self._directory_lock(directory, exclusive=False):
+            sources = [(os.path.join(directory, self.AGGREGATE_FILE), True)] + self._snapshots(directory)
+            for path, alive in sources:
+                data = self._load(path)
+                if data is None:
+                    continue
+                for name, snapshot in data.items():
+                    metric = self._metrics.get(name)
+                    if metric is not None and (alive or not metric.live_only):
+                        metric.merge(merged[name], snapshot)
+        return merged
+
+    def render(self) -> str:
+        directory = self.directory
+        merged = self._collect(directory) if directory else {}
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render(merged.get(metric.name)))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "search_request_seconds",
+    "Длительность запроса /search/* целиком: допуск, маршрутизация, поиск, сериализация",
+    ("mode", "model")))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "search_stage_seconds",
+    "Длительность этапа поиска: routing, agent_iteration, final, sources, summarize",
+    ("stage", "mode", "model")))
+TOOL_CALL_SECONDS = REGISTRY.register(Histogram(
+    "search_tool_call_seconds", "Длительность вызова инструмента агента", ("tool", "mode", "model")))
+TOOL_CALLS = REGISTRY.register(Counter(
+    "search_tool_calls_total", "Вызовы инструментов агента", ("tool", "mode", "model")))
+TOOL_CALLS_PER_REQUEST = REGISTRY.register(Histogram(
+    "search_tool_calls_per_request", "Число вызовов инструментов за один поиск", ("mode", "model"),
+    buckets=COUNT_BUCKETS))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "llm_tokens_total", "Токены LLM: input, output и cache_read (входные, прочитанные из кэша промптов)",
+    ("direction", "mode", "model")))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "search_cache_requests_total", "Обращения к кэшам: result=hit или miss", ("cache", "result", "mode", "model")))
+ERRORS = REGISTRY.register(Counter(
+    "search_errors_total", "Ошибки по типу исключения и этапу", ("type", "stage", "mode", "model")))
+ADMISSION_IN_FLIGHT = REGISTRY.register(Gauge(
+    "admission_in_flight", "Выполняемые запросы по пулам режимов (bulkheads)", ("mode",)))
+ADMISSION_QUEUED = REGISTRY.register(Gauge(
+    "admission_queue_depth", "Запросы, ожидающие допуска в очереди пула режима", ("mode",)))
+ADMISSION_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "admission_wait_seconds", "Время ожидания допуска к выполнению", ("mode",), buckets=WAIT_BUCKETS))
+ADMISSION_REJECTIONS = REGISTRY.register(Counter(
+    "admission_rejections_total", "Отказы в допуске: reason=queue_full (429) или timeout (503)", ("mode", "reason")))
+UPSTREAM_KEY_REQUESTS = REGISTRY.register(Counter(
+    "upstream_key_requests_total", "Вызовы апстримов по API-ключам (ключи маскируются)", ("upstream", "key")))
+UPSTREAM_KEY_WAITS = REGISTRY.register(Counter(
+    "upstream_key_waits_total", "Вызовы, ждавшие свободного токена лимита ключа", ("upstream", "key")))
+UPSTREAM_KEY_THROTTLED = REGISTRY.register(Counter(
+    "upstream_key_throttled_total", "Ответы 429 апстрима по API-ключам", ("upstream", "key")))
+
+# Метки текущего поиска (режим, модель) и счётчик его вызовов инструментов;
+# потоки инструментов LangGraph получают копию контекста и видят те же значения
+_search_labels: contextvars.ContextVar = contextvars.ContextVar("metrics_search_labels", default=None)
+
+
+def current_labels() -> Dict[str, str]:
+    """Метки mode и model текущего поиска (пустые вне поиска)"""
+    labels = _search_labels.get()
+    return {"mode": labels["mode"], "model": labels["model"]} if labels else {"mode": "", "model": ""}
+
+
+@contextmanager
+def search_metrics(mode: str, model: str):
+    """
+    Контекст одного поиска: число вызовов инструментов и метки mode/model для
+    всех метрик, записанных внутри; метки запоминаются в учёте запроса для
+    search_request_seconds
+    """
+    labels = {"mode": mode, "model": model, "tool_calls": 0}
+    token = _search_labels.set(labels)
+    accounting.label(mode=mode, model=model)
+    try:
+        with span("search", mode=mode, model=model):
+            yield
+    finally:
+        _search_labels.reset(token)
+        TOOL_CALLS_PER_REQUEST.observe(labels["tool_calls"], mode=mode, model=model)
+
+
+def record_request(seconds: float, mode: str, model: str = ""):
+    """Учесть длительность запроса /search/* от входа в приложение до готового ответа"""
+    REQUEST_SECONDS.observe(seconds, mode=mode, model=model)
+
+
+def record_error(error: BaseException, stage: str, **labels):
+    ERRORS.inc(type=type(error).__name__, stage=stage, **{**current_labels(), **labels})
+
+
+@contextmanager
+def stage(name: str, **labels):
+    """
+    Замерить этап поиска (метрика и спан трассы); исключение учитывается
+    в ошибках этапа и пробрасывается
+    """
+    labels = {**current_labels(), **labels}
+    start = time.monotonic()
+    try:
+        with span(name, **labels):
+            yield
+    except Exception as e:
+        record_error(e, name, **labels)
+        raise
+    finally:
+        elapsed = time.monotonic() - start
+        STAGE_SECONDS.observe(elapsed, stage=name, **labels)
+        if name in ACCOUNT_STAGES:
+            accounting.add_stage(ACCOUNT_STAGES[name], elapsed)
+
+
+@contextmanager
+def tool_call(tool: str, **arguments):
+    """
+    Замерить вызов инструмента агента и учесть его в числе вызовов текущего
+    поиска; аргументы вызова записываются в спан трассы
+    """
+    labels = current_labels()
+    search = _search_labels.get()
+    if search is not None:
+        search["tool_calls"] += 1
+    TOOL_CALLS.inc(tool=tool, **labels)
+    accounting.tally("tool_calls", tool)
+    start = time.monotonic()
+    try:
+        with span(f"tool:{tool}", **arguments):
+            yield
+    except Exception as e:
+        record_error(e, "tool", **labels)
+        raise
+    finally:
+        elapsed = time.monotonic() - start
+        TOOL_CALL_SECONDS.observe(elapsed, tool=tool, **labels)
+        accounting.add_stage("tools", elapsed)
+
+
+def record_tokens(message: Any, model: Optional[str] = None):
+    """Учесть вызов модели и токены ответа (usage_metadata) в метриках, текущем спане и учёте запроса"""
+    usage = getattr(message, "usage_metadata", None) or {}
+    labels = current_labels()
+    if model:
+        labels["model"] = model
+    input_tokens = usage.get("input_tokens", 0) or 0
+    output_tokens = usage.get("output_tokens", 0) or 0
+    cache_read = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+    LLM_TOKENS.inc(input_tokens, direction="input", **labels)
+    LLM_TOKENS.inc(output_tokens, direction="output", **labels)
+    LLM_TOKENS.inc(cache_read, direction="cache_read", **labels)
+    annotate(input_tokens=input_tokens, output_tokens=output_tokens, cache_read=cache_read)
+    accounting.count("llm_calls")
+    accounting.count("tokens_in", input_tokens)
+    accounting.count("tokens_out", output_tokens)
+
+
+def record_cache(cache: str, hit: bool):
+    result = "hit" if hit else "miss"
+    CACHE_REQUESTS.inc(cache=cache, result=result, **current_labels())
+    accounting.tally("cache", f"{cache}.{result}")
+
+
+def render_metrics() -> str:
+    """Все метрики (с PROMETHEUS_MULTIPROC_DIR - сумма по воркерам) в текстовом формате Prometheus"""
+    return REGISTRY.render()
+
+
+__all__ = [
+    'CONTENT_TYPE',
+    'multiproc_dir',
+    'Counter',
+    'Gauge',
+    'Histogram',
+    'Registry',
+    'REGISTRY',
+    'REQUEST_SECONDS',
+    'STAGE_SECONDS',
+    'TOOL_CALL_SECONDS',
+    'TOOL_CALLS',
+    'TOOL_CALLS_PER_REQUEST',
+    'LLM_TOKENS',
+    'CACHE_REQUESTS',
+    'ERRORS',
+    'ADMISSION_IN_FLIGHT',
+    'ADMISSION_QUEUED',
+    'ADMISSION_WAIT_SECONDS',
+    'ADMISSION_REJECTIONS',
+    'UPSTREAM_KEY_REQUESTS',
+    'UPSTREAM_KEY_WAITS',
+    'UPSTREAM_KEY_THROTTLED',
+    'current_labels',
+    'search_metrics',
+    'stage',
+    'tool_call',
+    'record_error',
+    'record_tokens',
+    'record_cache',
+    'record_request',
+    'render_metrics'
+]
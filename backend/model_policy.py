@@ -0,0 +1,133 @@
+import os
+import json
+import copy
+from typing import Dict, Any
+
+# Шаги работы агента, для которых выбирается модель:
+# - route: маршрутизация запроса (используется при LLM-маршрутизации)
+# - tools: итерации выбора инструментов в цикле агента
+# - final: финальный синтез ответа
+STEPS = ("route", "tools", "final")
+
+# Политика по умолчанию: дешёвая быстрая модель (nano) для маршрутизации,
+# быстрого режима и выбора инструментов; сильная модель (strong) только для
+# финального синтеза в режимах deep и academic. Ответ, который модель шага
+# tools даёт без остановки цикла, финальная модель пересинтезирует только в
+# режимах AGENT_RESYNTHESIS_MODES, поэтому лимит токенов шага tools должен
+# вмещать полный ответ
+DEFAULT_MODEL_POLICY: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "route": {
+        "route": {"tier": "nano", "max_tokens": 256}
+    },
+    "fast": {
+        "tools": {"tier": "nano", "max_tokens": 4096},
+        "final": {"tier": "nano", "max_tokens": 2048}
+    },
+    "deep": {
+        "tools": {"tier": "nano", "max_tokens": 4096},
+        "final": {"tier": "strong", "max_tokens": 4096}
+    },
+    "social": {
+        "tools": {"tier": "nano", "max_tokens": 4096},
+        "final": {"tier": "nano", "max_tokens": 4096}
+    },
+    "academic": {
+        "tools": {"tier": "nano", "max_tokens": 4096},
+        "final": {"tier": "strong", "max_tokens": 4096}
+    },
+    "finance": {
+        "tools": {"tier": "nano", "max_tokens": 4096},
+        "final": {"tier": "nano", "max_tokens": 4096}
+    },
+}
+
+
+def tier_models(provider: str) -> Dict[str, str]:
+    """
+    Получить имена моделей для уровней nano/strong у провайдера
+
+    Args:
+        provider: Провайдер LLM ("openai" или "anthropic")
+
+    Returns:
+        Словарь {уровень: имя модели}
+    """
+    if provider == "anthropic":
+        return {
+            "nano": os.getenv("ANTHROPIC_NANO_MODEL", "claude-3-5-haiku-20241022"),
+            "strong": os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-20240620")
+        }
+    nano = os.getenv("NANO_MODEL", "gpt-3.5-turbo")
+    return {
+        "nano": nano,
+        "strong": os.getenv("KIMIK2_MODEL") or nano
+    }
+
+
+def _merge(base: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """Рекурсивно наложить переопределения на политику"""
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+
+def load_model_policy() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Загрузить политику выбора моделей
+
+    Политику по умолчанию можно переопределить без изменения кода: JSON-файлом
+    из MODEL_POLICY_FILE и/или JSON-строкой из MODEL_POLICY, например
+    {"deep": {"final": {"tier": "strong", "max_tokens": 6000}},
+     "fast": {"tools": {"model": "gpt-4o-mini"}}}
+
+    Returns:
+        Политика {режим: {шаг: {"tier" | "model", "max_tokens"}}}
+    """
+    policy = copy.deepcopy(DEFAULT_MODEL_POLICY)
+
+    sources = []
+    policy_file = os.getenv("MODEL_POLICY_FILE")
+    if policy_file:
+        try:
+            with open(policy_file, encoding="utf-8") as f:
+                sources.append(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Не удалось прочитать MODEL_POLICY_FILE {policy_file}: {e}")
+    if os.getenv("MODEL_POLICY"):
+        try:
+            sources.append(json.loads(os.getenv("MODEL_POLICY")))
+        except ValueError as e:
+            print(f"Некорректный MODEL_POLICY: {e}")
+
+    for overrides in sources:
+        if isinstance(overrides, dict):
+            _merge(policy, overrides)
+    return policy
+
+
+def resolve_model(policy: Dict[str, Any], mode: str, step: str, provider: str) -> Dict[str, Any]:
+    """
+    Определить модель и лимит выходных токенов для режима и шага
+
+    Args:
+        policy: Политика, загруженная load_model_policy
+        mode: Режим поиска (или "route" для маршрутизации)
+        step: Шаг агента ("route", "tools", "final")
+        provider: Провайдер LLM ("openai" или "anthropic")
+
+    Returns:
+        Словарь {"model": имя модели, "max_tokens": лимит}
+    """
+    mode_policy = policy.get(mode) or policy["fast"]
+    spec = mode_policy.get(step) or mode_policy.get("tools") or policy["fast"]["tools"]
+    model_name = spec.get("model") or tier_models(provider).get(spec.get("tier", "nano"))
+    return {
+        "model": model_name,
+        "max_tokens": int(spec.get("max_tokens", 4096))
+    }
+
+
+__all__ = ['STEPS', 'DEFAULT_MODEL_POLICY', 'tier_models', 'load_model_policy', 'resolve_model']
@@ -0,0 +1,224 @@
+import os
+from typing import Dict, Any, Optional, Callable
+
+from backend.agent import WebAgent, get_agent
+from backend.utils import aggregate_and_summarize
+from backend.search_policy import adaptive_search
+from backend.tavily_gateway import get_tavily_gateway
+from backend.resilience import CircuitOpenError
+from backend.providers import provider_stats
+from backend.admission import admission_controller
+from backend.load_policy import current_load, plan_mode
+from backend.metrics import search_metrics, stage, record_cache
+from backend.cache import TieredCache, create_cache, make_cache_key
+from backend.query_log import normalize_query
+
+# Режимы поиска, доступные через API
+SEARCH_MODES = ("fast", "deep", "social", "academic", "finance")
+
+# Специфичные для режима поля ответа
+MODE_FIELDS: Dict[str, Dict[str, str]] = {
+    "deep": {"fact_check_notes": "Проверка фактов выполнена с использованием нескольких источников"},
+    "social": {"analysis_type": "social_media_analysis"},
+    "academic": {"analysis_type": "academic_research"},
+    "finance": {"analysis_type": "financial_analysis"},
+}
+
+
+def _model_type() -> str:
+    return os.getenv("MODEL_TYPE", "openai")
+
+
+_answer_cache: Optional[TieredCache] = None
+
+
+def answer_cache() -> Optional[TieredCache]:
+    """
+    Кэш готовых ответов (ANSWER_CACHE_TTL секунд; 0 - выключен): память
+    процесса и общий для воркеров кэш на диске
+    """
+    global _answer_cache
+    ttl = float(os.getenv("ANSWER_CACHE_TTL", "0"))
+    if ttl <= 0:
+        return None
+    if _answer_cache is None or _answer_cache.memory.ttl != ttl:
+        _answer_cache = create_cache("answers", max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500")), ttl=ttl)
+    return _answer_cache
+
+
+def source_search(query: str, mode: str) -> dict:
+    """
+    Поиск источников для ответа; если Tavily недоступен и сохранённых
+    результатов нет, ответ агента отдаётся без источников вместо ошибки 500
+    """
+    try:
+        with stage("sources"):
+            return adaptive_search(get_tavily_gateway(), query, mode=mode)
+    except CircuitOpenError as e:
+        print(f"Поиск источников пропущен: {e}")
+    except Exception as e:
+        print(f"Ошибка поиска источников: {e}")
+    return {"results": [], "sources_unavailable": True}
+
+
+def freshness_fields(search_results: dict) -> dict:
+    """Пометки об устаревших или недоступных источниках для ответа"""
+    fields = {}
+    if search_results.get("stale"):
+        fields["stale"] = True
+        fields["stale_age"] = search_results.get("stale_age")
+    if search_results.get("sources_unavailable"):
+        fields["sources_unavailable"] = True
+    return fields
+
+
+def plan_auto(query: str, requested_mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Выбрать режим для запроса: маршрутизация и понижение режима под нагрузкой
+
+    Args:
+        query: Запрос пользователя
+        requested_mode: Режим, уже выбранный маршрутизатором (иначе запрос маршрутизируется)
+
+    Returns:
+        План plan_mode с дополнительным полем requested_mode
+    """
+    if requested_mode is None:
+        with stage("routing", mode="auto", model="rules"):
+            requested_mode = get_agent(_model_type()).route_query(query)
+    load = current_load(admission_controller.stats(), provider_stats(),
+                        get_tavily_gateway().stats(), _model_type())
+    return {"requested_mode": requested_mode, **plan_mode(requested_mode, load)}
+
+
+def auto_fields(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Поля ответа автоматического режима"""
+    fields = {"mode_selected": plan["mode"]}
+    if plan["degraded"]:
+        fields["degraded"] = True
+        fields["degraded_reason"] = plan["reason"]
+        fields["mode_requested"] = plan["requested_mode"]
+    return fields
+
+
+def run_search(query: str,
+               mode: str,
+               tool_budget: Optional[int] = None,
+               summarize: bool = True,
+               progress: Optional[Callable[[str], None]] = None,
+               agent: Optional[WebAgent] = None) -> Dict[str, Any]:
+    """
+    Полный цикл поиска в режиме: ответ агента, источники и (для deep) суммирование
+
+    При включённом кэше ответов (ANSWER_CACHE_TTL) ответ на тот же
+    нормализованный запрос с теми же режимом, бюджетом и моделью отдаётся из
+    кэша с пометкой cached; ответы без источников или по устаревшим источникам
+    не сохраняются.
+
+    Args:
+        query: Запрос пользователя
+        mode: Режим поиска
+        tool_budget: Бюджет итераций инструментов вместо бюджета режима
+        summarize: Суммировать полный текст источников в режиме deep
+        progress: Вызывается с названием этапа ("agent", "sources", "summarize")
+        agent: Агент для выполнения (по умолчанию общий агент процесса)
+
+    Returns:
+        Тело ответа эндпоинта режима
+    """
+    notify = progress or (lambda stage: None)
+    agent = agent or get_agent(_model_type())
+
+    # Метрики этапов размечаются режимом и моделью выбора инструментов
+    model = agent.model_spec(mode, "tools")["model"]
+    cache = answer_cache()
+
+    with search_metrics(mode, model):
+        if cache is not None:
+            key = make_cache_key("answer", mode, normalize_query(query), tool_budget, summarize, model,
+                                 agent.model_spec(mode, "final")["model"])
+            cached = cache.get(key)
+            record_cache("answer", hit=cached is not None)
+            if cached is not None:
+                return {**cached, "cached": True}
+
+        notify("agent")
+        result = agent.run(query, mode=mode, tool_budget=tool_budget)
+
+        # Поиск источников (параметры зависят от режима,
+        # уровень поиска повышается только при недостатке результатов)
+        notify("sources")
+        search_results = source_search(query, mode=mode)
+
+        sources = []
+        contents = []
+        for r in search_results.get('results', []):
+            sources.append({
+                "title": r.get('title', ''),
+                "url": r.get('url', ''),
+                "score": r.get('score', 0)
+            })
+            if r.get('raw_content') and mode == "deep":
+                contents.append(r['raw_content'])
+
+        # Для глубокого анализа агрегируем и суммируем результаты
+        if mode == "deep" and contents and summarize:
+            notify("summarize")
+            with stage("summarize"):
+                response_text = aggregate_and_summarize(query, contents, get_tavily_gateway())
+        else:
+            response_text = result["response"]
+
+    answer = {
+        "response": response_text,
+        "sources": sources,
+        **MODE_FIELDS.get(mode, {}),
+        **freshness_fields(search_results)
+    }
+    if cache is not None and not freshness_fields(search_results):
+        cache.set(key, answer)
+    return answer
+
+
+def execute_search(query: str, mode: str,
+                   progress: Optional[Callable[[str], None]] = None,
+                   agent: Optional[WebAgent] = None,
+                   routed_mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Выполнить запрос в режиме под контролем допуска; режим "auto" сначала
+    маршрутизируется (с понижением под нагрузкой)
+
+    Args:
+        query: Запрос пользователя
+        mode: Режим поиска или "auto"
+        progress: Вызывается с названием этапа выполнения
+        agent: Агент, общий для нескольких запросов
+        routed_mode: Для "auto" - режим, заранее выбранный маршрутизатором
+
+    Raises:
+        AdmissionRejected: очередь режима заполнена или истёк срок ожидания
+    """
+    if mode != "auto":
+        with admission_controller.admit(mode):
+            return run_search(query, mode, progress=progress, agent=agent)
+
+    plan = plan_auto(query, routed_mode)
+    # Допуск по лимитам выбранного режима, поэтому запросы, направленные в fast,
+    # обгоняют очередь глубоких
+    with admission_controller.admit(plan["mode"]):
+        result = run_search(query, plan["mode"], tool_budget=plan["tool_budget"],
+                            summarize=not plan["degraded"], progress=progress, agent=agent)
+    return {**result, **auto_fields(plan)}
+
+
+__all__ = [
+    'SEARCH_MODES',
+    'MODE_FIELDS',
+    'answer_cache',
+    'source_search',
+    'freshness_fields',
+    'plan_auto',
+    'auto_fields',
+    'run_search',
+    'execute_search'
+]
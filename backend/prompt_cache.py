@@ -0,0 +1,92 @@
+import os
+import threading
+from typing import Dict, Any, List
+
+from langchain_core.messages import SystemMessage
+
+# Кэширование префикса промпта на стороне провайдера (PROMPT_CACHE=0 отключает разметку)
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE", "1").lower() not in ("0", "false", "no")
+
+# Провайдеры, которым нужна явная разметка кэшируемого префикса;
+# OpenAI-совместимые серверы кэшируют совпадающий префикс автоматически
+EXPLICIT_CACHE_PROVIDERS = ("anthropic",)
+
+_usage: Dict[str, Dict[str, int]] = {}
+_usage_lock = threading.Lock()
+
+
+def system_message(prefix: str, suffix: str) -> SystemMessage:
+    """
+    Системное сообщение из стабильного префикса и динамического суффикса
+
+    Префикс идёт первым блоком и помечается точкой кэширования, поэтому
+    инструменты и префикс одинаковы во всех запросах и итерациях агента.
+    """
+    prefix_block = {"type": "text", "text": prefix.strip()}
+    if PROMPT_CACHE_ENABLED:
+        prefix_block["cache_control"] = {"type": "ephemeral"}
+    return SystemMessage(content=[prefix_block, {"type": "text", "text": suffix}])
+
+
+def prepare_messages(provider: str, messages: List[Any]) -> List[Any]:
+    """
+    Привести системное сообщение к формату провайдера
+
+    Anthropic получает блоки с cache_control как есть; остальным провайдерам
+    блоки склеиваются в одну строку с тем же префиксом, без полей разметки.
+    """
+    if provider in EXPLICIT_CACHE_PROVIDERS or not isinstance(messages, list):
+        return messages
+    prepared = []
+    for message in messages:
+        if isinstance(message, SystemMessage) and isinstance(message.content, list):
+            text = "\n\n".join(
+                block["text"] if isinstance(block, dict) else str(block) for block in message.content
+            )
+            message = SystemMessage(content=text)
+        prepared.append(message)
+    return prepared
+
+
+def cache_usage(message: Any) -> Dict[str, int]:
+    """Входные токены ответа модели и сколько из них прочитано из кэша или записано в кэш"""
+    usage = getattr(message, "usage_metadata", None) or {}
+    details = usage.get("input_token_details") or {}
+    return {
+        "input_tokens": usage.get("input_tokens", 0) or 0,
+        "cache_read": details.get("cache_read", 0) or 0,
+        "cache_creation": details.get("cache_creation", 0) or 0
+    }
+
+
+def cached_ratio(input_tokens: int, cache_read: int) -> float:
+    return round(cache_read / input_tokens, 3) if input_tokens else 0.0
+
+
+def record_usage(provider: str, message: Any):
+    """Учесть использование кэша промптов в ответе провайдера"""
+    usage = cache_usage(message)
+    with _usage_lock:
+        stats = _usage.setdefault(provider, {"calls": 0, "input_tokens": 0, "cache_read": 0, "cache_creation": 0})
+        stats["calls"] += 1
+        for field, value in usage.items():
+            stats[field] += value
+
+
+def prompt_cache_stats() -> Dict[str, Any]:
+    """Доля входных токенов, прочитанных из кэша промптов, по провайдерам"""
+    with _usage_lock:
+        return {
+            provider: {**stats, "cached_ratio": cached_ratio(stats["input_tokens"], stats["cache_read"])}
+            for provider, stats in _usage.items()
+        }
+
+
+__all__ = [
+    'system_message',
+    'prepare_messages',
+    'cache_usage',
+    'cached_ratio',
+    'record_usage',
+    'prompt_cache_stats'
+]
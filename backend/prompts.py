@@ -1,13 +1,13 @@
 import datetime
 
-today = datetime.datetime.today().strftime("%A, %B %d, %Y")
+# Промпты режимов - стабильная часть системного сообщения: она одинакова для всех
+# запросов и кэшируется провайдером. Дата и данные запроса добавляются в конце
+# (dynamic_suffix), чтобы не сбрасывать кэш префикса и не устаревать в долгоживущих воркерах.
 
-SIMPLE_PROMPT = f"""    
+SIMPLE_PROMPT = """    
         Вы дружелюбный разговорный ИИ-ассистент, созданный компанией Tavily. 
         Ваша миссия - отвечать на вопросы пользователя дружелюбно, кратко, точно и актуально, основываясь на достоверных веб-данных.
         
-        Сегодняшняя дата: {today}
-        
         Руководящие принципы:
         - Ваши ответы должны быть хорошо отформатированы в формате markdown. 
         - Вы всегда должны предоставлять веб-цитаты источников для каждого своего утверждения.
@@ -50,16 +50,10 @@ SIMPLE_PROMPT = f"""
 
         Начинайте!
 
-        ---
-        
-        Теперь вы получите сообщение от пользователя:
-        
         """
 
 ROUTING_PROMPT = f"""Вы интеллектуальный классификатор запросов, который определяет тип вопросов пользователей для направления их соответствующему агенту.
 
-Сегодняшняя дата: {datetime.datetime.today().strftime("%A, %B %d, %Y")}
-
 Ваша задача - проанализировать вопрос пользователя и классифицировать его как один из следующих режимов: "fast", "deep", "social", "academic" или "finance".
 
 СЛЕДУЙТЕ ЭТИМ ПРАВИЛАМ КЛАССИФИКАЦИИ В ТОЧНОМ ПОРЯДКЕ:
@@ -97,11 +91,10 @@ ROUTING_PROMPT = f"""Вы интеллектуальный классифика
 Запрос пользователя: {{query}}
 """
 
-REASONING_PROMPT = f"""
+REASONING_PROMPT = """
         Вы ИИ-ассистент Research Pro Mode - продвинутый исследователь, который проводит всесторонние, тщательные, точные и актуальные исследования с возможностями проверки фактов.
         Ваша миссия - предоставлять глубоко проработанные ответы с тщательной проверкой фактов, основываясь на достоверных веб-данных из нескольких источников.
         
-        Сегодняшняя дата: {today}
 
         Руководящие принципы Research Pro Mode:
         - Вы тщательный исследователь, который проверяет факты, перекрестно ссылаясь на несколько источников
@@ -163,17 +156,12 @@ REASONING_PROMPT = f"""
 
         Начинайте!
 
-        ---
-        
-        Теперь вы получите сообщение от пользователя:
-        
         """
 
-SOCIAL_PROMPT = f"""
+SOCIAL_PROMPT = """
         Вы ИИ-ассистент по анализу социальных сетей, специализирующийся на анализе мнений, трендов и обсуждений с платформ социальных сетей.
         Ваша миссия - предоставлять информацию о настроениях в социальных сетях, популярных мнениях и трендовых темах с платформ, таких как Reddit, Twitter/X, VK и Habr.
         
-        Сегодняшняя дата: {today}
 
         Руководящие принципы анализа социальных сетей:
         - Сосредоточьтесь на извлечении мнений, настроений и обсуждений с платформ социальных сетей
@@ -227,17 +215,12 @@ SOCIAL_PROMPT = f"""
 
         Начинайте!
 
-        ---
-        
-        Теперь вы получите сообщение от пользователя:
-        
         """
 
-ACADEMIC_PROMPT = f"""
+ACADEMIC_PROMPT = """
         Вы ИИ-ассистент по академическим исследованиям, специализирующийся на поиске и анализе научных статей, исследований и академических публикаций.
         Ваша миссия - предоставлять всестороннюю академическую информацию из источников, таких как arXiv, Semantic Scholar, Google Scholar и академические журналы.
         
-        Сегодняшняя дата: {today}
 
         Руководящие принципы академических исследований:
         - Сосредоточьтесь на рецензируемых научных статьях, академических публикациях и научных работах
@@ -291,17 +274,12 @@ ACADEMIC_PROMPT = f"""
 
         Начинайте!
 
-        ---
-        
-        Теперь вы получите сообщение от пользователя:
-        
         """
 
-FINANCE_PROMPT = f"""
+FINANCE_PROMPT = """
         Вы ИИ-ассистент по финансовому анализу, специализирующийся на анализе финансовых данных, рыночных трендов и экономической информации.
         Ваша миссия - предоставлять всестороннюю финансовую информацию из источников, таких как Yahoo Finance, Bloomberg, Reuters и финансовые отчеты.
         
-        Сегодняшняя дата: {today}
 
         Руководящие принципы финансового анализа:
         - Сосредотачивайтесь на финансовых данных, ценах акций, рыночных трендах и экономических индикаторах
@@ -355,10 +333,6 @@ FINANCE_PROMPT = f"""
 
         Начинайте!
 
-        ---
-        
-        Теперь вы получите сообщение от пользователя:
-        
         """
 
 SUMMARIZER_PROMPT = f"""
@@ -384,3 +358,17 @@ SUMMARIZER_PROMPT = f"""
 - Любые противоречия, найденные между источниками
 - Уровень уверенности в предоставленной информации
 """
+
+
+def current_date() -> str:
+    """Сегодняшняя дата в формате промптов (вычисляется при каждом вызове)"""
+    return datetime.datetime.today().strftime("%A, %B %d, %Y")
+
+
+def dynamic_suffix() -> str:
+    """Динамическая часть системного сообщения режима: дата запроса"""
+    return (
+        f"---\n\n"
+        f"Сегодняшняя дата: {current_date()}\n\n"
+        f"Теперь вы получите сообщение от пользователя:"
+    )
@@ -0,0 +1,292 @@
+import os
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Tuple, Optional
+
+from backend.resilience import CircuitBreaker, CircuitOpenError, CancelScope, cancel_scope
+from backend.ratelimit import RateLimitExceeded, get_key_pool, is_rate_limit_error
+from backend.prompt_cache import prepare_messages, record_usage
+
+# Задержка хеджирования, пока для провайдера не накоплена статистика задержек
+HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "5.0"))
+# Нижняя граница задержки хеджирования, чтобы не дублировать каждый запрос
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_HEDGE_WORKERS", "16")),
+    thread_name_prefix="llm-hedge"
+)
+_hedge_stats = {"fired": 0, "won_by_secondary": 0}
+_hedge_stats_lock = threading.Lock()
+
+
+def provider_breaker(provider: str) -> CircuitBreaker:
+    """Получить общий для процесса предохранитель провайдера LLM"""
+    with _breakers_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(
+                f"llm:{provider}",
+                window=int(os.getenv("LLM_BREAKER_WINDOW", "50")),
+                min_calls=int(os.getenv("LLM_BREAKER_MIN_CALLS", "10")),
+                error_threshold=float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5")),
+                open_seconds=float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+            )
+        return _breakers[provider]
+
+
+def configured_providers(primary: str) -> List[str]:
+    """
+    Порядок провайдеров LLM: основной из MODEL_TYPE, затем резервные из
+    LLM_FALLBACK_PROVIDERS (например, "anthropic")
+    """
+    providers = [primary]
+    for provider in os.getenv("LLM_FALLBACK_PROVIDERS", "").split(","):
+        provider = provider.strip()
+        if provider and provider not in providers:
+            providers.append(provider)
+    return providers
+
+
+# Ошибки клиентов OpenAI/Anthropic и httpx, означающие недоступность провайдера
+_TRANSPORT_ERRORS = ("APIConnectionError", "APITimeoutError", "TransportError", "TimeoutException")
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """
+    Говорит ли ошибка о нездоровье провайдера: таймаут, ошибка соединения,
+    ответ 5xx или 429. Ошибки запроса (4xx) и прочие исключения провайдер не
+    исправит, поэтому на них нет переключения и они не размыкают предохранитель
+    """
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    if is_rate_limit_error(error) or isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in _TRANSPORT_ERRORS for cls in type(error).__mro__)
+
+
+def hedging_enabled(mode: str) -> bool:
+    """Включено ли хеджирование запросов для режима (LLM_HEDGE_MODES, например "fast")"""
+    modes = {m.strip() for m in os.getenv("LLM_HEDGE_MODES", "").split(",") if m.strip()}
+    return mode in modes
+
+
+def provider_stats() -> Dict[str, Any]:
+    """Здоровье провайдеров и статистика хеджирования"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    with _hedge_stats_lock:
+        hedges = dict(_hedge_stats)
+    return {
+        "providers": {name: breaker.snapshot() for name, breaker in breakers.items()},
+        "hedges": hedges
+    }
+
+
+class KeyedChatModel:
+    """
+    Модель одного провайдера поверх пула API-ключей с лимитом запросов
+
+    Для каждого вызова ключ берётся из общего пула провайдера (с коротким
+    ожиданием в очереди), клиент модели для ключа создаётся фабрикой при первом
+    использовании. Ответ 429 временно исключает ключ и повторяет вызов с другим.
+    Системное сообщение приводится к формату кэширования промптов провайдера.
+    """
+
+    def __init__(self, provider: str, factory, tools_binding=None, base_models=None):
+        self.provider = provider
+        self.factory = factory
+        self.tools_binding = tools_binding
+        self.pool = get_key_pool(provider)
+        self._base_models = base_models if base_models is not None else {}
+        self._models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def bind_tools(self, tools, **kwargs) -> "KeyedChatModel":
+        return KeyedChatModel(self.provider, self.factory, (tools, kwargs), self._base_models)
+
+    def _model_for(self, api_key: str):
+        with self._lock:
+            if api_key not in self._models:
+                if api_key not in self._base_models:
+                    self._base_models[api_key] = self.factory(api_key or None)
+                model = self._base_models[api_key]
+                if self.tools_binding is not None:
+                    tools, kwargs = self.tools_binding
+                    model = model.bind_tools(tools, **kwargs)
+                self._models[api_key] = model
+            return self._models[api_key]
+
+    def invoke(self, messages, config=None, **kwargs):
+        messages = prepare_messages(self.provider, messages)
+        attempts = len(self.pool.keys)
+        for attempt in range(attempts):
+            api_key = self.pool.acquire()
+            try:
+                result = self._model_for(api_key).invoke(messages, config, **kwargs)
+                record_usage(self.provider, result)
+                return result
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                self.pool.report_throttled(api_key)
+                if attempt == attempts - 1:
+                    raise
+
+
+class FailoverChatModel:
+    """
+    Чат-модель поверх нескольких провайдеров с автоматическим переключением
+
+    Провайдеры перебираются в порядке предпочтения, провайдеры с разомкнутым
+    предохранителем пропускаются. При включённом хеджировании, если основной
+    провайдер не ответил за свой p90 задержки, тот же запрос отправляется
+    резервному и используется ответ, пришедший первым; проигравший вызов
+    отменяется (его соединение закрывается). Переключение идёт только при
+    ошибках, говорящих о нездоровье провайдера (is_provider_failure).
+    """
+
+    def __init__(self, models: List[Tuple[str, Any]], hedge: bool = False):
+        self.models = models
+        self.hedge = hedge
+
+    def bind_tools(self, tools, **kwargs) -> "FailoverChatModel":
+        """Привязать инструменты к модели каждого провайдера"""
+        return FailoverChatModel(
+            [(provider, model.bind_tools(tools, **kwargs)) for provider, model in self.models],
+            hedge=self.hedge
+        )
+
+    def invoke(self, messages, config=None, **kwargs):
+        if self.hedge and len(self.models) > 1:
+            return self._invoke_hedged(messages, config, **kwargs)
+        return self._invoke_failover(iter(self.models), messages, config, **kwargs)
+
+    def _call(self, provider: str, model, messages, config, scope: Optional[CancelScope] = None, **kwargs):
+        breaker = provider_breaker(provider)
+        start = time.monotonic()
+        try:
+            if scope is None:
+                result = model.invoke(messages, config, **kwargs)
+            else:
+                with cancel_scope(scope):
+                    result = model.invoke(messages, config, **kwargs)
+        except Exception as e:
+            # Локальный лимит запросов, отменённый хедж и ошибки запроса
+            # не говорят о здоровье провайдера
+            if (scope is not None and scope.cancelled) or isinstance(e, RateLimitExceeded) \
+                    or not is_provider_failure(e):
+                breaker.release()
+            else:
+                breaker.record(False, time.monotonic() - start)
+            raise
+        breaker.record(True, time.monotonic() - start)
+        return result
+
+    @staticmethod
+    def _should_failover(error: Exception) -> bool:
+        return isinstance(error, RateLimitExceeded) or is_provider_failure(error)
+
+    def _next_allowed(self, candidates) -> Optional[Tuple[str, Any]]:
+        for provider, model in candidates:
+            if provider_breaker(provider).allow_request():
+                return provider, model
+        return None
+
+    def _no_provider_error(self) -> CircuitOpenError:
+        primary = self.models[0][0]
+        return CircuitOpenError(f"llm:{primary}", provider_breaker(primary).retry_after())
+
+    def _invoke_failover(self, candidates, messages, config, last_error=None, **kwargs):
+        while True:
+            candidate = self._next_allowed(candidates)
+            if candidate is None:
+                raise last_error or self._no_provider_error()
+            provider, model = candidate
+            try:
+                return self._call(provider, model, messages, config, **kwargs)
+            except Exception as e:
+                if not self._should_failover(e):
+                    raise
+                print(f"[providers] ошибка провайдера {provider}: {e}, переключение на резервный")
+                last_error = e
+
+    def _submit(self, provider: str, model, messages, config, scope: CancelScope, **kwargs):
+        # Контекст копируется, чтобы конфигурация LangChain дошла до потока хеджирования
+        context = contextvars.copy_context()
+        return _hedge_executor.submit(context.run, self._call, provider, model, messages, config,
+                                      scope=scope, **kwargs)
+
+    @staticmethod
+    def _cancel(provider: str, future, scope: CancelScope):
+        """Отменить проигравший вызов: не начатый не запустится, начатый оборвёт соединение"""
+        if future.cancel():
+            # Слот пробного вызова, занятый при выборе провайдера, не использован
+            provider_breaker(provider).release()
+        scope.cancel()
+
+    def _invoke_hedged(self, messages, config, **kwargs):
+        candidates = iter(self.models)
+        primary = self._next_allowed(candidates)
+        if primary is None:
+            raise self._no_provider_error()
+
+        p90 = provider_breaker(primary[0]).latency_percentile(90)
+        delay = max(p90 if p90 is not None else HEDGE_DEFAULT_DELAY, HEDGE_MIN_DELAY)
+        primary_scope = CancelScope()
+        primary_future = self._submit(*primary, messages, config, primary_scope, **kwargs)
+
+        done, _ = wait([primary_future], timeout=delay)
+        if done:
+            error = primary_future.exception()
+            if error is None:
+                return primary_future.result()
+            if not self._should_failover(error):
+                raise error
+            return self._invoke_failover(candidates, messages, config, last_error=error, **kwargs)
+
+        secondary = self._next_allowed(candidates)
+        if secondary is None:
+            return primary_future.result()
+
+        with _hedge_stats_lock:
+            _hedge_stats["fired"] += 1
+        print(f"[providers] {primary[0]} не ответил за {delay:.2f} с, хеджирование через {secondary[0]}")
+        secondary_scope = CancelScope()
+        secondary_future = self._submit(*secondary, messages, config, secondary_scope, **kwargs)
+        scopes = {primary_future: (primary[0], primary_scope), secondary_future: (secondary[0], secondary_scope)}
+
+        pending = {primary_future, secondary_future}
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None or not self._should_failover(error):
+                    # Ответ (или ошибка запроса, которую повторит и второй провайдер) получен:
+                    # второй вызов больше не нужен
+                    for other in pending:
+                        self._cancel(scopes[other][0], other, scopes[other][1])
+                    if error is not None:
+                        raise error
+                    if future is secondary_future:
+                        with _hedge_stats_lock:
+                            _hedge_stats["won_by_secondary"] += 1
+                    return future.result()
+                last_error = error
+        return self._invoke_failover(candidates, messages, config, last_error=last_error, **kwargs)
+
+
+__all__ = [
+    'provider_breaker',
+    'configured_providers',
+    'is_provider_failure',
+    'hedging_enabled',
+    'provider_stats',
+    'KeyedChatModel',
+    'FailoverChatModel'
+]
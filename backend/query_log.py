@@ -0,0 +1,224 @@
+import os
+import json
+import gzip
+import glob
+import time
+import queue
+import shutil
+import atexit
+import threading
+import unicodedata
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: без межпроцессной блокировки
+    fcntl = None
+
+# Максимальная длина нормализованного запроса в журнале, символы
+QUERY_LOG_MAX_QUERY_CHARS = int(os.getenv("QUERY_LOG_MAX_QUERY_CHARS", "2000"))
+
+
+def normalize_query(query: Optional[str]) -> Optional[str]:
+    """Запрос для журнала: NFKC, нижний регистр, схлопнутые пробелы"""
+    if not isinstance(query, str):
+        return None
+    normalized = " ".join(unicodedata.normalize("NFKC", query).lower().split())
+    return normalized[:QUERY_LOG_MAX_QUERY_CHARS]
+
+
+class QueryLogSink:
+    """
+    Журнал обслуженных запросов (JSON Lines), который пишет фоновый поток
+
+    log() только кладёт запись в ограниченный буфер и никогда не ждёт: при
+    заполненном буфере запись отбрасывается и учитывается в dropped. Поток
+    пишет записи пачками (batch_size или раз в flush_interval секунд); файл
+    больше max_bytes переименовывается и сжимается в gzip, хранится backups
+    последних сжатых файлов. Запись и ротация идут под блокировкой файла
+    path.lock, поэтому воркеры gunicorn могут писать в один журнал.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, max_bytes: int = 100 * 1024 * 1024, backups: int = 10,
+                 name: str = "query_log"):
+        self.path = path
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.pid = os.getpid()
+        self._queue: queue.Queue = queue.Queue(maxsize=buffer_size)
+        self._stats = {"written": 0, "dropped": 0, "batches": 0, "rotations": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+        self._closed = threading.Event()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _inc(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def log(self, record: Dict[str, Any]) -> bool:
+        """Поставить запись в очередь на запись; False, если буфер заполнен и запись отброшена"""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self._inc("dropped")
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Дождаться записи всего, что уже в буфере (для тестов и завершения процесса)"""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        if self._closed.is_set():
+            return
+        self.flush(timeout)
+        self._closed.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {"path": self.path, "queued": self._queue.qsize(), **stats}
+
+    def _run(self):
+        while not self._closed.is_set():
+            batch: List[Dict[str, Any]] = []
+            markers: List[threading.Event] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0.01))
+                except queue.Empty:
+                    break
+                if isinstance(item, threading.Event):
+                    # Маркер flush: записать накопленное сразу
+                    markers.append(item)
+                    break
+                batch.append(item)
+                if time.monotonic() >= deadline:
+                    break
+            if batch:
+                self._write(batch)
+            for marker in markers:
+                marker.set()
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        data = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in batch)
+        try:
+            # Другой воркер не ротирует файл посреди записи
+            with self._file_lock():
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(data)
+                    size = f.tell()
+                rotated = self._rename() if size >= self.max_bytes else None
+        except OSError as e:
+            self._inc("errors")
+            print(f"[{self.name}] не удалось записать {len(batch)} записей: {e}")
+            return
+        self._inc("written", len(batch))
+        self._inc("batches")
+        if rotated:
+            self._compress(rotated)
+
+    def _rename(self) -> Optional[str]:
+        # Номер ротации различает архивы одной секунды
+        rotated = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}.{self.pid}.{self._stats['rotations']:04d}"
+        try:
+            os.rename(self.path, rotated)
+        except FileNotFoundError:
+            return None
+        return rotated
+
+    def _compress(self, rotated: str):
+        # Сжатие вне блокировки: остальные воркеры уже пишут в новый файл
+        try:
+            with open(rotated, "rb") as source, gzip.open(rotated + ".gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(rotated)
+        except OSError as e:
+            self._inc("errors")
+            print(f"[{self.name}] не удалось сжать {rotated}: {e}")
+            return
+        self._inc("rotations")
+        for old in sorted(glob.glob(f"{glob.escape(self.path)}.*.gz"))[:-self.backups or None]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+_sink: Optional[QueryLogSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_query_log() -> Optional[QueryLogSink]:
+    """Журнал запросов процесса (QUERY_LOG; off - выключен); после fork воркер создаёт свой"""
+    global _sink
+    path = os.getenv("QUERY_LOG", "query_logs/queries.jsonl")
+    if path in ("", "off"):
+        return None
+    if _sink is None or _sink.path != path or _sink.pid != os.getpid():
+        with _sink_lock:
+            if _sink is None or _sink.path != path or _sink.pid != os.getpid():
+                _sink = QueryLogSink(
+                    path,
+                    buffer_size=int(os.getenv("QUERY_LOG_BUFFER", "10000")),
+                    batch_size=int(os.getenv("QUERY_LOG_BATCH", "500")),
+                    flush_interval=float(os.getenv("QUERY_LOG_FLUSH_INTERVAL", "1")),
+                    max_bytes=int(os.getenv("QUERY_LOG_MAX_BYTES", str(100 * 1024 * 1024))),
+                    backups=int(os.getenv("QUERY_LOG_BACKUPS", "10"))
+                )
+    return _sink
+
+
+def log_query(record: Dict[str, Any]) -> bool:
+    """Записать обслуженный запрос в журнал, не блокируя поток запроса"""
+    sink = get_query_log()
+    return sink.log(record) if sink is not None else False
+
+
+def query_log_stats() -> Optional[Dict[str, Any]]:
+    return _sink.stats() if _sink is not None and _sink.pid == os.getpid() else None
+
+
+def _close_sink():
+    if _sink is not None and _sink.pid == os.getpid():
+        _sink.close(timeout=2.0)
+
+
+atexit.register(_close_sink)
+
+
+__all__ = [
+    'normalize_query',
+    'QueryLogSink',
+    'get_query_log',
+    'log_query',
+    'query_log_stats'
+]
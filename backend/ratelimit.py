@@ -0,0 +1,239 @@
+import os
+import math
+import time
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional
+
+from backend.metrics import UPSTREAM_KEY_REQUESTS, UPSTREAM_KEY_WAITS, UPSTREAM_KEY_THROTTLED
+
+
+class RateLimitExceeded(Exception):
+    """Не удалось получить разрешение на вызов апстрима за отведённое время"""
+
+    def __init__(self, upstream: str, retry_after: float = 1.0):
+        self.upstream = upstream
+        self.retry_after = retry_after
+        super().__init__(f"Превышен лимит запросов к {upstream}, повторите через {retry_after:.1f} с")
+
+
+class TokenBucket:
+    """
+    Потокобезопасный token bucket: rate токенов в секунду, не более burst
+
+    При rate=None лимита нет: токен выдаётся всегда, кроме паузы после penalize.
+    """
+
+    def __init__(self, rate: Optional[float], burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        """Взять токен, если он есть"""
+        with self._lock:
+            self._refill()
+            if self._updated < self._paused_until:
+                return False
+            if self.rate is None:
+                return True
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def wait_time(self) -> float:
+        """Через сколько секунд появится следующий токен"""
+        with self._lock:
+            self._refill()
+            pause = max(self._paused_until - self._updated, 0.0)
+            if self.rate is None or self._tokens >= 1:
+                return pause
+            refill = (1 - self._tokens) / self.rate if self.rate > 0 else float("inf")
+            return max(pause, refill)
+
+    def penalize(self, seconds: float):
+        """Не выдавать токены ближайшие seconds секунд"""
+        with self._lock:
+            self._refill()
+            self._paused_until = max(self._paused_until, self._updated + seconds)
+
+
+class KeyPool:
+    """
+    Пул API-ключей одного апстрима с лимитом запросов на каждый ключ
+
+    Ключ выбирается по кругу (round_robin) или наименее использованный
+    (least_used) среди ключей, у которых есть свободный токен. Если свободных
+    токенов нет, запрос коротко ждёт в очереди до max_wait секунд. При rate=None
+    лимита нет, и пул только исключает ключи после ответа 429.
+
+    С export_metrics запросы, ожидания и 429 по ключам пишутся в метрики
+    upstream_key_* (их /metrics суммирует по воркерам).
+    """
+
+    def __init__(self, upstream: str, keys: List[str], rate: Optional[float], burst: int,
+                 strategy: str = "round_robin", max_wait: float = 2.0, export_metrics: bool = False):
+        self.upstream = upstream
+        self.keys = [k for k in keys if k] or [""]
+        self.strategy = strategy
+        self.max_wait = max_wait
+        self.export_metrics = export_metrics
+        self._buckets = {key: TokenBucket(rate, burst) for key in self.keys}
+        self._usage = {key: {"requests": 0, "waits": 0, "throttled": 0} for key in self.keys}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _candidates(self) -> List[str]:
+        with self._lock:
+            if self.strategy == "least_used":
+                return sorted(self.keys, key=lambda k: self._usage[k]["requests"])
+            start = self._next
+            self._next = (self._next + 1) % len(self.keys)
+            return self.keys[start:] + self.keys[:start]
+
+    def acquire(self, max_wait: Optional[float] = None) -> str:
+        """
+        Получить ключ для очередного вызова, при необходимости подождав
+
+        Raises:
+            RateLimitExceeded: если ни один ключ не освободился за max_wait секунд
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        waited = False
+        while True:
+            candidates = self._candidates()
+            for key in candidates:
+                if self._buckets[key].try_acquire():
+                    with self._lock:
+                        self._usage[key]["requests"] += 1
+                        if waited:
+                            self._usage[key]["waits"] += 1
+                    if self.export_metrics:
+                        UPSTREAM_KEY_REQUESTS.inc(upstream=self.upstream, key=mask_key(key))
+                        if waited:
+                            UPSTREAM_KEY_WAITS.inc(upstream=self.upstream, key=mask_key(key))
+                    return key
+
+            wait = min(self._buckets[key].wait_time() for key in candidates)
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                raise RateLimitExceeded(self.upstream, retry_after=max(wait, 0.1))
+            waited = True
+            time.sleep(max(wait, 0.005))
+
+    def report_throttled(self, key: str, cooldown: float = 5.0):
+        """Апстрим ответил 429 для ключа - временно исключить ключ из выбора"""
+        if key not in self._buckets:
+            return
+        self._buckets[key].penalize(cooldown)
+        with self._lock:
+            self._usage[key]["throttled"] += 1
+        if self.export_metrics:
+            UPSTREAM_KEY_THROTTLED.inc(upstream=self.upstream, key=mask_key(key))
+
+    def usage(self) -> Dict[str, Any]:
+        """Использование ключей (ключи маскируются)"""
+        with self._lock:
+            return {mask_key(key): dict(stats) for key, stats in self._usage.items()}
+
+
+def mask_key(key: str) -> str:
+    """Замаскировать API-ключ для экспорта (префикс и короткий хэш, уникальные для ключа)"""
+    if not key:
+        return "<empty>"
+    return f"{key[:4]}...{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}"
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Является ли ошибка апстрима ответом 429"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    return type(error).__name__ in ("UsageLimitExceededError", "RateLimitError")
+
+
+def configured_keys(upstream: str) -> List[str]:
+    """
+    Ключи апстрима: список через запятую из <UPSTREAM>_API_KEYS
+    или единственный ключ из <UPSTREAM>_API_KEY
+    """
+    prefix = upstream.upper()
+    keys = [k.strip() for k in os.getenv(f"{prefix}_API_KEYS", "").split(",") if k.strip()]
+    return keys or [os.getenv(f"{prefix}_API_KEY", "")]
+
+
+_pools: Dict[str, KeyPool] = {}
+_pools_lock = threading.Lock()
+
+
+def worker_count() -> int:
+    """Число процессов сервиса, делящих квоты ключей (RATE_LIMIT_WORKERS или WEB_CONCURRENCY)"""
+    value = os.getenv("RATE_LIMIT_WORKERS") or os.getenv("WEB_CONCURRENCY") or "1"
+    return max(int(value), 1)
+
+
+def process_limits(upstream: str) -> Dict[str, Any]:
+    """
+    Доля лимита одного ключа, приходящаяся на этот процесс
+
+    <UPSTREAM>_RATE_LIMIT и <UPSTREAM>_RATE_BURST задают квоту ключа на весь
+    сервис. Бакеты у каждого процесса свои, поэтому квота делится поровну
+    между worker_count() процессами. Без <UPSTREAM>_RATE_LIMIT лимита нет.
+    """
+    prefix = upstream.upper()
+    rate = os.getenv(f"{prefix}_RATE_LIMIT", "")
+    if not rate:
+        return {"rate": None, "burst": 1}
+    rate = float(rate)
+    burst = int(os.getenv(f"{prefix}_RATE_BURST", "") or max(int(rate * 2), 1))
+    workers = worker_count()
+    return {"rate": rate / workers, "burst": max(math.ceil(burst / workers), 1)}
+
+
+def get_key_pool(upstream: str) -> KeyPool:
+    """Получить общий для процесса пул ключей апстрима ("tavily", "openai", "anthropic")"""
+    with _pools_lock:
+        if upstream not in _pools:
+            prefix = upstream.upper()
+            limits = process_limits(upstream)
+            _pools[upstream] = KeyPool(
+                upstream,
+                configured_keys(upstream),
+                rate=limits["rate"],
+                burst=limits["burst"],
+                strategy=os.getenv(f"{prefix}_KEY_STRATEGY", "round_robin"),
+                max_wait=float(os.getenv("RATE_LIMIT_MAX_WAIT", "2.0")),
+                export_metrics=True
+            )
+        return _pools[upstream]
+
+
+def key_pool_stats() -> Dict[str, Any]:
+    """Использование ключей всех апстримов"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {name: pool.usage() for name, pool in pools.items()}
+
+
+__all__ = [
+    'RateLimitExceeded',
+    'TokenBucket',
+    'KeyPool',
+    'mask_key',
+    'is_rate_limit_error',
+    'configured_keys',
+    'worker_count',
+    'process_limits',
+    'get_key_pool',
+    'key_pool_stats'
+]
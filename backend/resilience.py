@@ -0,0 +1,230 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Optional
+
+
+class CircuitOpenError(Exception):
+    """Вызов отклонён, потому что предохранитель апстрима разомкнут"""
+
+    def __init__(self, name: str, retry_after: float = 0.0):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Апстрим {name} временно недоступен (предохранитель разомкнут)")
+
+
+class CallCancelled(Exception):
+    """Вызов апстрима отменён: параллельный (хеджированный) вызов уже вернул ответ"""
+
+
+class CancelScope:
+    """
+    Отмена вызова, выполняемого в другом потоке
+
+    Поток вызова регистрирует на время блокирующего чтения функцию прерывания
+    (например, закрытие сокета); cancel() вызывает её, и ожидание ответа
+    апстрима обрывается, а следующие запросы этого вызова не отправляются.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._aborts = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self):
+        """Прервать вызов, если он отменён"""
+        if self._cancelled.is_set():
+            raise CallCancelled()
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled.set()
+            aborts = list(self._aborts)
+        for abort in aborts:
+            abort()
+
+    @contextmanager
+    def guard(self, abort: Callable[[], None]):
+        """Вызвать abort при отмене, пока выполняется блок"""
+        with self._lock:
+            self.check()
+            self._aborts.add(abort)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._aborts.discard(abort)
+
+
+_cancel_scope: contextvars.ContextVar = contextvars.ContextVar("resilience_cancel_scope", default=None)
+
+
+def current_cancel_scope() -> Optional[CancelScope]:
+    """Область отмены текущего вызова (None вне хеджированного вызова)"""
+    return _cancel_scope.get()
+
+
+@contextmanager
+def cancel_scope(scope: CancelScope):
+    """Выполнить блок в области отмены scope"""
+    token = _cancel_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _cancel_scope.reset(token)
+
+
+class CircuitBreaker:
+    """
+    Предохранитель с учётом здоровья апстрима
+
+    Хранит скользящее окно последних вызовов (успех и длительность), по нему
+    считает долю ошибок, долю медленных вызовов и перцентили задержки.
+    Состояния:
+    - closed: вызовы проходят
+    - open: вызовы отклоняются до истечения open_seconds
+    - half_open: пропускается один пробный вызов; успех замыкает, ошибка снова размыкает
+    """
+
+    def __init__(self, name: str,
+                 window: int = 50,
+                 min_calls: int = 10,
+                 error_threshold: float = 0.5,
+                 slow_call_seconds: Optional[float] = None,
+                 slow_call_threshold: float = 0.8,
+                 open_seconds: float = 30.0):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_threshold = slow_call_threshold
+        self.open_seconds = open_seconds
+
+        self._calls = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.total_calls = 0
+        self.total_errors = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def _refresh_state(self):
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = "half_open"
+            self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        """Сколько секунд осталось до пробного вызова"""
+        with self._lock:
+            if self._state != "open":
+                return 0.0
+            return max(self.open_seconds - (time.monotonic() - self._opened_at), 0.0)
+
+    def allow_request(self) -> bool:
+        """Можно ли сейчас выполнить вызов"""
+        with self._lock:
+            self._refresh_state()
+            if self._state == "closed":
+                return True
+            if self._state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release(self):
+        """Вызов не состоялся по причинам, не связанным с апстримом - вернуть пробный слот"""
+        with self._lock:
+            if self._state == "half_open":
+                self._probe_in_flight = False
+
+    def record(self, success: bool, latency: float):
+        """Учесть результат вызова"""
+        with self._lock:
+            self._calls.append((success, latency))
+            self.total_calls += 1
+            if not success:
+                self.total_errors += 1
+
+            if self._state == "half_open":
+                if success and not self._is_slow(latency):
+                    self._state = "closed"
+                    self._calls.clear()
+                else:
+                    self._open()
+                return
+
+            if self._state == "closed" and len(self._calls) >= self.min_calls:
+                if self._error_rate() >= self.error_threshold or self._slow_rate() >= self.slow_call_threshold:
+                    self._open()
+
+    def _open(self):
+        self._state = "open"
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self.times_opened += 1
+        print(f"[resilience] {self.name}: предохранитель разомкнут на {self.open_seconds:.0f} с")
+
+    def _is_slow(self, latency: float) -> bool:
+        return self.slow_call_seconds is not None and latency >= self.slow_call_seconds
+
+    def _error_rate(self) -> float:
+        if not self._calls:
+            return 0.0
+        return sum(1 for ok, _ in self._calls if not ok) / len(self._calls)
+
+    def _slow_rate(self) -> float:
+        if not self._calls or self.slow_call_seconds is None:
+            return 0.0
+        return sum(1 for _, latency in self._calls if latency >= self.slow_call_seconds) / len(self._calls)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            return self._error_rate()
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Перцентиль задержки успешных вызовов в окне (None, если данных мало)"""
+        with self._lock:
+            latencies = sorted(latency for ok, latency in self._calls if ok)
+        if len(latencies) < 5:
+            return None
+        index = min(int(round(percentile / 100.0 * (len(latencies) - 1))), len(latencies) - 1)
+        return latencies[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущее состояние для экспорта в статистику"""
+        p50 = self.latency_percentile(50)
+        p90 = self.latency_percentile(90)
+        p99 = self.latency_percentile(99)
+        return {
+            "state": self.state,
+            "error_rate": round(self.error_rate(), 3),
+            "p50": round(p50, 3) if p50 is not None else None,
+            "p90": round(p90, 3) if p90 is not None else None,
+            "p99": round(p99, 3) if p99 is not None else None,
+            "total_calls": self.total_calls,
+            "total_errors": self.total_errors,
+            "times_opened": self.times_opened
+        }
+
+
+__all__ = [
+    'CircuitOpenError',
+    'CallCancelled',
+    'CancelScope',
+    'current_cancel_scope',
+    'cancel_scope',
+    'CircuitBreaker'
+]
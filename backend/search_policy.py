@@ -0,0 +1,187 @@
+import os
+import re
+from typing import Dict, Any, List
+from urllib.parse import urlparse
+
+# Базовые (предметные) параметры поиска источников для каждого режима
+MODE_SEARCH_PARAMS: Dict[str, Dict[str, Any]] = {
+    "fast": {},
+    "deep": {},
+    "social": {
+        "include_domains": ["reddit.com", "twitter.com", "x.com", "vk.com", "habr.com"],
+        "time_range": "week"
+    },
+    "academic": {
+        "include_domains": ["arxiv.org", "semanticscholar.org"],
+        "time_range": "year"
+    },
+    "finance": {
+        "topic": "finance",
+        "include_domains": ["finance.yahoo.com", "bloomberg.com", "reuters.com"],
+        "time_range": "day"
+    },
+}
+
+# Уровни эскалации: начинаем с дешёвого basic-поиска и переходим к следующему
+# уровню только если результатов предыдущего оказалось недостаточно
+SEARCH_TIERS: Dict[str, List[Dict[str, Any]]] = {
+    "fast": [
+        {"search_depth": "basic", "max_results": 3},
+        {"search_depth": "advanced", "max_results": 5},
+    ],
+    "deep": [
+        {"search_depth": "basic", "max_results": 3, "include_raw_content": True},
+        {"search_depth": "basic", "max_results": 5, "include_raw_content": True},
+        {"search_depth": "advanced", "max_results": 5, "include_raw_content": True},
+    ],
+    "social": [
+        {"search_depth": "basic", "max_results": 3},
+        {"search_depth": "advanced", "max_results": 5},
+    ],
+    "academic": [
+        {"search_depth": "basic", "max_results": 3},
+        {"search_depth": "advanced", "max_results": 5},
+    ],
+    "finance": [
+        {"search_depth": "basic", "max_results": 3},
+        {"search_depth": "advanced", "max_results": 5},
+    ],
+}
+
+# Режимы, ответ которых суммирует полный текст источников: результаты без
+# raw_content недостаточны, и поиск эскалируется
+RAW_CONTENT_MODES = ("deep",)
+
+# Пороги достаточности результатов (переопределяются переменными окружения)
+MIN_TOP_SCORE = float(os.getenv("SEARCH_MIN_TOP_SCORE", "0.6"))
+STRONG_SCORE = float(os.getenv("SEARCH_STRONG_SCORE", "0.5"))
+MIN_STRONG_RESULTS = int(os.getenv("SEARCH_MIN_STRONG_RESULTS", "2"))
+MIN_COVERAGE = float(os.getenv("SEARCH_MIN_COVERAGE", "0.6"))
+ESCALATION_ENABLED = os.getenv("SEARCH_ESCALATION", "1").lower() not in ("0", "false", "no")
+
+# Служебные слова, которые не учитываются при оценке покрытия запроса
+_STOP_WORDS = {
+    'что', 'такое', 'кто', 'какой', 'какая', 'какое', 'какие', 'каков', 'какова', 'где', 'когда',
+    'почему', 'зачем', 'сколько', 'как', 'для', 'или', 'это', 'про', 'чем', 'the', 'what', 'who',
+    'where', 'when', 'why', 'how', 'which', 'are', 'is', 'for', 'and', 'with', 'about', 'does'
+}
+
+
+def query_terms(query: str) -> List[str]:
+    """
+    Выделить значимые термины запроса (в виде основ) для оценки покрытия
+
+    Args:
+        query: Поисковый запрос пользователя
+
+    Returns:
+        Список основ значимых слов запроса
+    """
+    terms = []
+    for word in re.findall(r"\w+", query.lower()):
+        if len(word) < 3 or word in _STOP_WORDS:
+            continue
+        # Грубое отсечение окончаний, чтобы "акций" совпадало с "акции"
+        stem = word[:max(4, len(word) - 2)]
+        if stem not in terms:
+            terms.append(stem)
+    return terms
+
+
+def assess_results(query: str, results: List[Dict[str, Any]],
+                   min_top_score: float = None,
+                   min_strong_results: int = None,
+                   min_coverage: float = None,
+                   min_domains: int = 1) -> Dict[str, Any]:
+    """
+    Оценить, достаточно ли найденных результатов для ответа на запрос
+
+    Args:
+        query: Поисковый запрос пользователя
+        results: Результаты Tavily (словари с title, url, content, score)
+        min_top_score: Минимальный score лучшего результата
+        min_strong_results: Минимальное число результатов с высоким score
+        min_coverage: Минимальная доля терминов запроса, найденных в результатах
+        min_domains: Минимальное число различных доменов
+
+    Returns:
+        Словарь с метриками и флагом sufficient
+    """
+    min_top_score = MIN_TOP_SCORE if min_top_score is None else min_top_score
+    min_strong_results = MIN_STRONG_RESULTS if min_strong_results is None else min_strong_results
+    min_coverage = MIN_COVERAGE if min_coverage is None else min_coverage
+
+    scores = [float(r.get('score') or 0) for r in results]
+    top_score = max(scores) if scores else 0.0
+    strong_results = sum(1 for s in scores if s >= STRONG_SCORE)
+    domains = {urlparse(r.get('url', '')).netloc for r in results if r.get('url')}
+
+    terms = query_terms(query)
+    text = " ".join(
+        f"{r.get('title', '')} {r.get('content', '')}" for r in results
+    ).lower()
+    covered = sum(1 for t in terms if t in text)
+    coverage = covered / len(terms) if terms else 1.0
+
+    sufficient = (
+        top_score >= min_top_score
+        and strong_results >= min_strong_results
+        and coverage >= min_coverage
+        and len(domains) >= min_domains
+    )
+
+    return {
+        "top_score": round(top_score, 3),
+        "strong_results": strong_results,
+        "coverage": round(coverage, 3),
+        "domains": len(domains),
+        "sufficient": sufficient
+    }
+
+
+def adaptive_search(tavily_client, query: str, mode: str = "fast") -> Dict[str, Any]:
+    """
+    Поиск источников с эскалацией уровня: basic с малым max_results,
+    затем (при недостатке результатов) больше результатов, raw_content и advanced;
+    для режимов из RAW_CONTENT_MODES результаты без raw_content недостаточны
+
+    Args:
+        tavily_client: Клиент Tavily для выполнения запросов
+        query: Поисковый запрос пользователя
+        mode: Режим поиска ("fast", "deep", "social", "academic", "finance")
+
+    Returns:
+        Ответ Tavily последнего выполненного уровня с полем escalation
+    """
+    tiers = SEARCH_TIERS.get(mode, SEARCH_TIERS["fast"])
+    if not ESCALATION_ENABLED:
+        tiers = tiers[-1:]
+    base_params = MODE_SEARCH_PARAMS.get(mode, {})
+
+    search_results = {}
+    for level, tier in enumerate(tiers):
+        search_results = tavily_client.search(query, **base_params, **tier)
+        assessment = assess_results(query, search_results.get('results', []))
+        if mode in RAW_CONTENT_MODES:
+            assessment["raw_content"] = any(r.get('raw_content') for r in search_results.get('results', []))
+            assessment["sufficient"] = assessment["sufficient"] and assessment["raw_content"]
+        is_last = level == len(tiers) - 1
+
+        # Устаревший ответ при недоступном Tavily эскалировать бессмысленно
+        if assessment["sufficient"] or is_last or search_results.get("stale"):
+            if assessment["sufficient"]:
+                decision = "достаточно"
+            elif search_results.get("stale"):
+                decision = "устаревшие данные"
+            else:
+                decision = "последний уровень"
+            print(f"[search] mode={mode} tier={level} ({decision}): {assessment}")
+            search_results["escalation"] = {"tier": level, **assessment}
+            return search_results
+
+        print(f"[search] mode={mode} tier={level} недостаточно, эскалация: {assessment}")
+
+    return search_results
+
+
+__all__ = ['MODE_SEARCH_PARAMS', 'SEARCH_TIERS', 'RAW_CONTENT_MODES', 'query_terms', 'assess_results', 'adaptive_search']
@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(output: str) -> List[Dict[str, Any]]:
+    """
+    Разобрать вывод python -X importtime
+
+    Returns:
+        Список {"module", "self", "cumulative"} (секунды) в порядке вывода
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            modules.append({
+                "module": name.strip(),
+                "self": int(self_us) / 1e6,
+                "cumulative": int(cumulative_us) / 1e6
+            })
+        except ValueError:
+            continue
+    return modules
+
+
+def _child(warmup: bool, connections: bool):
+    """Запуск в отдельном интерпретаторе: импорт приложения и прогрев"""
+    start = time.monotonic()
+    import app  # noqa: F401
+    report = {"import_app": round(time.monotonic() - start, 3)}
+    if warmup:
+        from backend.warmup import warm_up
+        report["warmup"] = warm_up(connections=connections)
+    report["ready"] = round(time.monotonic() - start, 3)
+    print("STARTUP_REPORT " + json.dumps(report))
+
+
+def startup_report(warmup: bool = True, connections: bool = False, top: int = 15) -> Dict[str, Any]:
+    """
+    Замерить холодный старт в новом процессе
+
+    Args:
+        warmup: Выполнить прогрев (SDK провайдеров и графы режимов) после импорта
+        connections: Прогреть соединения с апстримами (обращается к сети)
+        top: Сколько самых медленных пакетов включить в отчёт
+
+    Returns:
+        Время до готовности, этапы старта и время импорта по пакетам и модулям backend
+    """
+    command = [sys.executable, "-X", "importtime", "-m", "backend.startup", "--child"]
+    if warmup:
+        command.append("--warmup")
+    if connections:
+        command.append("--connections")
+
+    start = time.monotonic()
+    completed = subprocess.run(command, cwd=PROJECT_ROOT, capture_output=True, text=True)
+    wall = time.monotonic() - start
+
+    child = {}
+    for line in completed.stdout.splitlines():
+        if line.startswith("STARTUP_REPORT "):
+            child = json.loads(line[len("STARTUP_REPORT "):])
+    if completed.returncode != 0 or not child:
+        raise RuntimeError(f"Замер старта завершился ошибкой: {completed.stderr[-2000:]}")
+
+    modules = parse_importtime(completed.stderr)
+    # Собственное время модулей суммируется по корневому пакету
+    packages = defaultdict(float)
+    for module in modules:
+        packages[module["module"].split(".")[0]] += module["self"]
+
+    return {
+        "process_to_ready": round(wall, 3),
+        "import_app": child["import_app"],
+        "warmup": child.get("warmup"),
+        "ready_after_import_start": child["ready"],
+        "packages": [
+            {"package": name, "seconds": round(seconds, 3)}
+            for name, seconds in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        ],
+        "backend": [
+            {"module": m["module"], "cumulative": round(m["cumulative"], 3)}
+            for m in modules if m["module"] == "app" or m["module"].startswith("backend.")
+        ]
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Текстовое представление отчёта о старте"""
+    lines = [
+        f"Процесс до готовности: {report['process_to_ready']:.3f} с",
+        f"Импорт app: {report['import_app']:.3f} с",
+        f"Готовность после начала импорта: {report['ready_after_import_start']:.3f} с",
+    ]
+    if report.get("warmup"):
+        lines.append("Прогрев:")
+        for stage, value in report["warmup"].items():
+            lines.append(f"  {stage:<32} {value}")
+    lines.append("Время импорта по пакетам (собственное):")
+    for entry in report["packages"]:
+        lines.append(f"  {entry['package']:<32} {entry['seconds']:.3f} с")
+    lines.append("Модули приложения (с зависимостями):")
+    for entry in report["backend"]:
+        lines.append(f"  {entry['module']:<32} {entry['cumulative']:.3f} с")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Отчёт о холодном старте сервиса")
+    parser.add_argument("--no-warmup", action="store_true", help="только импорт, без прогрева")
+    parser.add_argument("--connections", action="store_true", help="прогреть соединения с апстримами")
+    parser.add_argument("--top", type=int, default=15, help="число пакетов в отчёте")
+    parser.add_argument("--json", action="store_true", help="вывести отчёт в JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--warmup", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args.warmup, args.connections)
+        return 0
+
+    report = startup_report(warmup=not args.no_warmup, connections=args.connections, top=args.top)
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+    return 0
+
+
+__all__ = ['parse_importtime', 'startup_report', 'format_report', 'main']
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import os
+from typing import Dict, Any, Optional
+
+from backend.http_pool import get_http_client, UPSTREAM_BASE_URLS
+
+# Верхняя граница таймаута запроса к Tavily (как в SDK), секунды
+TAVILY_MAX_TIMEOUT = 120
+
+
+class PooledTavilyClient:
+    """
+    Клиент Tavily поверх общего пула HTTP-соединений процесса
+
+    Повторяет search/extract/crawl из tavily-python, но отправляет запросы
+    через общий keep-alive клиент вместо нового соединения на каждый вызов.
+    Ошибки апстрима отображаются в исключения tavily.errors, как в SDK.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        from tavily.errors import MissingAPIKeyError
+
+        self.api_key = api_key or os.getenv("TAVILY_API_KEY")
+        if not self.api_key:
+            raise MissingAPIKeyError()
+        self.base_url = (base_url or UPSTREAM_BASE_URLS["tavily"]()).rstrip("/")
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+            "X-Client-Source": "tavily-python"
+        }
+
+    def search(self, query: str, timeout: int = 60, **params) -> Dict[str, Any]:
+        result = self._post("/search", {"query": query, **params}, timeout)
+        result.setdefault("results", [])
+        return result
+
+    def extract(self, urls, timeout: int = 60, **params) -> Dict[str, Any]:
+        result = self._post("/extract", {"urls": urls, **params}, timeout)
+        result.setdefault("results", [])
+        result.setdefault("failed_results", [])
+        return result
+
+    def crawl(self, url: str, timeout: int = 60, **params) -> Dict[str, Any]:
+        return self._post("/crawl", {"url": url, **params}, timeout)
+
+    def _post(self, path: str, data: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        import httpx
+        from tavily import errors
+
+        # Незаданные параметры не отправляются - действуют значения API по умолчанию
+        data = {key: value for key, value in data.items() if value is not None}
+        timeout = min(timeout, TAVILY_MAX_TIMEOUT)
+        try:
+            response = get_http_client("tavily").post(self.base_url + path, json=data,
+                                                      headers=self.headers, timeout=timeout)
+        except httpx.TimeoutException:
+            raise errors.TimeoutError(timeout)
+
+        if response.status_code == 200:
+            return response.json()
+
+        detail = ""
+        try:
+            detail = response.json().get("detail", {}).get("error", None)
+        except Exception:
+            pass
+        if response.status_code == 429:
+            raise errors.UsageLimitExceededError(detail)
+        if response.status_code in (403, 432, 433):
+            raise errors.ForbiddenError(detail)
+        if response.status_code == 401:
+            raise errors.InvalidAPIKeyError(detail)
+        if response.status_code == 400:
+            raise errors.BadRequestError(detail)
+        response.raise_for_status()
+        return response.json()
+
+
+__all__ = ['TAVILY_MAX_TIMEOUT', 'PooledTavilyClient']
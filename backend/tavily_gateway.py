@@ -0,0 +1,250 @@
+import os
+import time
+import threading
+import contextvars
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable
+
+from backend.cache import TieredCache, create_cache, make_cache_key
+from backend.resilience import CircuitBreaker, CircuitOpenError
+from backend.ratelimit import RateLimitExceeded, get_key_pool, is_rate_limit_error
+from backend.metrics import record_cache
+from backend import accounting
+
+# Поиски по быстро меняющимся данным (котировки, новости, события дня):
+# их ответ свеж не дольше TAVILY_REALTIME_CACHE_TTL
+REALTIME_TOPICS = ("finance", "news")
+REALTIME_TIME_RANGES = ("day", "d")
+
+
+class SharedCalls:
+    """
+    Совместное выполнение одинаковых вызовов в рамках одной пакетной обработки
+
+    Первый вызов с ключом выполняется, остальные с тем же ключом (в том числе
+    параллельные) получают его результат или ошибку.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def run(self, key: str, func: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = self._calls[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+        record_cache("batch_shared", hit=not owner)
+        if owner:
+            try:
+                future.set_result(func())
+            except Exception as e:
+                future.set_exception(e)
+        # Копия, чтобы потребители не меняли общий результат
+        return dict(future.result())
+
+
+_shared_calls: contextvars.ContextVar = contextvars.ContextVar("tavily_shared_calls", default=None)
+
+
+class TavilyGateway:
+    """
+    Единая точка обращения к Tavily для эндпоинтов и инструментов агента
+
+    Все вызовы проходят через предохранитель, который размыкается по доле ошибок
+    или медленных вызовов. Пока предохранитель разомкнут, вызовы не уходят в
+    Tavily. Последний успешный ответ на каждый запрос сохраняется в памяти
+    процесса и в общем для воркеров кэше на диске. Ответ моложе TAVILY_CACHE_TTL
+    (страницы extract и crawl - TAVILY_PAGE_CACHE_TTL, поиски с topic finance
+    или news и time_range=day - TAVILY_REALTIME_CACHE_TTL) отдаётся без вызова
+    Tavily, а при ошибке или разомкнутом предохранителе отдаётся сохранённый
+    ответ любого возраста до TAVILY_STALE_TTL с пометками stale и stale_age.
+    API-ключ для каждого вызова выдаёт общий пул ключей с лимитом запросов.
+    """
+
+    def __init__(self, client=None, cache: Optional[TieredCache] = None):
+        # Явно переданный клиент используется для всех ключей (например, в тестах)
+        self._client = client
+        self._clients: Dict[str, Any] = {}
+        self._client_lock = threading.Lock()
+        self.key_pool = get_key_pool("tavily")
+        self.timeout = int(os.getenv("TAVILY_TIMEOUT", "30"))
+        self.breaker = CircuitBreaker(
+            "tavily",
+            window=int(os.getenv("TAVILY_BREAKER_WINDOW", "50")),
+            min_calls=int(os.getenv("TAVILY_BREAKER_MIN_CALLS", "10")),
+            error_threshold=float(os.getenv("TAVILY_BREAKER_ERROR_RATE", "0.5")),
+            slow_call_seconds=float(os.getenv("TAVILY_SLOW_CALL_SECONDS", "15")),
+            slow_call_threshold=float(os.getenv("TAVILY_SLOW_CALL_RATE", "0.5")),
+            open_seconds=float(os.getenv("TAVILY_BREAKER_OPEN_SECONDS", "30"))
+        )
+        self.cache = cache if cache is not None else create_cache(
+            "tavily",
+            max_entries=int(os.getenv("TAVILY_STALE_MAX_ENTRIES", "2000")),
+            ttl=float(os.getenv("TAVILY_STALE_TTL", "86400"))
+        )
+        # Сколько секунд ответ считается свежим и отдаётся из кэша; 0 - всегда вызывать Tavily
+        page_ttl = float(os.getenv("TAVILY_PAGE_CACHE_TTL", "86400"))
+        self.fresh_ttl = {
+            "search": float(os.getenv("TAVILY_CACHE_TTL", "900")),
+            "extract": page_ttl,
+            "crawl": page_ttl
+        }
+        self.realtime_ttl = float(os.getenv("TAVILY_REALTIME_CACHE_TTL", "60"))
+        self.stale_served = 0
+
+    def client_for(self, api_key: str):
+        """
+        Клиент Tavily для ключа создаётся при первом обращении; клиенты всех
+        ключей отправляют запросы через общий пул соединений процесса
+        """
+        if self._client is not None:
+            return self._client
+        if api_key not in self._clients:
+            with self._client_lock:
+                if api_key not in self._clients:
+                    from backend.tavily_client import PooledTavilyClient
+                    self._clients[api_key] = PooledTavilyClient(api_key=api_key or None)
+        return self._clients[api_key]
+
+    def search(self, query: str, **params) -> Dict[str, Any]:
+        return self._call("search", query, params, lambda client: client.search(query, **params))
+
+    def extract(self, urls, **params) -> Dict[str, Any]:
+        return self._call("extract", urls, params, lambda client: client.extract(urls, **params))
+
+    def crawl(self, url: str, **params) -> Dict[str, Any]:
+        return self._call("crawl", url, params, lambda client: client.crawl(url, **params))
+
+    def _call(self, method: str, target: Any, params: Dict[str, Any], func: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+        params.setdefault("timeout", self.timeout)
+        key = make_cache_key(method, target, {k: v for k, v in params.items() if k != "timeout"})
+
+        cached = self._cached(key, self._fresh_ttl(method, params))
+        if cached is not None:
+            return cached
+
+        shared = _shared_calls.get()
+        if shared is not None:
+            return shared.run(key, lambda: self._fetch(key, method, func))
+        return self._fetch(key, method, func)
+
+    def _fetch(self, key: str, method: str, func: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+        # SDK Tavily импортируется при первом вызове, а не при старте процесса
+        from tavily.errors import BadRequestError
+
+        if not self.breaker.allow_request():
+            return self._serve_stale(key, method, CircuitOpenError("tavily", self.breaker.retry_after()))
+
+        # Ключ с учётом лимита запросов; ответ 429 переключает на другой ключ
+        attempts = len(self.key_pool.keys)
+        for attempt in range(attempts):
+            try:
+                api_key = self.key_pool.acquire()
+            except RateLimitExceeded as e:
+                self.breaker.release()
+                return self._serve_stale(key, method, e)
+
+            start = time.monotonic()
+            accounting.count("tavily_calls")
+            try:
+                result = func(self.client_for(api_key))
+            except BadRequestError:
+                # Ошибка в параметрах запроса не говорит о здоровье апстрима: вызов не
+                # учитывается, в полуоткрытом состоянии пробным станет следующий вызов
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    self.key_pool.report_throttled(api_key)
+                    if attempt < attempts - 1:
+                        continue
+                    self.breaker.release()
+                    return self._serve_stale(key, method, e)
+                self.breaker.record(False, time.monotonic() - start)
+                return self._serve_stale(key, method, e)
+
+            self.breaker.record(True, time.monotonic() - start)
+            self.cache.set(key, dict(result))
+            return result
+
+    def _fresh_ttl(self, method: str, params: Dict[str, Any]) -> float:
+        """Сколько секунд ответ на вызов считается свежим"""
+        ttl = self.fresh_ttl.get(method, 0)
+        if method == "search" and (params.get("topic") in REALTIME_TOPICS
+                                   or params.get("time_range") in REALTIME_TIME_RANGES):
+            return min(ttl, self.realtime_ttl)
+        return ttl
+
+    def _cached(self, key: str, ttl: float) -> Optional[Dict[str, Any]]:
+        """Свежий сохранённый ответ (из памяти процесса или с диска) или None"""
+        if ttl <= 0:
+            return None
+        entry = self.cache.get_with_age(key, max_age=ttl)
+        hit = entry is not None and entry[1] <= ttl
+        record_cache("tavily", hit=hit)
+        return dict(entry[0]) if hit else None
+
+    @contextmanager
+    def shared_calls(self):
+        """
+        Контекст, в котором одинаковые вызовы Tavily выполняются один раз
+
+        Действует в текущем контексте выполнения; потоки, запущенные с копией
+        контекста (contextvars.copy_context), разделяют те же вызовы.
+        """
+        shared = SharedCalls()
+        token = _shared_calls.set(shared)
+        try:
+            yield shared
+        finally:
+            _shared_calls.reset(token)
+
+    def _serve_stale(self, key: str, method: str, error: Exception) -> Dict[str, Any]:
+        # Самая свежая копия: воркер мог сохранить ответ на диск после записи в память этого процесса
+        entry = self.cache.get_with_age(key, max_age=0)
+        record_cache("tavily_stale", hit=entry is not None)
+        if entry is None:
+            raise error
+        value, age = entry
+        self.stale_served += 1
+        print(f"[tavily] {method}: {error}; отдаём сохранённый результат возрастом {age:.0f} с")
+        return {**value, "stale": True, "stale_age": round(age, 1)}
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние предохранителя и кэша ответов"""
+        return {
+            "breaker": self.breaker.snapshot(),
+            "cache": self.cache.stats(),
+            "stale_entries": len(self.cache),
+            "stale_served": self.stale_served,
+            "keys": self.key_pool.usage()
+        }
+
+
+_gateway: Optional[TavilyGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_tavily_gateway() -> TavilyGateway:
+    """Получить общий для процесса шлюз Tavily"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = TavilyGateway()
+    return _gateway
+
+
+__all__ = [
+    'SharedCalls',
+    'TavilyGateway',
+    'get_tavily_gateway'
+]
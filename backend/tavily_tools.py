@@ -0,0 +1,53 @@
+from typing import Dict, Any
+
+# Модуль импортируется только при сборке инструментов агента,
+# чтобы langchain_tavily не загружался при старте процесса
+from langchain_tavily._utilities import (
+    TavilySearchAPIWrapper,
+    TavilyExtractAPIWrapper,
+    TavilyCrawlAPIWrapper
+)
+
+from backend.tavily_gateway import get_tavily_gateway
+from backend.metrics import tool_call
+
+
+# Ключи для вызовов выдаёт пул шлюза; обёрткам нужен лишь непустой ключ для валидации,
+# иначе они требуют TAVILY_API_KEY даже при заданном TAVILY_API_KEYS
+GATEWAY_API_KEY = "gateway"
+
+
+def _drop_none(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in params.items() if v is not None}
+
+
+class GatewaySearchAPIWrapper(TavilySearchAPIWrapper):
+    """Обёртка TavilySearch, направляющая вызовы инструмента через шлюз"""
+
+    def raw_results(self, query: str, **params) -> Dict:
+        with tool_call("tavily_search", query=query, **params):
+            return get_tavily_gateway().search(query, **_drop_none(params))
+
+
+class GatewayExtractAPIWrapper(TavilyExtractAPIWrapper):
+    """Обёртка TavilyExtract, направляющая вызовы инструмента через шлюз"""
+
+    def raw_results(self, urls, **params) -> Dict:
+        with tool_call("tavily_extract", urls=urls, **params):
+            return get_tavily_gateway().extract(urls, **_drop_none(params))
+
+
+class GatewayCrawlAPIWrapper(TavilyCrawlAPIWrapper):
+    """Обёртка TavilyCrawl, направляющая вызовы инструмента через шлюз"""
+
+    def raw_results(self, url: str, **params) -> Dict:
+        with tool_call("tavily_crawl", url=url, **params):
+            return get_tavily_gateway().crawl(url, **_drop_none(params))
+
+
+__all__ = [
+    'GATEWAY_API_KEY',
+    'GatewaySearchAPIWrapper',
+    'GatewayExtractAPIWrapper',
+    'GatewayCrawlAPIWrapper'
+]
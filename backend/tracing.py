@@ -0,0 +1,340 @@
+import os
+import re
+import json
+import time
+import abc
+import uuid
+import atexit
+import importlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+from backend.query_log import QueryLogSink
+
+# Трассировка запросов (TRACING=0 отключает запись спанов)
+TRACING_ENABLED = os.getenv("TRACING", "1").lower() not in ("0", "false", "no")
+# Разрешить ?debug=trace - дерево спанов (с аргументами инструментов) в теле ответа любому клиенту
+TRACE_DEBUG_ENABLED = os.getenv("TRACE_DEBUG", "0").lower() not in ("0", "false", "no")
+
+TRACE_HEADER = "X-Trace-Id"
+
+# Принимаемый от клиента идентификатор трассы
+_TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+# Максимальная длина строкового атрибута спана
+MAX_ATTRIBUTE_LENGTH = 500
+
+
+def _attribute(value: Any) -> Any:
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, default=str)
+    return value if len(value) <= MAX_ATTRIBUTE_LENGTH else value[:MAX_ATTRIBUTE_LENGTH] + "…"
+
+
+class Span:
+    """Шаг обработки запроса: имя, время начала, длительность и атрибуты"""
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.attributes = {key: _attribute(value) for key, value in attributes.items()}
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        for key, value in attributes.items():
+            self.attributes[key] = _attribute(value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration": round(self.duration, 6) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+
+class Trace:
+    """Спаны одного запроса; спаны из потоков инструментов добавляются под блокировкой"""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def tree(self) -> List[Dict[str, Any]]:
+        """Дерево спанов: время начала (мс) относительно начала трассы, дочерние спаны в children"""
+        with self._lock:
+            spans = list(self.spans)
+        if not spans:
+            return []
+        origin = min(span.start for span in spans)
+        now = time.time()
+        nodes = {}
+        for span in spans:
+            duration = span.duration if span.duration is not None else now - span.start
+            node = {
+                "name": span.name,
+                "span_id": span.span_id,
+                "start_ms": round((span.start - origin) * 1000, 1),
+                "duration_ms": round(duration * 1000, 1),
+                "attributes": span.attributes,
+                "children": []
+            }
+            if span.error:
+                node["error"] = span.error
+            nodes[span.span_id] = node
+        roots = []
+        for span in sorted(spans, key=lambda s: s.start):
+            node = nodes[span.span_id]
+            parent = nodes.get(span.parent_id)
+            (parent["children"] if parent else roots).append(node)
+        return roots
+
+
+class SpanExporter(abc.ABC):
+    """Получатель завершённых трасс; export вызывается один раз на трассу"""
+
+    @abc.abstractmethod
+    def export(self, spans: List[Dict[str, Any]]):
+        """Принять спаны трассы; вызывается в потоке запроса, поэтому не должен ждать ввода-вывода"""
+
+
+class NullExporter(SpanExporter):
+    def export(self, spans: List[Dict[str, Any]]):
+        pass
+
+
+class JsonlFileExporter(SpanExporter):
+    """
+    Запись спанов в локальный JSONL-файл (одна строка на спан) фоновым потоком
+
+    export только ставит спаны в буфер QueryLogSink: запись пачками, ротация
+    по max_bytes со сжатием в gzip (хранится backups архивов) и блокировка
+    файла на время записи и ротации, общего для воркеров gunicorn. После fork
+    воркер запускает свой поток записи.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backups: int = 5,
+                 buffer_size: int = 10000, flush_interval: float = 1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._sink: Optional[QueryLogSink] = None
+        self._lock = threading.Lock()
+
+    def _writer(self) -> QueryLogSink:
+        if self._sink is None or self._sink.pid != os.getpid():
+            with self._lock:
+                if self._sink is None or self._sink.pid != os.getpid():
+                    self._sink = QueryLogSink(
+                        self.path, buffer_size=self.buffer_size, flush_interval=self.flush_interval,
+                        max_bytes=self.max_bytes, backups=self.backups, name="tracing"
+                    )
+                    atexit.register(self._sink.close, timeout=2.0)
+        return self._sink
+
+    def export(self, spans: List[Dict[str, Any]]):
+        writer = self._writer()
+        for span in spans:
+            writer.log(span)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Дождаться записи уже экспортированных спанов"""
+        return self._writer().flush(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._writer().stats()
+
+
+def create_exporter() -> SpanExporter:
+    """
+    Экспортёр по TRACE_EXPORTER: jsonl (по умолчанию, файл TRACE_FILE), none
+    или путь к классу вида "package.module:ClassName"
+    """
+    kind = os.getenv("TRACE_EXPORTER", "jsonl")
+    if kind == "none":
+        return NullExporter()
+    if kind == "jsonl":
+        return JsonlFileExporter(
+            os.getenv("TRACE_FILE", "traces.jsonl"),
+            max_bytes=int(os.getenv("TRACE_FILE_MAX_BYTES", str(10 * 1024 * 1024))),
+            backups=int(os.getenv("TRACE_FILE_BACKUPS", "5"))
+        )
+    module_name, _, class_name = kind.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+_exporter: Optional[SpanExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> SpanExporter:
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = create_exporter()
+    return _exporter
+
+
+def set_exporter(exporter: Optional[SpanExporter]):
+    """Заменить экспортёр процесса (None - снова создать по TRACE_EXPORTER)"""
+    global _exporter
+    _exporter = exporter
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def new_trace_id(requested: Optional[str] = None) -> str:
+    """Идентификатор трассы: переданный клиентом (если корректен) или новый"""
+    if requested and _TRACE_ID_PATTERN.match(requested):
+        return requested
+    return uuid.uuid4().hex
+
+
+def begin_trace(name: str, trace_id: Optional[str] = None, **attributes) -> Optional[tuple]:
+    """
+    Начать трассу с корневым спаном в текущем контексте
+
+    Returns:
+        Состояние для end_trace или None, если трассировка отключена
+    """
+    if not TRACING_ENABLED:
+        return None
+    trace = Trace(new_trace_id(trace_id))
+    root = Span(trace, name, None, attributes)
+    trace.add(root)
+    return trace, root, _current_trace.set(trace), _current_span.set(root)
+
+
+def end_trace(state: Optional[tuple], error: Optional[BaseException] = None):
+    """Завершить трассу, начатую begin_trace, и передать её спаны экспортёру"""
+    if state is None:
+        return
+    trace, root, trace_token, span_token = state
+    root.duration = time.time() - root.start
+    if error is not None:
+        root.error = f"{type(error).__name__}: {error}"
+    _current_span.reset(span_token)
+    _current_trace.reset(trace_token)
+    try:
+        get_exporter().export([span.to_dict() for span in trace.spans])
+    except Exception as e:
+        print(f"[tracing] не удалось экспортировать трассу {trace.trace_id}: {e}")
+
+
+@contextmanager
+def start_trace(name: str, trace_id: Optional[str] = None, **attributes):
+    """Контекст трассы (для фоновых заданий и скриптов); возвращает трассу или None"""
+    state = begin_trace(name, trace_id, **attributes)
+    error = None
+    try:
+        yield state[0] if state else None
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        end_trace(state, error)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Спан шага внутри текущей трассы; вне трассы ничего не записывает
+
+    Yields:
+        Span (атрибуты можно дополнить через span.set) или None
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = Span(trace, name, parent.span_id if parent else None, attributes)
+    trace.add(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration = time.time() - current.start
+        _current_span.reset(token)
+
+
+def record_span(name: str, start: float, duration: float, error: Optional[str] = None, **attributes):
+    """Добавить уже завершённый спан (например, HTTP-вызов, замеренный хуками клиента)"""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    recorded = Span(trace, name, parent.span_id if parent else None, attributes)
+    recorded.start = start
+    recorded.duration = duration
+    recorded.error = error
+    trace.add(recorded)
+
+
+def annotate(**attributes):
+    """Дополнить атрибуты текущего спана"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+__all__ = [
+    'TRACE_HEADER',
+    'TRACE_DEBUG_ENABLED',
+    'Span',
+    'Trace',
+    'SpanExporter',
+    'NullExporter',
+    'JsonlFileExporter',
+    'create_exporter',
+    'get_exporter',
+    'set_exporter',
+    'current_trace',
+    'current_trace_id',
+    'current_span',
+    'new_trace_id',
+    'begin_trace',
+    'end_trace',
+    'start_trace',
+    'span',
+    'record_span',
+    'annotate'
+]
@@ -0,0 +1,154 @@
+import os
+import time
+import importlib
+import threading
+from typing import Dict, Any, Optional
+
+from backend.agent import get_agent, AGENT_MODES
+from backend.providers import configured_providers
+from backend.http_pool import UPSTREAM_BASE_URLS, warm_pool
+
+# Таймаут прогревочного запроса к апстриму, секунды
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "5"))
+
+# Модули SDK, которые загружаются лениво при первом обращении к провайдеру
+PROVIDER_MODULES = {
+    "openai": "langchain_openai",
+    "anthropic": "backend.chat_models",
+}
+
+_state: Dict[str, Any] = {"status": "pending", "timings": {}, "error": None}
+_state_lock = threading.Lock()
+
+
+def warmup_mode() -> str:
+    """
+    Режим прогрева из WARMUP:
+    - sync: подготовка до приёма трафика (в gunicorn - в мастер-процессе до fork)
+    - background: процесс сразу принимает трафик, подготовка идёт в фоновом потоке
+    - off: всё загружается лениво первыми запросами
+    """
+    mode = os.getenv("WARMUP", "sync").lower()
+    return mode if mode in ("sync", "background", "off") else "sync"
+
+
+def import_provider_sdks(model_type: Optional[str] = None) -> Dict[str, float]:
+    """Загрузить SDK настроенных провайдеров LLM заранее"""
+    model_type = model_type or os.getenv("MODEL_TYPE", "openai")
+    timings = {}
+    for provider in configured_providers(model_type):
+        module = PROVIDER_MODULES.get(provider, PROVIDER_MODULES["openai"])
+        start = time.monotonic()
+        importlib.import_module(module)
+        timings[f"import:{module}"] = round(time.monotonic() - start, 3)
+    return timings
+
+
+def preload(model_type: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Подготовить процесс к обслуживанию без обращений к сети
+
+    Загружает SDK провайдеров, создаёт общий агент и компилирует графы всех
+    режимов. Безопасно вызывать в мастер-процессе до fork: воркеры получают
+    готовые графы копированием страниц памяти при записи.
+
+    Returns:
+        Время подготовки по этапам, секунды
+    """
+    model_type = model_type or os.getenv("MODEL_TYPE", "openai")
+    timings = import_provider_sdks(model_type)
+
+    start = time.monotonic()
+    agent = get_agent(model_type)
+    timings["agent"] = round(time.monotonic() - start, 3)
+
+    for mode in AGENT_MODES:
+        start = time.monotonic()
+        agent.compiled_graph(mode)
+        timings[f"graph:{mode}"] = round(time.monotonic() - start, 3)
+
+    print(f"[warmup] графы режимов скомпилированы: {timings}")
+    return timings
+
+
+def warm_connections(model_type: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Открыть соединения с апстримами до приёма трафика
+
+    Вызывается в каждом воркере после fork. Клиенты моделей и Tavily делят пул
+    HTTP-соединений на апстрим, поэтому лёгкий запрос к базовому URL оставляет
+    в пуле готовое TLS-соединение для первых запросов. Ошибки прогрева не
+    мешают запуску воркера.
+
+    Returns:
+        Результат прогрева по апстримам: время или текст ошибки
+    """
+    model_type = model_type or os.getenv("MODEL_TYPE", "openai")
+    report = {}
+    for upstream in list(configured_providers(model_type)) + ["tavily"]:
+        upstream = upstream if upstream in UPSTREAM_BASE_URLS else "openai"
+        if upstream in report:
+            continue
+        start = time.monotonic()
+        try:
+            warm_pool(upstream, timeout=WARMUP_TIMEOUT)
+            report[upstream] = round(time.monotonic() - start, 3)
+        except Exception as e:
+            report[upstream] = f"error: {e}"
+    print(f"[warmup] соединения с апстримами: {report}")
+    return report
+
+
+def warm_up(model_type: Optional[str] = None, connections: bool = False) -> Dict[str, Any]:
+    """
+    Полный прогрев процесса: preload и (опционально) соединения с апстримами
+
+    Returns:
+        Время прогрева по этапам, секунды
+    """
+    start = time.monotonic()
+    with _state_lock:
+        _state.update(status="running", error=None)
+    try:
+        timings = preload(model_type)
+        if connections:
+            timings["connections"] = warm_connections(model_type)
+        timings["total"] = round(time.monotonic() - start, 3)
+    except Exception as e:
+        print(f"[warmup] ошибка прогрева: {e}")
+        with _state_lock:
+            _state.update(status="failed", error=str(e))
+        raise
+    with _state_lock:
+        _state.update(status="done", timings=timings)
+    return timings
+
+
+def start_background_warmup(model_type: Optional[str] = None, connections: bool = False) -> threading.Thread:
+    """Запустить прогрев в фоновом потоке; процесс тем временем принимает запросы"""
+    def run():
+        try:
+            warm_up(model_type, connections)
+        except Exception:
+            pass
+
+    thread = threading.Thread(target=run, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def warmup_state() -> Dict[str, Any]:
+    """Состояние прогрева: pending, running, done или failed"""
+    with _state_lock:
+        return {"status": _state["status"], "timings": dict(_state["timings"]), "error": _state["error"]}
+
+
+__all__ = [
+    'warmup_mode',
+    'import_provider_sdks',
+    'preload',
+    'warm_connections',
+    'warm_up',
+    'start_background_warmup',
+    'warmup_state'
+]
@@ -0,0 +1,131 @@
+# Запись и проверка кассет трафика апстримов:
+#   python -m benchmarks.cassette record --cassette cassettes/base.jsonl.gz --modes fast,deep
+#   python -m benchmarks.cassette verify --cassette cassettes/base.jsonl.gz
+# record прогоняет запросы через маршруты app.py с настоящими апстримами и сохраняет
+# ответы эндпоинтов рядом с кассетой; verify воспроизводит кассету и сверяет ответы побайтно.
+import os
+import sys
+import json
+import argparse
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run import BENCH_ENV, BENCH_MODES, BENCH_QUERIES
+
+
+def outputs_path(cassette: str) -> str:
+    """Файл эталонных ответов эндпоинтов для кассеты"""
+    return cassette + ".outputs.json"
+
+
+def load_queries(path: Optional[str], modes: List[str]) -> Dict[str, List[str]]:
+    """Запросы по режимам: из файла (по строке на запрос, для всех режимов) или BENCH_QUERIES"""
+    if not path:
+        return {mode: BENCH_QUERIES[mode] for mode in modes}
+    with open(path, encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+    return {mode: queries for mode in modes}
+
+
+def run_queries(queries: Dict[str, List[str]]) -> Dict[str, str]:
+    """
+    Последовательно выполнить запросы через маршруты /search/<mode>
+
+    Запросы идут по одному, чтобы повторяющиеся вызовы апстримов записывались
+    и воспроизводились в одном порядке.
+
+    Returns:
+        {"<mode>\\t<query>": тело ответа}
+    """
+    import app as app_module
+
+    client = app_module.app.test_client()
+    outputs = {}
+    for mode, mode_queries in queries.items():
+        for query in mode_queries:
+            response = client.post(f"/search/{mode}", json={"query": query})
+            outputs[f"{mode}\t{query}"] = response.get_data(as_text=True)
+            print(f"{mode:<9} {response.status_code} {query}", flush=True)
+    return outputs
+
+
+def record(cassette: str, queries: Dict[str, List[str]]) -> Dict[str, str]:
+    """Записать трафик апстримов в кассету (новый файл) и сохранить ответы эндпоинтов"""
+    for path in (cassette, outputs_path(cassette)):
+        if os.path.exists(path):
+            os.remove(path)
+    os.environ.update({"CASSETTE_MODE": "record", "CASSETTE_FILE": cassette})
+    outputs = run_queries(queries)
+    with open(outputs_path(cassette), "w", encoding="utf-8") as f:
+        json.dump(outputs, f, ensure_ascii=False, indent=1)
+    return outputs
+
+
+def verify(cassette: str) -> List[str]:
+    """
+    Воспроизвести кассету и сравнить ответы эндпоинтов с записанными
+
+    Returns:
+        Ключи "<mode>\\t<query>", ответы которых отличаются
+    """
+    with open(outputs_path(cassette), encoding="utf-8") as f:
+        expected = json.load(f)
+    queries: Dict[str, List[str]] = {}
+    for key in expected:
+        mode, query = key.split("\t", 1)
+        queries.setdefault(mode, []).append(query)
+    os.environ.update({"CASSETTE_MODE": "replay", "CASSETTE_FILE": cassette})
+    actual = run_queries(queries)
+    return [key for key, body in expected.items() if actual.get(key) != body]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Запись и проверка кассет трафика Tavily и LLM")
+    parser.add_argument("command", choices=("record", "verify"))
+    parser.add_argument("--cassette", default="cassettes/upstream.jsonl.gz", help="файл кассеты (.jsonl.gz)")
+    parser.add_argument("--modes", default=",".join(BENCH_MODES), help="режимы через запятую (record)")
+    parser.add_argument("--queries", help="файл запросов, по одному на строку (record)")
+    parser.add_argument("--standin", action="store_true",
+                        help="записывать трафик локального StandInServer вместо настоящих апстримов (record)")
+    args = parser.parse_args(argv)
+
+    # Журналы, лимиты ключей и кэши ответов не участвуют в записи и воспроизведении
+    for key in ("TRACE_EXPORTER", "SLOW_REQUEST_LOG", "WARMUP", "OPENAI_RATE_LIMIT", "OPENAI_RATE_BURST",
+                "TAVILY_RATE_LIMIT", "TAVILY_RATE_BURST", "CACHE_DISK_PATH", "TAVILY_CACHE_TTL",
+                "TAVILY_PAGE_CACHE_TTL"):
+        os.environ.setdefault(key, BENCH_ENV[key])
+
+    if args.command == "verify":
+        for key in ("OPENAI_API_KEY", "TAVILY_API_KEY"):
+            os.environ.setdefault(key, BENCH_ENV[key])
+        mismatched = verify(args.cassette)
+        for key in mismatched:
+            print(f"РАСХОЖДЕНИЕ {key.replace(chr(9), ' ')}")
+        if not mismatched:
+            print("Ответы при воспроизведении кассеты совпадают с записанными")
+        return 1 if mismatched else 0
+
+    modes = [mode for mode in args.modes.split(",") if mode]
+    server = None
+    if args.standin:
+        from benchmarks.standin_server import StandInServer
+        from benchmarks.standins import TavilyScenario, ChatScenario
+        for key, value in BENCH_ENV.items():
+            os.environ.setdefault(key, value)
+        server = StandInServer(tavily=TavilyScenario("0"), chat=ChatScenario("0")).start()
+        os.environ.update(server.env())
+    try:
+        outputs = record(args.cassette, load_queries(args.queries, modes))
+    finally:
+        if server is not None:
+            server.stop()
+    print(f"Записано {len(outputs)} ответов в {args.cassette}")
+    return 0
+
+
+__all__ = ['outputs_path', 'load_queries', 'run_queries', 'record', 'verify', 'main']
+
+
+if __name__ == "__main__":
+    sys.exit(main())
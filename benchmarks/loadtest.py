@@ -0,0 +1,304 @@
+# Нагрузочный тест: воспроизведение журнала запросов против работающего сервиса
+#   python -m benchmarks.loadtest --url http://127.0.0.1:8000 --log queries.jsonl --time-scale 10
+#   python -m benchmarks.loadtest --log queries.jsonl --ramp 2,4,8,16 --stage-duration 60 --mix fast=0.7,deep=0.3
+# Нагрузка открытая: запросы отправляются по расписанию прибытия независимо от
+# завершения предыдущих, задержка отсчитывается от запланированного момента.
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run import BENCH_MODES, BENCH_QUERIES, percentile
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def load_log(path: str) -> List[Dict[str, Any]]:
+    """
+    Прочитать журнал запросов (JSON Lines: mode или endpoint, query, timestamp)
+
+    timestamp - секунды epoch или ISO 8601; записи без запроса или с
+    неизвестным режимом пропускаются, записи сортируются по времени.
+    """
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            # В журнале запросов сервиса endpoint - запрошенный режим (auto до маршрутизации)
+            mode = record.get("endpoint") or record.get("mode") or "auto"
+            if not record.get("query") or mode not in BENCH_MODES:
+                continue
+            entries.append({"mode": mode, "query": record["query"], "timestamp": _timestamp(record.get("timestamp"))})
+    entries.sort(key=lambda entry: entry["timestamp"] or 0.0)
+    return entries
+
+
+def parse_mix(spec: Optional[str]) -> Optional[Dict[str, float]]:
+    """Смесь режимов "fast=0.6,deep=0.1,..." -> нормированные веса"""
+    if not spec:
+        return None
+    weights = {}
+    for part in spec.split(","):
+        mode, _, weight = part.partition("=")
+        if mode.strip() not in BENCH_MODES:
+            raise ValueError(f"Неизвестный режим в смеси: {mode}")
+        weights[mode.strip()] = float(weight)
+    total = sum(weights.values())
+    return {mode: weight / total for mode, weight in weights.items()}
+
+
+def schedule(entries: List[Dict[str, Any]], rate: Optional[float] = None, time_scale: float = 1.0,
+             duration: Optional[float] = None, mix: Optional[Dict[str, float]] = None,
+             seed: int = 0) -> List[Tuple[float, str, str]]:
+    """
+    Расписание прибытия запросов: [(смещение в секундах, режим, запрос)]
+
+    Args:
+        entries: Записи журнала
+        rate: Открытая нагрузка с пуассоновским прибытием и средней частотой rate
+            запросов в секунду; без rate - интервалы из timestamp журнала
+        time_scale: Ускорение журнала (2 - вдвое быстрее исходного)
+        duration: Ограничение длительности, секунды (с rate - обязательно)
+        mix: Переопределение смеси режимов: режим каждого запроса выбирается по
+            весам, запрос - из записей этого режима (если их нет - из всего журнала)
+        seed: Инициализация генератора
+
+    Returns:
+        Расписание, упорядоченное по смещению
+    """
+    rng = random.Random(seed)
+    by_mode: Dict[str, List[str]] = {}
+    for entry in entries:
+        by_mode.setdefault(entry["mode"], []).append(entry["query"])
+    all_queries = [entry["query"] for entry in entries]
+
+    def pick(index: int) -> Tuple[str, str]:
+        if mix is None:
+            entry = entries[index % len(entries)]
+            return entry["mode"], entry["query"]
+        mode = rng.choices(list(mix), weights=list(mix.values()))[0]
+        return mode, rng.choice(by_mode.get(mode) or all_queries)
+
+    plan = []
+    if rate:
+        if not duration:
+            raise ValueError("Для нагрузки с заданной частотой нужна длительность")
+        offset, index = 0.0, 0
+        while True:
+            offset += rng.expovariate(rate)
+            if offset >= duration:
+                break
+            plan.append((offset, *pick(index)))
+            index += 1
+        return plan
+
+    start = next((entry["timestamp"] for entry in entries if entry["timestamp"] is not None), None)
+    previous = 0.0
+    for index, entry in enumerate(entries):
+        # Записи без времени идут сразу за предыдущими
+        offset = (entry["timestamp"] - start) / time_scale if entry["timestamp"] is not None else previous
+        if duration and offset >= duration:
+            break
+        previous = offset
+        plan.append((offset, *pick(index)))
+    return plan
+
+
+def run_load(url: str, plan: List[Tuple[float, str, str]], timeout: float = 120.0,
+             max_inflight: int = 1000) -> List[Dict[str, Any]]:
+    """
+    Отправить запросы по расписанию на /search/<mode>
+
+    Каждый запрос выполняется в своём потоке, чтобы медленные ответы не
+    задерживали отправку следующих; сверх max_inflight одновременных запросов
+    новые не отправляются и учитываются как dropped (перегружен генератор).
+
+    Returns:
+        [{"mode", "status", "latency", "timeout", "error", "dropped"}]
+    """
+    import httpx
+
+    client = httpx.Client(base_url=url.rstrip("/"), timeout=timeout,
+                          limits=httpx.Limits(max_connections=max_inflight, max_keepalive_connections=max_inflight))
+    results: List[Dict[str, Any]] = []
+    results_lock = threading.Lock()
+    inflight = threading.BoundedSemaphore(max_inflight)
+    threads = []
+
+    def send(scheduled: float, mode: str, query: str):
+        result = {"mode": mode, "status": None, "latency": None, "timeout": False, "error": None, "dropped": False}
+        try:
+            response = client.post(f"/search/{mode}", json={"query": query})
+            result["status"] = response.status_code
+            if response.status_code >= 400:
+                result["error"] = f"HTTP {response.status_code}"
+        except httpx.TimeoutException:
+            result["timeout"] = True
+            result["error"] = "timeout"
+        except httpx.HTTPError as e:
+            result["error"] = type(e).__name__
+        finally:
+            inflight.release()
+        result["latency"] = time.monotonic() - scheduled
+        with results_lock:
+            results.append(result)
+
+    started = time.monotonic()
+    for offset, mode, query in plan:
+        delay = started + offset - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        if not inflight.acquire(blocking=False):
+            with results_lock:
+                results.append({"mode": mode, "status": None, "latency": None, "timeout": False,
+                                "error": "dropped", "dropped": True})
+            continue
+        thread = threading.Thread(target=send, args=(started + offset, mode, query), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    client.close()
+    return results
+
+
+def summarize(results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Распределение задержек успешных ответов, доля ошибок и таймаутов по режимам и в целом"""
+
+    def stats(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        latencies = [row["latency"] for row in rows if row["error"] is None]
+        statuses: Dict[str, int] = {}
+        for row in rows:
+            key = str(row["status"]) if row["status"] is not None else row["error"]
+            statuses[key] = statuses.get(key, 0) + 1
+        total = len(rows)
+        return {
+            "requests": total,
+            "ok": len(latencies),
+            "error_rate": round(sum(1 for row in rows if row["error"]) / total, 4) if total else 0.0,
+            "timeout_rate": round(sum(1 for row in rows if row["timeout"]) / total, 4) if total else 0.0,
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p90_ms": round(percentile(latencies, 90) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "max_ms": round(max(latencies) * 1000, 1) if latencies else 0.0,
+            "statuses": dict(sorted(statuses.items()))
+        }
+
+    modes = sorted({row["mode"] for row in results})
+    return {
+        "offered_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "overall": stats(results),
+        "modes": {mode: stats([row for row in results if row["mode"] == mode]) for mode in modes}
+    }
+
+
+def saturation_point(stages: List[Dict[str, Any]], slo_p95_ms: float, max_error_rate: float) -> Optional[float]:
+    """
+    Точка насыщения: наибольшая частота ступени, на которой сервис ещё
+    успевает (пропускная способность не ниже 90% предложенной), p95 в пределах
+    SLO и доля ошибок не выше допустимой; None, если не выдержана ни одна ступень
+    """
+    sustained = None
+    for stage in stages:
+        overall = stage["summary"]["overall"]
+        if (overall["throughput_rps"] >= 0.9 * stage["rate"] and overall["p95_ms"] <= slo_p95_ms
+                and overall["error_rate"] <= max_error_rate):
+            sustained = stage["rate"]
+        else:
+            break
+    return sustained
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    lines = []
+    for name, row in [("всего", summary["overall"])] + list(summary["modes"].items()):
+        lines.append(f"  {name:<9} n={row['requests']:<5} ok={row['ok']:<5} rps={row['throughput_rps']:<7} "
+                     f"p50={row['p50_ms']:<8} p95={row['p95_ms']:<8} p99={row['p99_ms']:<8} "
+                     f"ошибки={row['error_rate']:.1%} таймауты={row['timeout_rate']:.1%} {row['statuses']}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Воспроизведение журнала запросов против эндпоинтов /search/*")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="адрес сервиса")
+    parser.add_argument("--log", help="журнал запросов JSONL (mode, query, timestamp); без него - BENCH_QUERIES")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="ускорение журнала (2 - вдвое быстрее)")
+    parser.add_argument("--rate", type=float, help="открытая нагрузка, запросов в секунду (вместо времени журнала)")
+    parser.add_argument("--ramp", help="ступени частоты через запятую для поиска точки насыщения, например 2,4,8,16")
+    parser.add_argument("--duration", type=float, help="длительность прогона, секунды")
+    parser.add_argument("--stage-duration", type=float, default=30.0, help="длительность ступени --ramp, секунды")
+    parser.add_argument("--mix", help="смесь режимов, например fast=0.6,deep=0.1,social=0.1,academic=0.1,finance=0.1")
+    parser.add_argument("--timeout", type=float, default=120.0, help="таймаут запроса клиента, секунды")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="предел одновременных запросов генератора")
+    parser.add_argument("--slo-p95", type=float, default=30000.0, help="SLO p95 для точки насыщения, мс")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="допустимая доля ошибок ступени")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="записать отчёт в JSON-файл")
+    args = parser.parse_args(argv)
+
+    if args.log:
+        entries = load_log(args.log)
+    else:
+        entries = [{"mode": mode, "query": query, "timestamp": None}
+                   for mode, queries in BENCH_QUERIES.items() for query in queries]
+    if not entries:
+        print("Журнал запросов пуст")
+        return 1
+    mix = parse_mix(args.mix)
+
+    report: Dict[str, Any] = {"url": args.url, "config": vars(args)}
+    if args.ramp:
+        stages = []
+        for rate in [float(value) for value in args.ramp.split(",") if value]:
+            plan = schedule(entries, rate=rate, duration=args.stage_duration, mix=mix, seed=args.seed)
+            started = time.monotonic()
+            results = run_load(args.url, plan, args.timeout, args.max_inflight)
+            summary = summarize(results, time.monotonic() - started)
+            print(f"ступень {rate} rps:\n{format_summary(summary)}", flush=True)
+            stages.append({"rate": rate, "summary": summary})
+        report["stages"] = stages
+        report["saturation_rps"] = saturation_point(stages, args.slo_p95, args.max_error_rate)
+        print(f"Точка насыщения: {report['saturation_rps']} rps "
+              f"(p95 <= {args.slo_p95:.0f} мс, ошибки <= {args.max_error_rate:.0%})")
+    else:
+        plan = schedule(entries, rate=args.rate, time_scale=args.time_scale,
+                        duration=args.duration or (60.0 if args.rate else None), mix=mix, seed=args.seed)
+        started = time.monotonic()
+        results = run_load(args.url, plan, args.timeout, args.max_inflight)
+        report["summary"] = summarize(results, time.monotonic() - started)
+        print(f"{len(plan)} запросов:\n{format_summary(report['summary'])}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+__all__ = ['load_log', 'parse_mix', 'schedule', 'run_load', 'summarize', 'saturation_point', 'main']
+
+
+if __name__ == "__main__":
+    sys.exit(main())
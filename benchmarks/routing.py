@@ -0,0 +1,211 @@
+# Бенчмарк маршрутизатора на размеченном наборе запросов (benchmarks/routing_dataset.jsonl):
+#   python -m benchmarks.routing
+#   python -m benchmarks.routing --router agent --router mypackage.router:route --weights '{"deep": 90}'
+# Для каждого маршрутизатора - матрица ошибок, точность и полнота по режимам,
+# скорость (запросов в секунду) и стоимость ошибок маршрутизации в секундах.
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+from typing import Dict, Any, List, Optional, Callable
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "routing_dataset.jsonl")
+
+ROUTED_MODES = ("fast", "deep", "social", "academic", "finance")
+
+# Типичная длительность ответа режима, секунды; ROUTING_LATENCY_WEIGHTS (JSON) или --weights переопределяют
+DEFAULT_LATENCY_WEIGHTS = {
+    "fast": 5.0,
+    "deep": 60.0,
+    "social": 15.0,
+    "academic": 20.0,
+    "finance": 12.0,
+}
+
+
+def load_dataset(path: str = DATASET_PATH) -> List[Dict[str, str]]:
+    """Размеченные запросы: [{"query", "mode", "lang"}]"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def latency_weights(overrides: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    weights = dict(DEFAULT_LATENCY_WEIGHTS)
+    raw = os.getenv("ROUTING_LATENCY_WEIGHTS")
+    if raw:
+        weights.update({mode: float(value) for mode, value in json.loads(raw).items()})
+    weights.update(overrides or {})
+    return weights
+
+
+def load_router(spec: str) -> Callable[[str], str]:
+    """
+    Маршрутизатор по спецификации
+
+    Args:
+        spec: "agent" - WebAgent.route_query общего агента процесса;
+            "package.module:name" - функция query -> mode или класс с методом route_query
+
+    Returns:
+        Функция query -> mode
+    """
+    if spec == "agent":
+        from backend.agent import get_agent
+        return get_agent(os.getenv("MODEL_TYPE", "openai")).route_query
+    module_name, _, attribute = spec.partition(":")
+    router = getattr(importlib.import_module(module_name), attribute or "route_query")
+    if isinstance(router, type):
+        return router().route_query
+    return router
+
+
+def misroute_cost(expected: str, routed: str, weights: Dict[str, float]) -> float:
+    """
+    Лишние секунды из-за ошибки маршрутизации
+
+    Запрос, отправленный в deep, получает полноценный, но более медленный ответ:
+    стоимость - разница длительностей режимов. Любая другая ошибка даёт
+    неподходящий ответ, и запрос повторяется в нужном режиме: стоимость -
+    длительность напрасного ответа.
+    """
+    if routed == expected:
+        return 0.0
+    if routed == "deep":
+        return max(weights[routed] - weights[expected], 0.0)
+    return weights[routed]
+
+
+def evaluate(router: Callable[[str], str], dataset: List[Dict[str, str]],
+             weights: Optional[Dict[str, float]] = None, repeat: int = 100) -> Dict[str, Any]:
+    """
+    Оценить маршрутизатор на наборе
+
+    Args:
+        router: Функция query -> mode
+        dataset: Размеченные запросы
+        weights: Длительности режимов для стоимости ошибок
+        repeat: Сколько раз прогнать набор для замера скорости
+
+    Returns:
+        accuracy, confusion[expected][routed], per_mode (precision, recall, support),
+        per_lang accuracy, queries_per_second, мкс на запрос, стоимость ошибок и сами ошибки
+    """
+    weights = weights or latency_weights()
+    modes = list(ROUTED_MODES)
+    confusion = {expected: {routed: 0 for routed in modes} for expected in modes}
+    per_lang: Dict[str, List[int]] = {}
+    misroutes = []
+    total_cost = 0.0
+
+    for row in dataset:
+        routed = router(row["query"])
+        if routed not in confusion[row["mode"]]:
+            for line in confusion.values():
+                line[routed] = 0
+            confusion[routed] = {mode: 0 for mode in confusion[row["mode"]]}
+        confusion[row["mode"]][routed] += 1
+        correct = routed == row["mode"]
+        lang = per_lang.setdefault(row.get("lang", "?"), [0, 0])
+        lang[0] += int(correct)
+        lang[1] += 1
+        if not correct:
+            cost = misroute_cost(row["mode"], routed, weights) if routed in weights else weights[row["mode"]]
+            total_cost += cost
+            misroutes.append({"query": row["query"], "expected": row["mode"], "routed": routed,
+                              "cost_s": round(cost, 1)})
+
+    per_mode = {}
+    for mode in modes:
+        true_positive = confusion[mode][mode]
+        predicted = sum(line.get(mode, 0) for line in confusion.values())
+        support = sum(confusion[mode].values())
+        per_mode[mode] = {
+            "precision": round(true_positive / predicted, 3) if predicted else 0.0,
+            "recall": round(true_positive / support, 3) if support else 0.0,
+            "support": support
+        }
+
+    queries = [row["query"] for row in dataset]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            router(query)
+    elapsed = time.perf_counter() - start
+    calls = repeat * len(queries)
+
+    correct = sum(confusion[mode][mode] for mode in modes)
+    return {
+        "accuracy": round(correct / len(dataset), 3) if dataset else 0.0,
+        "confusion": confusion,
+        "per_mode": per_mode,
+        "per_lang": {lang: round(hits / total, 3) for lang, (hits, total) in sorted(per_lang.items())},
+        "queries_per_second": round(calls / elapsed, 1) if elapsed else 0.0,
+        "us_per_query": round(elapsed / calls * 1e6, 2) if calls else 0.0,
+        "misroute_cost_s": round(total_cost, 1),
+        "cost_per_query_s": round(total_cost / len(dataset), 3) if dataset else 0.0,
+        "misroutes": misroutes
+    }
+
+
+def format_report(name: str, report: Dict[str, Any]) -> str:
+    modes = list(report["confusion"])
+    lines = [f"== {name}: точность {report['accuracy']:.1%} "
+             f"({', '.join(f'{lang} {value:.1%}' for lang, value in report['per_lang'].items())}), "
+             f"{report['queries_per_second']:.0f} запросов/с ({report['us_per_query']} мкс), "
+             f"стоимость ошибок {report['cost_per_query_s']} с/запрос"]
+    lines.append("  ожидание \\ выбор " + " ".join(f"{mode:>9}" for mode in modes)
+                 + "   precision  recall")
+    for expected in modes:
+        stats = report["per_mode"].get(expected, {"precision": 0.0, "recall": 0.0})
+        lines.append(f"  {expected:<16} " + " ".join(f"{report['confusion'][expected][mode]:>9}" for mode in modes)
+                     + f"   {stats['precision']:>9.2f}  {stats['recall']:>6.2f}")
+    for misroute in sorted(report["misroutes"], key=lambda item: -item["cost_s"]):
+        lines.append(f"  {misroute['expected']:>8} -> {misroute['routed']:<8} +{misroute['cost_s']:>5} с  {misroute['query']}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Точность, скорость и стоимость ошибок маршрутизатора запросов")
+    parser.add_argument("--router", action="append",
+                        help="agent или package.module:function (можно несколько); по умолчанию agent")
+    parser.add_argument("--dataset", default=DATASET_PATH, help="размеченный набор JSONL (query, mode, lang)")
+    parser.add_argument("--weights", help="длительности режимов JSON, например {\"deep\": 90}")
+    parser.add_argument("--repeat", type=int, default=100, help="прогонов набора для замера скорости")
+    parser.add_argument("--output", help="записать отчёты в JSON-файл")
+    args = parser.parse_args(argv)
+
+    # Маршрутизатор агента не обращается к API, но агент создаётся с ключами
+    os.environ.setdefault("OPENAI_API_KEY", "routing-bench")
+    os.environ.setdefault("TAVILY_API_KEY", "routing-bench")
+
+    dataset = load_dataset(args.dataset)
+    weights = latency_weights(json.loads(args.weights) if args.weights else None)
+    reports = {}
+    for spec in args.router or ["agent"]:
+        reports[spec] = evaluate(load_router(spec), dataset, weights, args.repeat)
+        print(format_report(spec, reports[spec]))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"weights": weights, "routers": reports}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+__all__ = [
+    'DATASET_PATH',
+    'DEFAULT_LATENCY_WEIGHTS',
+    'load_dataset',
+    'latency_weights',
+    'load_router',
+    'misroute_cost',
+    'evaluate',
+    'main'
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
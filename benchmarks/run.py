@@ -0,0 +1,282 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, "benchmarks", "baseline.json")
+
+# Режимы бенчмарка: эндпоинты /search/<mode>
+BENCH_MODES = ("fast", "deep", "social", "academic", "finance", "auto")
+
+# Запросы по режимам (для auto - смесь, которую маршрутизатор разводит по режимам)
+BENCH_QUERIES: Dict[str, List[str]] = {
+    "fast": ["Что такое квантовый компьютер?", "Столица Австралии", "Кто написал Войну и мир?"],
+    "deep": ["Сравни подходы к обучению с подкреплением и объясни их ограничения",
+             "Проанализируй причины энергетического кризиса в Европе"],
+    "social": ["Что обсуждают на reddit про новые видеокарты?", "Мнение пользователей о Telegram каналах"],
+    "academic": ["Последние исследования по трансформерам на arxiv", "Обзор методов NLP для русского языка"],
+    "finance": ["Курс доллара к рублю сегодня", "Дивиденды акций Сбербанка"],
+    "auto": ["Что такое блокчейн?", "Проанализируй рынок электромобилей",
+             "Отзывы пользователей о новом iPhone", "Цена биткоина", "Научные статьи о CRISPR"],
+}
+
+# Окружение бенчмарка: локальные лимиты ключей, допуск и журналы не должны влиять на замер
+BENCH_ENV = {
+    "OPENAI_API_KEY": "bench-key",
+    "TAVILY_API_KEY": "bench-key",
+    "MODEL_TYPE": "openai",
+    "LLM_FALLBACK_PROVIDERS": "",
+    "OPENAI_RATE_LIMIT": "100000",
+    "OPENAI_RATE_BURST": "100000",
+    "TAVILY_RATE_LIMIT": "100000",
+    "TAVILY_RATE_BURST": "100000",
+    "TRACE_EXPORTER": "none",
+    "SLOW_REQUEST_LOG": "off",
+    "QUERY_LOG": "off",
+    "WARMUP": "off",
+    # Ограничения допуска сняты: замеряется конвейер, а не отказы 429/503 (--admission - боевые)
+    "ADMISSION_MAX_CONCURRENT": "10000",
+    "ADMISSION_CONFIG": json.dumps({mode: {"concurrency": 10000, "queue": 10000, "queue_timeout": 3600}
+                                    for mode in ("fast", "deep", "social", "academic", "finance")}),
+    # Кэши ответов Tavily и готовых ответов скрыли бы работу конвейера
+    "CACHE_DISK_PATH": "off",
+    "TAVILY_CACHE_TTL": "0",
+    "TAVILY_PAGE_CACHE_TTL": "0",
+}
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Перцентиль по ближайшему рангу"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(max(int(round(p / 100.0 * len(ordered) + 0.5)) - 1, 0), len(ordered) - 1)
+    return ordered[index]
+
+
+def rss_mb() -> Optional[float]:
+    """Текущий RSS процесса, МБ (Linux)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def peak_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def install_standins(chat_scenario, tavily_scenario, http: bool = False):
+    """
+    Подменить апстримы приложения детерминированными заменителями
+
+    Настоящие маршруты app.py, пайплайн, допуск, графы WebAgent и шлюз Tavily
+    остаются как есть; заменяются только клиенты моделей и Tavily. С http=True
+    клиенты не подменяются: приложение ходит по HTTP в StandInServer (адрес
+    уже задан в TAVILY_BASE_URL и OPENAI_BASE_URL) или в кассету (CASSETTE_MODE=replay).
+
+    Returns:
+        Flask-приложение
+    """
+    from benchmarks.standins import StandInChatModel, StandInTavilyClient
+    from backend.agent import WebAgent
+    from backend.tavily_gateway import get_tavily_gateway
+    import app as app_module
+
+    if http:
+        return app_module.app
+    WebAgent._create_model = lambda self, provider, model_name, max_tokens, api_key=None: StandInChatModel(chat_scenario)
+    get_tavily_gateway()._client = StandInTavilyClient(tavily_scenario)
+    return app_module.app
+
+
+def run_level(app, mode: str, concurrency: int, requests: int) -> Dict[str, Any]:
+    """Выполнить requests запросов режима с заданной параллельностью и собрать статистику"""
+    queries = BENCH_QUERIES[mode]
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    def one(index: int):
+        client = app.test_client()
+        start = time.monotonic()
+        response = client.post(f"/search/{mode}", json={"query": queries[index % len(queries)]})
+        return time.monotonic() - start, response.status_code
+
+    cpu_start = time.process_time()
+    wall_start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency, status in executor.map(one, range(requests)):
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(latency)
+    wall = time.monotonic() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    ok = len(latencies)
+    # Отказы допуска считаются отдельно от ошибок; задержки и CPU - по допущенным запросам
+    rejected = statuses.get(429, 0) + statuses.get(503, 0)
+    served = requests - rejected
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": requests,
+        "rejected": rejected,
+        "errors": served - ok,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "throughput_rps": round(ok / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "cpu_seconds": round(cpu, 3),
+        "cpu_ms_per_request": round(cpu / served * 1000, 2) if served else 0.0,
+        "rss_mb": rss_mb(),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def run_benchmark(modes: List[str], concurrency_levels: List[int], requests: int,
+                  chat_scenario, tavily_scenario, http: bool = False) -> Dict[str, Any]:
+    """Прогнать все режимы на всех уровнях параллельности; первый запрос режима - прогревочный"""
+    app = install_standins(chat_scenario, tavily_scenario, http)
+    results = []
+    for mode in modes:
+        run_level(app, mode, 1, 1)
+        for concurrency in concurrency_levels:
+            result = run_level(app, mode, concurrency, requests)
+            print(format_row(result), flush=True)
+            results.append(result)
+    return {"results": results}
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """
+    Сравнить отчёт с базовым
+
+    Регрессия - рост p95 или CPU на запрос больше чем на tolerance,
+    падение пропускной способности больше чем на tolerance, новые ошибки или
+    новые отказы допуска.
+
+    Returns:
+        Список регрессий {"mode", "concurrency", "metric", "baseline", "current"}
+    """
+    base_rows = {(row["mode"], row["concurrency"]): row for row in baseline.get("results", [])}
+    regressions = []
+    for row in report["results"]:
+        base = base_rows.get((row["mode"], row["concurrency"]))
+        if base is None:
+            continue
+        checks = [
+            ("p95_ms", row["p95_ms"] > base["p95_ms"] * (1 + tolerance)),
+            ("cpu_ms_per_request", row["cpu_ms_per_request"] > base["cpu_ms_per_request"] * (1 + tolerance)),
+            ("throughput_rps", row["throughput_rps"] < base["throughput_rps"] * (1 - tolerance)),
+            ("errors", row["errors"] > base["errors"]),
+            ("rejected", row.get("rejected", 0) > base.get("rejected", 0)),
+        ]
+        for metric, regressed in checks:
+            if regressed:
+                regressions.append({"mode": row["mode"], "concurrency": row["concurrency"], "metric": metric,
+                                    "baseline": base.get(metric, 0), "current": row.get(metric, 0)})
+    return regressions
+
+
+def format_row(row: Dict[str, Any]) -> str:
+    return (f"{row['mode']:<9} c={row['concurrency']:<3} rps={row['throughput_rps']:<8} "
+            f"p50={row['p50_ms']:<8} p95={row['p95_ms']:<8} p99={row['p99_ms']:<8} "
+            f"cpu/req={row['cpu_ms_per_request']:<7}ms rss={row['rss_mb']}MB errors={row['errors']} "
+            f"rejected={row['rejected']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк эндпоинтов поиска с заменителями LLM и Tavily")
+    parser.add_argument("--modes", default=",".join(BENCH_MODES), help="режимы через запятую")
+    parser.add_argument("--concurrency", default="1,4,16", help="уровни параллельности через запятую")
+    parser.add_argument("--requests", type=int, default=20, help="запросов на режим и уровень")
+    parser.add_argument("--llm-latency", default="lognormal:0.05,0.3", help="распределение задержки LLM")
+    parser.add_argument("--tavily-latency", default="lognormal:0.03,0.3", help="распределение задержки Tavily")
+    parser.add_argument("--tool-rounds", type=int, default=1, help="раундов вызова инструментов на запрос")
+    parser.add_argument("--answer-tokens", type=int, default=200, help="токенов в ответе модели")
+    parser.add_argument("--content-bytes", type=int, default=800, help="байт content в результате поиска")
+    parser.add_argument("--raw-content-bytes", type=int, default=8000, help="байт raw_content в результате")
+    parser.add_argument("--top-score", type=float, default=0.9, help="score лучшего результата поиска")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--http", action="store_true",
+                        help="ходить в заменители по HTTP (StandInServer) вместо подмены клиентов в процессе")
+    parser.add_argument("--cassette", help="воспроизводить записанный трафик апстримов из кассеты")
+    parser.add_argument("--replay-latency", type=float, default=0.0,
+                        help="множитель исходных задержек при воспроизведении кассеты (0 - без задержек)")
+    parser.add_argument("--admission", action="store_true",
+                        help="оставить ограничения допуска сервиса (по умолчанию сняты, отказы - в rejected)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="файл базового отчёта")
+    parser.add_argument("--save-baseline", action="store_true", help="сохранить отчёт как базовый")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое ухудшение (доля)")
+    parser.add_argument("--output", help="записать отчёт в JSON-файл")
+    args = parser.parse_args(argv)
+
+    for key, value in BENCH_ENV.items():
+        if args.admission and key.startswith("ADMISSION_"):
+            continue
+        os.environ.setdefault(key, value)
+
+    from benchmarks.standins import ChatScenario, TavilyScenario
+
+    chat = ChatScenario(args.llm_latency, tool_rounds=args.tool_rounds, answer_tokens=args.answer_tokens, seed=args.seed)
+    tavily = TavilyScenario(args.tavily_latency, content_bytes=args.content_bytes,
+                            raw_content_bytes=args.raw_content_bytes, top_score=args.top_score, seed=args.seed)
+    modes = [mode for mode in args.modes.split(",") if mode]
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+
+    if args.cassette:
+        os.environ.update({"CASSETTE_MODE": "replay", "CASSETTE_FILE": args.cassette,
+                           "CASSETTE_REPLAY_LATENCY": str(args.replay_latency)})
+    server = None
+    if args.http and not args.cassette:
+        from benchmarks.standin_server import StandInServer
+        server = StandInServer(tavily=tavily, chat=chat).start()
+        os.environ.update(server.env())
+    try:
+        report = run_benchmark(modes, levels, args.requests, chat, tavily, http=args.http or bool(args.cassette))
+    finally:
+        if server is not None:
+            server.stop()
+    report["config"] = {key: value for key, value in vars(args).items()
+                        if key not in ("baseline", "save_baseline", "output")}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Базовый отчёт сохранён: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Базовый отчёт {args.baseline} не найден, сравнение пропущено (--save-baseline)")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        regressions = compare(report, json.load(f), args.tolerance)
+    for regression in regressions:
+        print(f"РЕГРЕССИЯ {regression['mode']} c={regression['concurrency']} {regression['metric']}: "
+              f"{regression['baseline']} -> {regression['current']}")
+    if not regressions:
+        print("Регрессий относительно базового отчёта нет")
+    return 1 if regressions else 0
+
+
+__all__ = ['BENCH_MODES', 'BENCH_QUERIES', 'percentile', 'install_standins', 'run_level',
+           'run_benchmark', 'compare', 'main']
+
+
+if __name__ == "__main__":
+    sys.exit(main())
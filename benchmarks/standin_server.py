@@ -0,0 +1,281 @@
+# Локальный HTTP-заменитель апстримов: эндпоинты Tavily (/search, /extract, /crawl)
+# и OpenAI-совместимый /v1/chat/completions со сценарием вызовов инструментов.
+# Приложение направляется на него через TAVILY_BASE_URL и OPENAI_BASE_URL.
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from benchmarks.standins import TavilyScenario, ChatScenario
+
+TAVILY_PATHS = ("/search", "/extract", "/crawl")
+
+
+class Faults:
+    """
+    Инъекция сбоев апстрима
+
+    Args:
+        error_rate: Доля запросов, завершающихся ошибкой error_status
+        error_status: HTTP-статус инъецированной ошибки
+        rate_limit: Лимит запросов в секунду (0 - без лимита); сверх лимита - 429 с Retry-After
+        seed: Инициализация генератора для воспроизводимой последовательности ошибок
+    """
+
+    def __init__(self, error_rate: float = 0.0, error_status: int = 503, rate_limit: float = 0.0, seed: int = 0):
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = 0
+        self._window_count = 0
+
+    def check(self) -> Optional[int]:
+        """Статус инъецированного сбоя для очередного запроса или None"""
+        with self._lock:
+            if self.rate_limit > 0:
+                window = int(time.monotonic())
+                if window != self._window:
+                    self._window, self._window_count = window, 0
+                self._window_count += 1
+                if self._window_count > self.rate_limit:
+                    return 429
+            if self.error_rate > 0 and self._rng.random() < self.error_rate:
+                return self.error_status
+        return None
+
+
+def _to_messages(payload: List[Dict[str, Any]]) -> List[Any]:
+    """Сообщения OpenAI chat completions -> сообщения LangChain для ChatScenario"""
+    messages = []
+    for message in payload:
+        role, content = message.get("role"), message.get("content") or ""
+        if role == "user":
+            messages.append(HumanMessage(content=content))
+        elif role == "tool":
+            messages.append(ToolMessage(content=content, tool_call_id=message.get("tool_call_id", "")))
+        elif role in ("system", "developer"):
+            messages.append(SystemMessage(content=content))
+        else:
+            messages.append(AIMessage(content=content))
+    return messages
+
+
+def chat_completion(scenario: ChatScenario, request: Dict[str, Any]) -> Dict[str, Any]:
+    """Ответ в формате OpenAI chat completions по сценарию"""
+    tools = [tool.get("function", {}).get("name") for tool in request.get("tools") or []]
+    reply = scenario.reply(_to_messages(request.get("messages", [])), tools or None)
+    message: Dict[str, Any] = {"role": "assistant", "content": reply.content or None}
+    if reply.tool_calls:
+        message["tool_calls"] = [{
+            "id": call["id"],
+            "type": "function",
+            "function": {"name": call["name"], "arguments": json.dumps(call["args"], ensure_ascii=False)}
+        } for call in reply.tool_calls]
+    usage = reply.usage_metadata or {}
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "stand-in"),
+        "choices": [{
+            "index": 0,
+            "message": message,
+            "finish_reason": "tool_calls" if reply.tool_calls else "stop"
+        }],
+        "usage": {
+            "prompt_tokens": usage.get("input_tokens", 0),
+            "completion_tokens": usage.get("output_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0)
+        }
+    }
+
+
+def _error_payload(upstream: str, status: int) -> Dict[str, Any]:
+    message = "rate limit exceeded" if status == 429 else f"injected error {status}"
+    if upstream == "tavily":
+        return {"detail": {"error": message}}
+    return {"error": {"message": message, "type": "rate_limit_error" if status == 429 else "server_error",
+                      "code": status}}
+
+
+class StandInServer:
+    """
+    Локальный сервер-заменитель Tavily и OpenAI-совместимого API
+
+    Args:
+        tavily: Сценарий Tavily (задержка, размер результатов)
+        chat: Сценарий модели (задержка, вызовы инструментов, размер ответа)
+        tavily_faults: Сбои эндпоинтов Tavily
+        chat_faults: Сбои chat completions
+        host: Адрес
+        port: Порт (0 - свободный)
+    """
+
+    def __init__(self, tavily: Optional[TavilyScenario] = None, chat: Optional[ChatScenario] = None,
+                 tavily_faults: Optional[Faults] = None, chat_faults: Optional[Faults] = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.tavily = tavily or TavilyScenario()
+        self.chat = chat or ChatScenario()
+        self.faults = {"tavily": tavily_faults or Faults(), "openai": chat_faults or Faults()}
+        self.stats: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        """Переменные окружения, направляющие приложение на заменитель"""
+        return {"TAVILY_BASE_URL": self.url, "OPENAI_BASE_URL": f"{self.url}/v1"}
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def handle(self, path: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        """Обработать запрос к апстриму: (статус, тело, заголовки)"""
+        if path in TAVILY_PATHS:
+            upstream = "tavily"
+        elif path.endswith("/chat/completions"):
+            upstream = "openai"
+        else:
+            return 404, {"error": {"message": f"unknown path {path}"}}, {}
+
+        status = self.faults[upstream].check()
+        if status is not None:
+            self._count(f"{upstream}_{status}")
+            headers = {"Retry-After": "1"} if status == 429 else {}
+            return status, _error_payload(upstream, status), headers
+
+        self._count(f"{upstream}{path}" if upstream == "tavily" else "openai/chat")
+        if path == "/search":
+            return 200, self.tavily.search(**body), {}
+        if path == "/extract":
+            return 200, self.tavily.extract(**body), {}
+        if path == "/crawl":
+            return 200, self.tavily.crawl(**body), {}
+        return 200, chat_completion(self.chat, body), {}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/_stats"):
+                    with server._stats_lock:
+                        self._send(200, dict(server.stats))
+                    return
+                # Прогрев пула соединений (warm_pool) и проверки доступности
+                self._send(200, {"status": "ok"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                    status, payload, headers = server.handle(self.path.split("?")[0], body)
+                except (ValueError, TypeError) as e:
+                    status, payload, headers = 400, {"detail": {"error": str(e)}}, {}
+                self._send(status, payload, headers)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StandInServer":
+        """Запустить сервер в фоновом потоке"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Локальный заменитель Tavily и OpenAI-совместимого API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--llm-latency", default="lognormal:0.5,0.4", help="распределение задержки LLM")
+    parser.add_argument("--tavily-latency", default="lognormal:0.3,0.4", help="распределение задержки Tavily")
+    parser.add_argument("--tool-rounds", type=int, default=1, help="раундов вызова tavily_search на запрос")
+    parser.add_argument("--script", help="JSON-файл сценария вызовов: [{\"name\": ..., \"args\": {...}}, ...]")
+    parser.add_argument("--answer-tokens", type=int, default=200, help="токенов в ответе модели")
+    parser.add_argument("--content-bytes", type=int, default=800, help="байт content в результате поиска")
+    parser.add_argument("--raw-content-bytes", type=int, default=8000, help="байт raw_content в результате")
+    parser.add_argument("--top-score", type=float, default=0.9, help="score лучшего результата поиска")
+    parser.add_argument("--tavily-error-rate", type=float, default=0.0, help="доля ошибок Tavily")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="доля ошибок LLM")
+    parser.add_argument("--error-status", type=int, default=503, help="статус инъецированных ошибок")
+    parser.add_argument("--tavily-rate-limit", type=float, default=0.0, help="лимит запросов Tavily в секунду")
+    parser.add_argument("--llm-rate-limit", type=float, default=0.0, help="лимит запросов LLM в секунду")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    script = None
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            script = json.load(f)
+
+    server = StandInServer(
+        tavily=TavilyScenario(args.tavily_latency, content_bytes=args.content_bytes,
+                              raw_content_bytes=args.raw_content_bytes, top_score=args.top_score, seed=args.seed),
+        chat=ChatScenario(args.llm_latency, tool_rounds=args.tool_rounds, answer_tokens=args.answer_tokens,
+                          seed=args.seed, script=script),
+        tavily_faults=Faults(args.tavily_error_rate, args.error_status, args.tavily_rate_limit, args.seed),
+        chat_faults=Faults(args.llm_error_rate, args.error_status, args.llm_rate_limit, args.seed),
+        host=args.host,
+        port=args.port
+    )
+    print(f"Заменитель апстримов слушает {server.url}; для приложения:")
+    for key, value in server.env().items():
+        print(f"  export {key}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+__all__ = ['Faults', 'chat_completion', 'StandInServer', 'main']
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# Детерминированные заменители LLM и Tavily для бенчмарков: задержка задаётся
+# распределением (fixed, uniform, lognormal), размер ответов - числом байт контента.
+# Генераторы случайных чисел инициализируются seed, поэтому сценарий воспроизводим.
+import math
+import time
+import random
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+
+class Latency:
+    """
+    Распределение задержки по спецификации:
+    - "0.05" или "fixed:0.05" - постоянная задержка
+    - "uniform:0.02,0.2" - равномерно между границами
+    - "lognormal:0.1,0.5" - логнормальное с медианой 0.1 и sigma 0.5
+    """
+
+    def __init__(self, spec: str = "0", seed: int = 0):
+        self.spec = spec
+        kind, _, args = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+        self.kind = kind
+        self.args = [float(value) for value in args.split(",") if value]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Неизвестное распределение задержки: {spec}")
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "uniform":
+                return self._rng.uniform(self.args[0], self.args[1])
+            if self.kind == "lognormal":
+                return self._rng.lognormvariate(math.log(self.args[0]), self.args[1])
+        return self.args[0] if self.args else 0.0
+
+    def wait(self):
+        delay = self.sample()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def filler_text(seed: str, size: int) -> str:
+    """Детерминированный текст заданного размера (байт ASCII)"""
+    if size <= 0:
+        return ""
+    block = hashlib.sha256(seed.encode("utf-8")).hexdigest()
+    words = " ".join(block[i:i + 8] for i in range(0, len(block), 8)) + " "
+    return (words * (size // len(words) + 1))[:size]
+
+
+class TavilyScenario:
+    """
+    Поведение заменителя Tavily: задержка, число и размер результатов
+
+    Результаты содержат слова запроса и убывающий score, начиная с top_score;
+    при низком top_score агент продолжает поиск, а политика источников
+    эскалирует уровень поиска.
+    """
+
+    def __init__(self, latency: str = "0.05", content_bytes: int = 800, raw_content_bytes: int = 8000,
+                 top_score: float = 0.9, crawl_pages: int = 5, seed: int = 0):
+        self.latency = Latency(latency, seed)
+        self.content_bytes = content_bytes
+        self.raw_content_bytes = raw_content_bytes
+        self.top_score = top_score
+        self.crawl_pages = crawl_pages
+
+    def _result(self, query: str, index: int, include_raw: bool) -> Dict[str, Any]:
+        url = f"https://site{index}.example/{hashlib.md5(query.encode('utf-8')).hexdigest()[:8]}/{index}"
+        result = {
+            "title": f"{query} — источник {index + 1}",
+            "url": url,
+            "content": f"{query}. " + filler_text(url, self.content_bytes),
+            "score": round(max(self.top_score - 0.1 * index, 0.05), 3),
+        }
+        if include_raw:
+            result["raw_content"] = filler_text(url + "#raw", self.raw_content_bytes)
+        return result
+
+    def search(self, query: str, max_results: int = 5, include_raw_content: Any = False, **params) -> Dict[str, Any]:
+        self.latency.wait()
+        return {
+            "query": query,
+            "results": [self._result(query, i, bool(include_raw_content)) for i in range(int(max_results or 5))],
+            "response_time": 0.0
+        }
+
+    def extract(self, urls, **params) -> Dict[str, Any]:
+        self.latency.wait()
+        urls = [urls] if isinstance(urls, str) else list(urls)
+        return {
+            "results": [{"url": url, "raw_content": filler_text(url, self.raw_content_bytes)} for url in urls],
+            "failed_results": []
+        }
+
+    def crawl(self, url: str, **params) -> Dict[str, Any]:
+        self.latency.wait()
+        return {
+            "base_url": url,
+            "results": [{"url": f"{url.rstrip('/')}/page{i}", "raw_content": filler_text(f"{url}{i}", self.raw_content_bytes)}
+                        for i in range(self.crawl_pages)]
+        }
+
+
+class StandInTavilyClient:
+    """Клиент Tavily с интерфейсом TavilyClient поверх сценария (для TavilyGateway(client=...))"""
+
+    def __init__(self, scenario: TavilyScenario):
+        self.scenario = scenario
+
+    def search(self, query: str, timeout: int = 60, **params) -> Dict[str, Any]:
+        return self.scenario.search(query, **params)
+
+    def extract(self, urls, timeout: int = 60, **params) -> Dict[str, Any]:
+        return self.scenario.extract(urls, **params)
+
+    def crawl(self, url: str, timeout: int = 60, **params) -> Dict[str, Any]:
+        return self.scenario.crawl(url, **params)
+
+
+def _message_text(message: Any) -> str:
+    content = getattr(message, "content", message)
+    if isinstance(content, list):
+        return " ".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in content)
+    return str(content)
+
+
+class ChatScenario:
+    """
+    Поведение заменителя LLM: задержка, число раундов вызова инструментов
+    и размер финального ответа
+
+    Модель с привязанными инструментами выполняет сценарий вызовов: в раунде i
+    (i ответов инструментов в истории) вызывает script[i], затем отвечает
+    текстом из answer_tokens слов. По умолчанию сценарий - tool_rounds вызовов
+    tavily_search с текстом запроса; "{query}" в аргументах заменяется запросом.
+    """
+
+    def __init__(self, latency: str = "0.2", tool_rounds: int = 1, answer_tokens: int = 200, seed: int = 0,
+                 script: Optional[List[Dict[str, Any]]] = None):
+        self.latency = Latency(latency, seed)
+        self.answer_tokens = answer_tokens
+        self.script = script if script is not None else [
+            {"name": "tavily_search", "args": {"query": "{query}"}} for _ in range(tool_rounds)
+        ]
+        self.tool_rounds = len(self.script)
+
+    def reply(self, messages: List[Any], tools: Optional[List[str]]) -> AIMessage:
+        self.latency.wait()
+        query = next((_message_text(m) for m in messages if isinstance(m, HumanMessage)), "")
+        tool_results = sum(1 for m in messages if isinstance(m, ToolMessage) or getattr(m, "type", "") == "tool")
+        input_tokens = sum(len(_message_text(m)) for m in messages) // 4
+        step = self.script[tool_results] if tool_results < len(self.script) else None
+        if tools and step and step["name"] in tools:
+            args = {key: value.replace("{query}", query) if isinstance(value, str) else value
+                    for key, value in step.get("args", {}).items()}
+            return AIMessage(content="", tool_calls=[{
+                "name": step["name"],
+                "args": args,
+                "id": f"call_{tool_results + 1}"
+            }], usage_metadata={"input_tokens": input_tokens, "output_tokens": 20,
+                                "total_tokens": input_tokens + 20})
+        answer = filler_text(query, self.answer_tokens * 5)
+        return AIMessage(content=answer, usage_metadata={
+            "input_tokens": input_tokens, "output_tokens": self.answer_tokens,
+            "total_tokens": input_tokens + self.answer_tokens
+        })
+
+
+class StandInChatModel:
+    """Чат-модель с интерфейсом, который агент использует у ChatOpenAI: bind_tools и invoke"""
+
+    def __init__(self, scenario: ChatScenario, tools: Optional[List[str]] = None):
+        self.scenario = scenario
+        self.tools = tools
+
+    def bind_tools(self, tools, **kwargs) -> "StandInChatModel":
+        return StandInChatModel(self.scenario, [getattr(t, "name", str(t)) for t in tools])
+
+    def invoke(self, messages, config=None, **kwargs) -> AIMessage:
+        return self.scenario.reply(list(messages), self.tools)
+
+
+__all__ = [
+    'Latency',
+    'filler_text',
+    'TavilyScenario',
+    'StandInTavilyClient',
+    'ChatScenario',
+    'StandInChatModel'
+]
@@ -0,0 +1,63 @@
+"""
+Конфигурация gunicorn для продакшен-запуска
+
+Приложение загружается в мастер-процессе (preload_app), воркеры создаются
+через fork и делят его память копированием страниц при записи. Каждый воркер
+прогревает соединения с апстримами до приёма трафика. Параметры задаются
+переменными окружения.
+"""
+import os
+import multiprocessing
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Запросы ждут LLM и Tavily, поэтому в воркере работает пул потоков;
+# процессы дают использование нескольких ядер
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+
+# Глубокий анализ с суммированием может идти несколько минут
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Перезапуск воркера после N запросов держит потребление памяти предсказуемым
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# Квоты API-ключей делятся между воркерами (backend.ratelimit.worker_count)
+os.environ.setdefault("WEB_CONCURRENCY", str(workers))
+
+# Фоновые задания должны быть видны из любого воркера
+if workers > 1:
+    os.environ.setdefault("JOB_STORE", "sqlite")
+
+# /metrics любого воркера отдаёт сумму по всем воркерам: снимки процессов
+# собираются в общем каталоге, который очищается при старте сервера
+if workers > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(
+        "/dev/shm" if os.path.isdir("/dev/shm") else "/tmp", "deep_search_metrics")
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    import glob
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+    for snapshot in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "metrics_*.json*")):
+        os.remove(snapshot)
+
+preload_app = True
+worker_tmp_dir = os.getenv("GUNICORN_WORKER_TMP_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else None)
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+
+def post_worker_init(worker):
+    """
+    Прогрев воркера: в режиме sync соединения прогреваются до приёма трафика,
+    в режиме background весь прогрев идёт в фоне, пока воркер уже принимает запросы
+    """
+    from backend.warmup import warmup_mode, warm_connections, start_background_warmup
+    connections = os.getenv("WARMUP_CONNECTIONS", "1").lower() not in ("0", "false", "no")
+    if warmup_mode() == "background":
+        start_background_warmup(connections=connections)
+    elif warmup_mode() == "sync" and connections:
+        warm_connections()
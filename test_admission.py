@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import threading
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+os.environ["OPENAI_API_KEY"] = "test-key"
+# Журнал запросов и трассы не пишутся в каталог репозитория
+os.environ["QUERY_LOG"] = "off"
+os.environ["TRACE_EXPORTER"] = "none"
+
+from backend.admission import AdmissionController, AdmissionRejected
+from backend.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_WAIT_SECONDS, ADMISSION_REJECTIONS, REGISTRY
+
+BULKHEADS = {
+    "fast": {"concurrency": 2, "queue": 2, "queue_timeout": 1.0, "priority": 0},
+    "deep": {"concurrency": 1, "queue": 1, "queue_timeout": 0.1, "priority": 3},
+}
+
+
+def test_queue_full_and_timeout():
+    """Переполненная очередь даёт 429, истёкший срок ожидания - 503"""
+    controller = AdmissionController(BULKHEADS, max_concurrent=4)
+    controller.acquire("deep")
+
+    results = []
+
+    def waiter():
+        try:
+            controller.acquire("deep")
+            results.append("admitted")
+        except AdmissionRejected as e:
+            results.append(e.status)
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    time.sleep(0.02)
+    try:
+        controller.acquire("deep")
+        assert False, "ожидался отказ"
+    except AdmissionRejected as e:
+        assert e.status == 429
+        assert e.retry_after >= 1
+    thread.join()
+    assert results == [503]
+    stats = controller.stats()["modes"]["deep"]
+    assert stats["rejected_queue_full"] == 1 and stats["rejected_timeout"] == 1
+
+
+def test_fast_overtakes_queued_deep():
+    """При освобождении общего слота первым стартует быстрый запрос"""
+    bulkheads = dict(BULKHEADS, deep=dict(BULKHEADS["deep"], queue_timeout=2.0, concurrency=2))
+    controller = AdmissionController(bulkheads, max_concurrent=1)
+    controller.acquire("deep")
+
+    order = []
+
+    def run(mode):
+        controller.acquire(mode)
+        order.append(mode)
+        controller.release(mode)
+
+    deep_thread = threading.Thread(target=run, args=("deep",))
+    deep_thread.start()
+    time.sleep(0.05)
+    fast_thread = threading.Thread(target=run, args=("fast",))
+    fast_thread.start()
+    time.sleep(0.05)
+    assert controller.queue_depth() == 2
+
+    controller.release("deep", duration=0.1)
+    deep_thread.join()
+    fast_thread.join()
+    assert order == ["fast", "deep"]
+
+
+def test_bulkheads_isolate_modes():
+    """Занятые глубокие слоты не мешают быстрым запросам"""
+    controller = AdmissionController(BULKHEADS, max_concurrent=4)
+    controller.acquire("deep")
+    with controller.admit("fast"):
+        assert controller.in_flight("fast") == 1
+    assert controller.in_flight("fast") == 0
+
+
+def test_pool_metrics():
+    """Пулы экспортируют выполняемые запросы, очередь, время ожидания и отказы в /metrics"""
+    bulkheads = {"deep": dict(BULKHEADS["deep"], queue_timeout=1.0), "fast": BULKHEADS["fast"]}
+    controller = AdmissionController(bulkheads, max_concurrent=4, export_metrics=True)
+    waits = ADMISSION_WAIT_SECONDS.count(mode="deep")
+    rejected = ADMISSION_REJECTIONS.value(mode="deep", reason="queue_full")
+
+    controller.acquire("deep")
+    waiter = threading.Thread(target=controller.acquire, args=("deep",))
+    waiter.start()
+    time.sleep(0.05)
+    assert ADMISSION_IN_FLIGHT.value(mode="deep") == 1
+    assert ADMISSION_QUEUED.value(mode="deep") == 1
+    try:
+        controller.acquire("deep")
+    except AdmissionRejected:
+        pass
+    assert ADMISSION_REJECTIONS.value(mode="deep", reason="queue_full") == rejected + 1
+
+    controller.release("deep")
+    waiter.join()
+    assert ADMISSION_QUEUED.value(mode="deep") == 0
+    assert ADMISSION_WAIT_SECONDS.count(mode="deep") == waits + 2
+    controller.release("deep")
+    assert ADMISSION_IN_FLIGHT.value(mode="deep") == 0
+
+    text = REGISTRY.render()
+    assert "# TYPE admission_queue_depth gauge" in text
+    assert 'admission_rejections_total{mode="deep",reason="queue_full"}' in text
+
+
+def test_http_rejection_headers():
+    """Эндпоинт отвечает 429 с заголовком Retry-After при перегрузке"""
+    import app as app_module
+
+    original = app_module.admission_controller.bulkheads["deep"]
+    app_module.admission_controller.bulkheads["deep"] = {"concurrency": 0, "queue": 0,
+                                                         "queue_timeout": 0.1, "priority": 3}
+    try:
+        response = app_module.app.test_client().post('/search/deep', json={"query": "тест"})
+    finally:
+        app_module.admission_controller.bulkheads["deep"] = original
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+if __name__ == "__main__":
+    test_queue_full_and_timeout()
+    test_fast_overtakes_queued_deep()
+    test_bulkheads_isolate_modes()
+    test_pool_metrics()
+    test_http_rejection_headers()
+    print("✅ Все тесты контроля допуска пройдены")
@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import time
+import threading
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+# Каждый вызов шлюза уходит в клиент теста: без кэша свежих ответов и общего кэша на диске
+os.environ["TAVILY_CACHE_TTL"] = "0"
+os.environ["CACHE_DISK_PATH"] = "off"
+os.environ["OPENAI_API_KEY"] = "test-key"
+# Журнал запросов и трассы не пишутся в каталог репозитория
+os.environ["QUERY_LOG"] = "off"
+os.environ["TRACE_EXPORTER"] = "none"
+
+import backend.batch as batch
+import backend.tavily_gateway as tavily_gateway
+from backend.batch import parse_batch, run_batch
+from backend.tavily_gateway import TavilyGateway
+
+
+class SlowTavilyClient:
+    """Клиент Tavily с задержкой ответа, считающий вызовы"""
+
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def search(self, query, **params):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.05)
+        return {"query": query, "results": [{"title": query, "url": "https://a.example", "score": 0.9}]}
+
+
+def search_runner(query, mode, agent=None, routed_mode=None):
+    """Выполнение элемента: один поиск Tavily, deep дольше остальных"""
+    results = tavily_gateway.get_tavily_gateway().search(query, max_results=3)
+    if mode == "deep":
+        time.sleep(0.2)
+    return {"response": results["query"], "mode_selected": routed_mode or mode}
+
+
+def test_parse_batch():
+    """Строки и объекты принимаются, режимы и размер пакета проверяются"""
+    parsed = parse_batch({"queries": ["a", {"query": "b", "mode": "fast"}], "concurrency": 1000})
+    assert parsed["items"] == [{"query": "a", "mode": "auto"}, {"query": "b", "mode": "fast"}]
+    assert parsed["concurrency"] == batch.BATCH_MAX_CONCURRENCY
+    assert parse_batch({"queries": ["a"], "concurrency": None})["concurrency"] == batch.BATCH_CONCURRENCY
+
+    for payload in ({}, {"queries": []}, {"queries": [{"mode": "fast"}]},
+                    {"queries": [{"query": "a", "mode": "bogus"}]},
+                    {"queries": ["a"], "concurrency": "abc"}, {"queries": ["a"], "concurrency": 2.5},
+                    {"queries": ["a"], "concurrency": True}):
+        try:
+            parse_batch(payload)
+            assert False, f"ожидалась ошибка для {payload}"
+        except ValueError:
+            pass
+
+
+def test_shared_searches_and_streaming_order():
+    """Одинаковые поиски выполняются один раз, быстрые элементы приходят раньше"""
+    client = SlowTavilyClient()
+    original = tavily_gateway._gateway
+    tavily_gateway._gateway = TavilyGateway(client=client)
+    try:
+        items = [
+            {"query": "общий запрос", "mode": "deep"},
+            {"query": "общий запрос", "mode": "fast"},
+            {"query": "общий запрос", "mode": "fast"},
+            {"query": "Reddit мнения о ноутбуках", "mode": "auto"},
+        ]
+        lines = list(run_batch(items, concurrency=4, runner=search_runner))
+    finally:
+        tavily_gateway._gateway = original
+
+    summary = lines[-1]["summary"]
+    assert summary["succeeded"] == 4
+    assert client.calls == 2
+    assert summary["tavily_calls"] == 2 and summary["tavily_calls_shared"] == 2
+
+    # deep-элемент завершается последним
+    assert lines[-2]["index"] == 0
+    routed = next(line for line in lines[:-1] if line["index"] == 3)
+    assert routed["result"]["mode_selected"] == "social"
+
+
+def test_abandoned_batch_stops():
+    """Закрытый клиентом пакет не ждёт и не запускает оставшиеся элементы"""
+    started = []
+
+    def slow_runner(query, mode, agent=None, routed_mode=None):
+        started.append(query)
+        time.sleep(0.2)
+        return {"response": query}
+
+    lines = run_batch([{"query": str(i), "mode": "fast"} for i in range(20)], concurrency=2, runner=slow_runner)
+    next(lines)
+    begin = time.monotonic()
+    lines.close()
+    assert time.monotonic() - begin < 0.15
+    time.sleep(0.5)
+    assert len(started) <= 4
+
+
+def test_http_batch_ndjson():
+    """POST /search/batch отдаёт NDJSON со строкой на каждый элемент и итогом"""
+    import app as app_module
+
+    def failing_runner(query, mode, agent=None, routed_mode=None):
+        if query == "плохой":
+            raise ValueError("сбой")
+        return {"response": query}
+
+    original = batch.execute_search
+    batch.execute_search = failing_runner
+    try:
+        response = app_module.app.test_client().post(
+            '/search/batch', json={"queries": ["хороший", "плохой"], "mode": "fast"})
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    finally:
+        batch.execute_search = original
+
+    by_index = {line["index"]: line for line in lines if "index" in line}
+    assert by_index[0]["result"]["response"] == "хороший"
+    assert by_index[1]["error"] == "сбой"
+    assert lines[-1]["summary"]["failed"] == 1
+
+    bad = app_module.app.test_client().post('/search/batch', json={"queries": "не список"})
+    assert bad.status_code == 400
+
+
+if __name__ == "__main__":
+    test_parse_batch()
+    test_shared_searches_and_streaming_order()
+    test_abandoned_batch_stops()
+    test_http_batch_ndjson()
+    print("✅ Все тесты пакетного поиска пройдены")
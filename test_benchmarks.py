@@ -0,0 +1,78 @@
+import os
+import sys
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+os.environ["OPENAI_API_KEY"] = "test-key"
+
+from benchmarks.standins import Latency, TavilyScenario, ChatScenario, StandInChatModel
+from benchmarks.run import percentile, compare
+
+
+def test_latency_is_deterministic():
+    """Одинаковый seed даёт одинаковую последовательность задержек"""
+    first = Latency("lognormal:0.1,0.5", seed=7)
+    second = Latency("lognormal:0.1,0.5", seed=7)
+    assert [first.sample() for _ in range(5)] == [second.sample() for _ in range(5)]
+    assert Latency("0.25").sample() == 0.25
+    assert 0.02 <= Latency("uniform:0.02,0.2").sample() <= 0.2
+
+
+def test_standins():
+    """Заменитель Tavily возвращает результаты заданного размера, модель - вызов инструмента и ответ"""
+    result = TavilyScenario("0", content_bytes=100, raw_content_bytes=500).search(
+        "вопрос", max_results=3, include_raw_content=True)
+    assert len(result["results"]) == 3
+    assert len(result["results"][0]["raw_content"]) == 500
+    assert result["results"][0]["score"] > result["results"][1]["score"]
+
+    from langchain_core.messages import HumanMessage, ToolMessage
+    model = StandInChatModel(ChatScenario("0", tool_rounds=1)).bind_tools([])
+    model.tools = ["tavily_search"]
+    call = model.invoke([HumanMessage(content="вопрос")])
+    assert call.tool_calls[0]["args"]["query"] == "вопрос"
+    answer = model.invoke([HumanMessage(content="вопрос"), call,
+                           ToolMessage(content="[]", tool_call_id=call.tool_calls[0]["id"])])
+    assert answer.content and not answer.tool_calls
+
+
+def test_compare_flags_regressions():
+    """Регрессия p95 и пропускной способности сверх допуска"""
+    assert percentile([3, 1, 2, 4], 50) == 2
+    base = {"results": [{"mode": "fast", "concurrency": 4, "p95_ms": 100, "cpu_ms_per_request": 10,
+                         "throughput_rps": 20, "errors": 0}]}
+    report = {"results": [{"mode": "fast", "concurrency": 4, "p95_ms": 130, "cpu_ms_per_request": 11,
+                           "throughput_rps": 15, "errors": 0}]}
+    metrics = {r["metric"] for r in compare(report, base, 0.2)}
+    assert metrics == {"p95_ms", "throughput_rps"}
+    # Отказы допуска - отдельная регрессия, не ошибки
+    report["results"][0].update(p95_ms=100, throughput_rps=20, rejected=3)
+    assert [r["metric"] for r in compare(report, base, 0.2)] == ["rejected"]
+    assert compare(base, base, 0.2) == []
+
+
+def test_benchmark_run():
+    """Короткий прогон через настоящие эндпоинты без ошибок"""
+    from benchmarks.run import run_benchmark
+    from backend.agent import WebAgent
+    from backend.tavily_gateway import get_tavily_gateway
+    create_model, client = WebAgent._create_model, get_tavily_gateway()._client
+    try:
+        report = run_benchmark(["fast"], [2], 2, ChatScenario("0"), TavilyScenario("0"))
+    finally:
+        WebAgent._create_model = create_model
+        get_tavily_gateway()._client = client
+    row = report["results"][0]
+    assert row["errors"] == 0 and row["rejected"] == 0, row
+    assert row["throughput_rps"] > 0 and row["p95_ms"] >= row["p50_ms"]
+
+
+if __name__ == "__main__":
+    test_latency_is_deterministic()
+    test_standins()
+    test_compare_flags_regressions()
+    test_benchmark_run()
+    print("✅ Все тесты бенчмарков пройдены")
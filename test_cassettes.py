@@ -0,0 +1,114 @@
+import os
+import sys
+import subprocess
+import tempfile
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+from unittest import mock
+from langchain_core.messages import HumanMessage, SystemMessage
+# Из подмодуля: тесты маршрутизации подменяют langchain_openai.ChatOpenAI при импорте
+from langchain_openai.chat_models.base import ChatOpenAI
+
+from backend.http_pool import get_http_client, reset_http_clients
+from backend.tavily_client import PooledTavilyClient
+from backend.cassettes import Cassette, cassette_stats, request_key
+from backend import prompts
+from benchmarks.standins import TavilyScenario, ChatScenario
+from benchmarks.standin_server import StandInServer
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class cassette_env:
+    """Временный режим кассеты; HTTP-клиенты пересоздаются с новым транспортом"""
+
+    def __init__(self, mode, path):
+        self.env = {"CASSETTE_MODE": mode, "CASSETTE_FILE": path}
+
+    def __enter__(self):
+        self.saved = {key: os.environ.get(key) for key in self.env}
+        os.environ.update(self.env)
+        reset_http_clients()
+
+    def __exit__(self, *exc):
+        for key, value in self.saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        reset_http_clients()
+
+
+def calls(base_url):
+    tavily = PooledTavilyClient(api_key="test-key", base_url=base_url).search("вопрос", include_raw_content=True)
+    model = ChatOpenAI(model="stand-in", api_key="test-key", base_url=f"{base_url}/v1", max_retries=0,
+                       http_client=get_http_client("openai"))
+    # Системное сообщение с датой, как у агента
+    messages = [SystemMessage(content=prompts.dynamic_suffix()), HumanMessage(content="вопрос")]
+    return tavily, model.invoke(messages).content
+
+
+def test_record_and_replay():
+    """Записанные ответы Tavily и LLM воспроизводятся без сети; неизвестный запрос - ошибка"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "upstream.jsonl.gz")
+        with StandInServer(tavily=TavilyScenario("0", raw_content_bytes=5000), chat=ChatScenario("0.05")) as server:
+            base_url = server.url
+            with cassette_env("record", path):
+                recorded = calls(base_url)
+        assert len(Cassette(path).load()) == 2
+
+        with cassette_env("replay", path):
+            assert calls(base_url) == recorded
+            assert cassette_stats()["replayed"] == 2
+            try:
+                PooledTavilyClient(api_key="test-key", base_url=base_url).search("другой вопрос")
+                assert False, "ожидалась ошибка"
+            except httpx.TransportError as e:
+                assert "нет записи" in str(e)
+
+
+def test_replay_on_another_day():
+    """Кассета воспроизводится и после смены даты в системном промпте"""
+    body = '{"messages": [{"content": "Сегодняшняя дата: %s"}]}'
+    assert request_key("openai", "POST", "/v1/chat/completions", (body % "Monday, October 19, 2026").encode()) == \
+        request_key("openai", "POST", "/v1/chat/completions", (body % "Tuesday, October 20, 2026").encode())
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "upstream.jsonl.gz")
+        with StandInServer(tavily=TavilyScenario("0"), chat=ChatScenario("0")) as server:
+            base_url = server.url
+            with mock.patch.object(prompts, "current_date", lambda: "Monday, October 19, 2026"), \
+                    cassette_env("record", path):
+                recorded = calls(base_url)
+
+        with mock.patch.object(prompts, "current_date", lambda: "Tuesday, October 20, 2026"), \
+                cassette_env("replay", path):
+            assert calls(base_url) == recorded
+            assert cassette_stats()["misses"] == 0
+
+
+def test_replayed_outputs_are_identical():
+    """Маршруты app.py на воспроизведённой кассете дают побайтно те же ответы"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "upstream.jsonl.gz")
+        queries = os.path.join(directory, "queries.txt")
+        with open(queries, "w", encoding="utf-8") as f:
+            f.write("Что такое квантовый компьютер?\n")
+        env = {key: value for key, value in os.environ.items() if not key.startswith("CASSETTE_")}
+        command = [sys.executable, "-m", "benchmarks.cassette"]
+        subprocess.run(command + ["record", "--standin", "--modes", "fast", "--queries", queries, "--cassette", path],
+                       cwd=PROJECT_ROOT, env=env, check=True, capture_output=True)
+        result = subprocess.run(command + ["verify", "--cassette", path], cwd=PROJECT_ROOT, env=env,
+                                capture_output=True, text=True)
+        assert result.returncode == 0, result.stdout[-2000:]
+
+
+if __name__ == "__main__":
+    test_record_and_replay()
+    test_replay_on_another_day()
+    test_replayed_outputs_are_identical()
+    print("✅ Все тесты кассет пройдены")
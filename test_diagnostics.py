@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import tempfile
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+os.environ["OPENAI_API_KEY"] = "test-key"
+# Журнал запросов и трассы не пишутся в каталог репозитория
+os.environ["QUERY_LOG"] = "off"
+os.environ["TRACE_EXPORTER"] = "none"
+
+import app as app_module
+from backend import diagnostics
+from backend.diagnostics import slow_threshold, capture_slow_request
+from backend.metrics import stage
+
+
+def fake_run_search(query, mode, **kwargs):
+    with stage("agent_iteration"):
+        sum(i * i for i in range(10000))
+    return {"response": "ok", "sources": []}
+
+
+class patched_env:
+    """Временные переменные окружения и подмена run_search"""
+
+    def __init__(self, **env):
+        self.env = env
+
+    def __enter__(self):
+        self.saved = {key: os.environ.get(key) for key in self.env}
+        os.environ.update(self.env)
+        self.run_search = app_module.run_search
+        app_module.run_search = fake_run_search
+
+    def __exit__(self, *exc):
+        app_module.run_search = self.run_search
+        for key, value in self.saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def test_thresholds():
+    """Порог по режиму, переопределение через SLOW_REQUEST_THRESHOLDS"""
+    assert slow_threshold("deep") > slow_threshold("fast")
+    with patched_env(SLOW_REQUEST_THRESHOLDS=json.dumps({"fast": 0.5})):
+        assert slow_threshold("fast") == 0.5
+        assert slow_threshold("unknown") == slow_threshold("auto")
+
+
+def test_slow_request_is_captured():
+    """Запрос медленнее порога записывается с запросом, режимом и временем этапов"""
+    with tempfile.TemporaryDirectory() as directory:
+        log = os.path.join(directory, "slow.jsonl")
+        with patched_env(SLOW_REQUEST_THRESHOLDS=json.dumps({"fast": 0}), SLOW_REQUEST_LOG=log):
+            client = app_module.app.test_client()
+            client.post("/search/fast", json={"query": "медленный вопрос"})
+            assert diagnostics._get_slow_log().flush()
+        with open(log, encoding="utf-8") as f:
+            record = json.loads(f.readlines()[-1])
+        assert record["query"] == "медленный вопрос"
+        assert record["mode"] == "fast"
+        assert record["status"] == 200
+        assert "agent" in record["timings"]["stages_ms"]
+        assert record["profile"] is None
+
+        with patched_env(SLOW_REQUEST_LOG=os.path.join(directory, "fast.jsonl")):
+            assert not capture_slow_request({"mode": "fast", "elapsed": 0.01})
+        assert not os.path.exists(os.path.join(directory, "fast.jsonl"))
+
+
+def test_profile_on_admin_header():
+    """Профиль снимается только с правильным токеном администратора"""
+    with tempfile.TemporaryDirectory() as directory:
+        with patched_env(PROFILE_TOKEN="secret", PROFILE_DIR=directory, SLOW_REQUEST_LOG="off"):
+            client = app_module.app.test_client()
+            response = client.post("/search/fast", json={"query": "вопрос"}, headers={"X-Profile": "wrong"})
+            assert "X-Profile-Id" not in response.headers
+
+            response = client.post("/search/fast", json={"query": "вопрос"}, headers={"X-Profile": "secret"})
+            profile_id = response.headers["X-Profile-Id"]
+            assert os.path.exists(os.path.join(directory, f"{profile_id}.prof"))
+
+
+if __name__ == "__main__":
+    test_thresholds()
+    test_slow_request_is_captured()
+    test_profile_on_admin_header()
+    print("✅ Все тесты диагностики медленных запросов пройдены")
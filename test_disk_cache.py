@@ -0,0 +1,275 @@
+import os
+import sys
+import json
+import time
+import random
+import string
+import tempfile
+import threading
+import multiprocessing
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+os.environ["OPENAI_API_KEY"] = "test-key"
+
+import backend.pipeline as pipeline
+from backend.cache import MemoryCache, DiskCache, TieredCache
+from backend.tavily_gateway import TavilyGateway
+
+
+def random_text(size, seed):
+    """Плохо сжимаемая строка заданной длины"""
+    rng = random.Random(seed)
+    return "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(size))
+
+
+def write_keys(path, worker, count):
+    """Процесс-воркер: пишет свои ключи и читает ключи родителя"""
+    cache = DiskCache(path, namespace="shared")
+    for i in range(count):
+        cache.set(f"{worker}:{i}", {"worker": worker, "i": i})
+    return cache.get("parent")
+
+
+class CountingTavilyClient:
+    def __init__(self):
+        self.calls = []
+
+    def search(self, query, **params):
+        self.calls.append(("search", query))
+        return {"query": query, "results": [{"title": "t", "url": "https://a.example", "score": 0.9}]}
+
+    def extract(self, urls, **params):
+        self.calls.append(("extract", tuple(urls)))
+        return {"results": [{"url": url, "raw_content": "текст страницы " * 50} for url in urls]}
+
+
+def test_disk_cache_roundtrip_and_ttl():
+    """Значения сжаты, возраст считается от сохранения, просроченные записи не отдаются"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite3")
+        cache = DiskCache(path, namespace="tavily", ttl=0.3)
+        value = {"query": "погода", "results": [{"content": "солнечно " * 200}]}
+        cache.set("k", value, stored_at=time.time() - 0.1)
+        stored, age = cache.get_with_age("k")
+        assert stored == value
+        assert 0.1 <= age < 0.3
+        stats = cache.stats()
+        assert stats["entries"] == 1
+        assert stats["bytes"] < len(json.dumps(value, ensure_ascii=False).encode()) / 5
+
+        # Другое пространство имён того же файла не видит запись
+        assert DiskCache(path, namespace="answers").get("k") is None
+
+        time.sleep(0.3)
+        assert cache.get("k") is None
+        assert cache.evict() == 1
+        assert len(cache) == 0
+
+
+def test_size_cap_evicts_least_recently_read():
+    """При превышении размера файла удаляются давно не читавшиеся записи, файл уменьшается"""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = DiskCache(os.path.join(directory, "cache.sqlite3"), max_bytes=200000,
+                          evict_every=1, touch_interval=0)
+        cache.set("a", random_text(100000, 1))
+        time.sleep(0.01)
+        cache.set("b", random_text(100000, 2))
+        time.sleep(0.01)
+        assert cache.get("a") is not None
+        time.sleep(0.01)
+        cache.set("c", random_text(100000, 3))
+        assert cache.wait_idle(5)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        assert cache.evicted == 1
+        assert cache.file_bytes() <= 200000
+
+
+def test_file_stays_within_cap():
+    """Под постоянной записью файл вместе с WAL не выходит за max_bytes"""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = DiskCache(os.path.join(directory, "cache.sqlite3"), max_bytes=300000)
+        for i in range(60):
+            cache.set(str(i), random_text(20000, i))
+            assert cache.wait_idle(5)
+            assert cache.file_bytes() <= 300000 * 1.05
+        assert cache.evicted > 0 and len(cache) < 60
+        assert cache.get("59") is not None
+
+
+def test_processes_share_cache():
+    """Несколько процессов одновременно пишут и читают один файл"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite3")
+        parent = DiskCache(path, namespace="shared")
+        parent.set("parent", {"from": "parent"})
+
+        with multiprocessing.get_context("spawn").Pool(4) as pool:
+            seen = pool.starmap(write_keys, [(path, worker, 50) for worker in range(4)])
+
+        assert seen == [{"from": "parent"}] * 4
+        assert len(parent) == 4 * 50 + 1
+        assert parent.get("3:49") == {"worker": 3, "i": 49}
+        assert parent.errors == 0
+
+
+def test_tiered_cache_promotes_hot_entries():
+    """Запись другого воркера читается с диска и после promote_hits чтений живёт в памяти"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite3")
+        other = TieredCache(MemoryCache(10), DiskCache(path, namespace="tavily"))
+        other.set("k", {"v": 1}, stored_at=time.time() - 5)
+
+        local = TieredCache(MemoryCache(10), DiskCache(path, namespace="tavily"), promote_hits=2)
+        assert local.get("k") == {"v": 1}
+        assert len(local) == 0
+        assert local.get("k") == {"v": 1}
+        assert len(local) == 1 and local.promoted == 1
+
+        # Из памяти запись отдаётся с исходным возрастом
+        value, age = local.memory.get_with_age("k")
+        assert value == {"v": 1} and age >= 5
+        assert local.stats()["disk"]["hits"] == 2
+
+
+def test_tiered_cache_prefers_newer_disk_copy():
+    """Запись в памяти старше max_age заменяется более свежей копией другого воркера"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite3")
+        local = TieredCache(MemoryCache(10), DiskCache(path, namespace="tavily"))
+        local.set("k", {"v": 1}, stored_at=time.time() - 30)
+        other = TieredCache(MemoryCache(10), DiskCache(path, namespace="tavily"))
+        other.set("k", {"v": 2})
+
+        # Свежая по max_age запись отдаётся из памяти без обращения к диску
+        assert local.get_with_age("k", max_age=60)[0] == {"v": 1}
+        value, age = local.get_with_age("k", max_age=10)
+        assert value == {"v": 2} and age < 10
+        assert local.memory.get("k") == {"v": 2}
+
+
+def test_eviction_runs_in_background():
+    """Очистка после записи выполняется фоновым потоком, а не в вызове set"""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = DiskCache(os.path.join(directory, "cache.sqlite3"), evict_every=1)
+        threads = []
+        original = cache.evict
+        cache.evict = lambda: threads.append(threading.current_thread()) or original()
+        cache.set("k", {"v": 1})
+        assert cache.wait_idle(5)
+        assert threads and threads[0] is not threading.current_thread()
+
+
+def test_gateway_served_from_disk_after_restart():
+    """Новый процесс (новый шлюз с пустой памятью) получает ответы Tavily с диска"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite3")
+
+        def gateway(client):
+            instance = TavilyGateway(client=client, cache=TieredCache(MemoryCache(10), DiskCache(path, "tavily")))
+            instance.fresh_ttl = {"search": 60, "extract": 3600, "crawl": 3600}
+            return instance
+
+        first = CountingTavilyClient()
+        old = gateway(first)
+        result = old.search("погода", max_results=3)
+        old.extract(["https://a.example"])
+        assert old.search("погода", max_results=3) == result
+        assert len(first.calls) == 2
+
+        second = CountingTavilyClient()
+        new = gateway(second)
+        assert new.search("погода", max_results=3) == result
+        assert new.extract(["https://a.example"])["results"][0]["url"] == "https://a.example"
+        assert second.calls == []
+
+        # Устаревший по TAVILY_CACHE_TTL ответ запрашивается заново
+        new.fresh_ttl["search"] = 0
+        new.search("погода", max_results=3)
+        assert second.calls == [("search", "погода")]
+
+
+def test_realtime_searches_expire_quickly():
+    """Котировки, новости и поиски за день берутся из кэша не дольше TAVILY_REALTIME_CACHE_TTL"""
+    with tempfile.TemporaryDirectory() as directory:
+        client = CountingTavilyClient()
+        gateway = TavilyGateway(client=client, cache=TieredCache(MemoryCache(10), DiskCache(
+            os.path.join(directory, "cache.sqlite3"), "tavily")))
+        gateway.fresh_ttl["search"] = 900
+        gateway.realtime_ttl = 0.2
+        for _ in range(2):
+            gateway.search("курс акций", topic="finance")
+            gateway.search("события", time_range="day")
+            gateway.search("погода")
+        assert len(client.calls) == 3
+
+        time.sleep(0.3)
+        gateway.search("курс акций", topic="finance")
+        gateway.search("события", time_range="day")
+        gateway.search("погода")
+        assert len(client.calls) == 5
+
+
+class StubAgent:
+    def __init__(self):
+        self.runs = 0
+
+    def model_spec(self, mode, step, provider=None):
+        return {"model": "stub", "max_tokens": 100}
+
+    def run(self, query, mode, tool_budget=None):
+        self.runs += 1
+        return {"response": f"ответ {self.runs}"}
+
+
+def test_answer_cache():
+    """Готовый ответ на тот же нормализованный запрос отдаётся из кэша"""
+    saved = {key: os.environ.get(key) for key in ("ANSWER_CACHE_TTL", "CACHE_DISK_PATH")}
+    original_search = pipeline.source_search
+    sources = {"results": [{"title": "t", "url": "https://a.example", "score": 0.9}]}
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update({"ANSWER_CACHE_TTL": "60", "CACHE_DISK_PATH": os.path.join(directory, "cache.sqlite3")})
+        pipeline.source_search = lambda query, mode: sources
+        pipeline._answer_cache = None
+        try:
+            agent = StubAgent()
+            first = pipeline.run_search("Курс  ЕВРО", "fast", agent=agent)
+            again = pipeline.run_search("курс евро", "fast", agent=agent)
+            assert again == {**first, "cached": True}
+            assert agent.runs == 1
+
+            pipeline.run_search("курс евро", "finance", agent=agent)
+            assert agent.runs == 2
+
+            # Ответ без источников не сохраняется
+            pipeline.source_search = lambda query, mode: {"results": [], "sources_unavailable": True}
+            pipeline.run_search("без источников", "fast", agent=agent)
+            pipeline.run_search("без источников", "fast", agent=agent)
+            assert agent.runs == 4
+        finally:
+            pipeline.source_search = original_search
+            pipeline._answer_cache = None
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+
+if __name__ == "__main__":
+    test_disk_cache_roundtrip_and_ttl()
+    test_size_cap_evicts_least_recently_read()
+    test_file_stays_within_cap()
+    test_processes_share_cache()
+    test_tiered_cache_promotes_hot_entries()
+    test_tiered_cache_prefers_newer_disk_copy()
+    test_eviction_runs_in_background()
+    test_gateway_served_from_disk_after_restart()
+    test_realtime_searches_expire_quickly()
+    test_answer_cache()
+    print("✅ Все тесты дискового кэша пройдены")
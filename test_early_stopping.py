@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+os.environ["OPENAI_API_KEY"] = "test-key"
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.tools import tool
+
+from backend.agent import WebAgent, AGENT_MAX_ITERATIONS, get_early_stop_settings
+
+RESULTS = {"results": [
+    {"title": "Столица Франции — Париж", "url": "https://a.example/1", "content": "Париж", "score": 0.9},
+    {"title": "Франция", "url": "https://b.example/2", "content": "столица Париж", "score": 0.8},
+]}
+
+
+@tool
+def tavily_search(query: str) -> str:
+    """Поиск в интернете"""
+    return json.dumps(RESULTS, ensure_ascii=False)
+
+
+class ScriptedModel:
+    """Модель, которая всегда вызывает поиск, пока ей не запретят инструменты"""
+
+    def __init__(self):
+        self.tool_rounds = 0
+        self.final_calls = 0
+
+    def bind_tools(self, tools):
+        return ToolCallingModel(self)
+
+    def invoke(self, messages):
+        self.final_calls += 1
+        return AIMessage(content="Париж")
+
+
+class ToolCallingModel:
+    def __init__(self, parent):
+        self.parent = parent
+
+    def invoke(self, messages):
+        self.parent.tool_rounds += 1
+        return AIMessage(content="", tool_calls=[{
+            "name": "tavily_search", "args": {"query": "столица Франции"},
+            "id": f"call_{self.parent.tool_rounds}"
+        }])
+
+
+def run_graph(mode):
+    agent = WebAgent(model_type="openai")
+    model = ScriptedModel()
+    agent.get_model = lambda mode, step: model
+    app = agent._build_tool_graph([tavily_search], mode).compile()
+    result = app.invoke({"messages": [
+        SystemMessage(content="system"),
+        HumanMessage(content="столица Франции")
+    ]})
+    return model, result
+
+
+def test_early_stop_on_sufficient_evidence():
+    """Достаточные результаты первого поиска завершают цикл после одной итерации"""
+    model, result = run_graph("fast")
+    assert model.tool_rounds == 1
+    assert model.final_calls == 1
+    assert result["stop_reason"] == "evidence"
+    assert result["messages"][-1].content == "Париж"
+
+
+def test_iteration_budget():
+    """Если данных недостаточно, цикл ограничен бюджетом итераций режима"""
+    os.environ["AGENT_EARLY_STOP_CONFIG"] = json.dumps({"deep": {"min_domains": 5, "max_iterations": 2}})
+    try:
+        model, result = run_graph("deep")
+    finally:
+        del os.environ["AGENT_EARLY_STOP_CONFIG"]
+    assert model.tool_rounds == 2
+    assert result["stop_reason"] == "budget"
+
+
+def run_agent(mode):
+    agent = WebAgent(model_type="openai")
+    model = ScriptedModel()
+    agent.get_model = lambda mode, step: model
+    graph = agent._build_tool_graph([tavily_search], mode).compile()
+    agent.compiled_graph = lambda mode: (graph, "system")
+    return model, agent.run("столица Франции", mode=mode)
+
+
+def test_default_budget_and_savings():
+    """Без явного max_iterations режим получает прежний бюджет; экономия - невыполненные итерации бюджета"""
+    assert all(get_early_stop_settings(mode)["max_iterations"] == AGENT_MAX_ITERATIONS
+               for mode in ("fast", "deep", "social", "academic", "finance"))
+
+    model, result = run_agent("fast")
+    assert result["agent_stats"]["early_stopped"] is True
+    assert result["agent_stats"]["iterations_unused"] == AGENT_MAX_ITERATIONS - 1
+
+    # Длинный deep-запрос не обрезается раньше прежнего бюджета
+    os.environ["AGENT_EARLY_STOP_CONFIG"] = json.dumps({"deep": {"min_domains": 5}})
+    try:
+        model, result = run_agent("deep")
+    finally:
+        del os.environ["AGENT_EARLY_STOP_CONFIG"]
+    assert model.tool_rounds == AGENT_MAX_ITERATIONS
+    assert result["agent_stats"]["iterations_unused"] == 0
+
+
+class DraftingModel:
+    """Модель шага tools, которая сразу отвечает без инструментов"""
+
+    def bind_tools(self, tools):
+        return self
+
+    def invoke(self, messages):
+        return AIMessage(content="черновик")
+
+
+def answer_directly(mode):
+    agent = WebAgent(model_type="openai")
+    final = ScriptedModel()
+    agent.model_spec = lambda mode, step, provider=None: {"model": f"{step}-model", "max_tokens": 100}
+    agent.get_model = lambda mode, step: final if step == "final" else DraftingModel()
+    app = agent._build_tool_graph([tavily_search], mode).compile()
+    result = app.invoke({"messages": [SystemMessage(content="system"), HumanMessage(content="вопрос")]})
+    return final, result
+
+
+def test_resynthesis_is_opt_in():
+    """Ответ модели шага tools без поиска не пересинтезируется, если режим не в AGENT_RESYNTHESIS_MODES"""
+    final, result = answer_directly("deep")
+    assert final.final_calls == 0
+    assert result["messages"][-1].content == "черновик"
+
+    os.environ["AGENT_RESYNTHESIS_MODES"] = "deep,academic"
+    try:
+        final, result = answer_directly("deep")
+    finally:
+        del os.environ["AGENT_RESYNTHESIS_MODES"]
+    assert final.final_calls == 1
+    assert result["messages"][-1].content == "Париж"
+
+
+if __name__ == "__main__":
+    test_early_stop_on_sufficient_evidence()
+    test_iteration_budget()
+    test_default_budget_and_savings()
+    test_resynthesis_is_opt_in()
+    print("✅ Все тесты досрочной остановки пройдены")
@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tavily.errors import UsageLimitExceededError, BadRequestError
+
+from backend.http_pool import get_http_client, http_pool_stats, reset_http_clients
+from backend.tavily_client import PooledTavilyClient
+from backend.resilience import CancelScope, CallCancelled, cancel_scope
+from backend.tracing import SpanExporter, set_exporter, start_trace
+
+
+class FakeTavilyHandler(BaseHTTPRequestHandler):
+    """Локальный Tavily с keep-alive: /search отвечает результатом, запрос "limit" - 429"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if body.get("query") == "limit":
+            status, payload = 429, {"detail": {"error": "limit"}}
+        elif body.get("query") == "hang":
+            time.sleep(3)
+            status, payload = 200, {"query": "hang", "results": []}
+        elif body.get("query") == "bad":
+            status, payload = 400, {"detail": {"error": "bad request"}}
+        else:
+            status, payload = 200, {"query": body["query"], "sent": body, "results": [{"url": "https://a"}]}
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTavilyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_connections_are_reused():
+    """Последовательные вызовы разными клиентами (ключами) идут через одно соединение"""
+    reset_http_clients()
+    server = start_server()
+    try:
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        for i in range(5):
+            client = PooledTavilyClient(api_key=f"key-{i % 2}", base_url=base_url)
+            result = client.search(f"query {i}", max_results=3, time_range=None)
+            assert result["results"][0]["url"] == "https://a"
+            # Незаданные параметры не отправляются
+            assert "time_range" not in result["sent"]
+
+        stats = http_pool_stats()["tavily"]
+        assert stats["requests"] == 5
+        assert stats["connections_opened"] == 1
+        assert stats["reused_ratio"] == 0.8
+        assert stats["connections"]["idle"] == 1
+    finally:
+        server.shutdown()
+
+
+def test_errors_are_mapped():
+    """Ответы апстрима отображаются в исключения SDK Tavily"""
+    reset_http_clients()
+    server = start_server()
+    try:
+        client = PooledTavilyClient(api_key="key", base_url=f"http://127.0.0.1:{server.server_address[1]}")
+        for query, error in (("limit", UsageLimitExceededError), ("bad", BadRequestError)):
+            try:
+                client.search(query)
+                assert False, f"{query}: ожидалась ошибка"
+            except error:
+                pass
+    finally:
+        server.shutdown()
+
+
+def test_http_calls_are_traced():
+    """Каждый HTTP-вызов апстрима записывается спаном текущей трассы"""
+
+    class MemoryExporter(SpanExporter):
+        spans = []
+
+        def export(self, spans):
+            self.spans.extend(spans)
+
+    reset_http_clients()
+    set_exporter(MemoryExporter())
+    server = start_server()
+    try:
+        client = PooledTavilyClient(api_key="key", base_url=f"http://127.0.0.1:{server.server_address[1]}")
+        with start_trace("test"):
+            client.search("query")
+        http_spans = [s for s in MemoryExporter.spans if s["name"] == "http:tavily"]
+        assert len(http_spans) == 1
+        assert http_spans[0]["attributes"]["status"] == 200
+        assert http_spans[0]["attributes"]["url"].endswith("/search")
+    finally:
+        set_exporter(None)
+        server.shutdown()
+
+
+def test_one_client_per_upstream():
+    """Один клиент на апстрим; настройки пула переопределяются для апстрима"""
+    reset_http_clients()
+    os.environ["OPENAI_HTTP_MAX_CONNECTIONS"] = "7"
+    try:
+        assert get_http_client("openai") is get_http_client("openai")
+        assert get_http_client("openai") is not get_http_client("anthropic")
+        stats = http_pool_stats()
+        assert stats["openai"]["max_connections"] == 7
+        assert stats["anthropic"]["max_connections"] == 100
+    finally:
+        del os.environ["OPENAI_HTTP_MAX_CONNECTIONS"]
+        reset_http_clients()
+
+
+def test_cancelled_call_closes_connection():
+    """Отмена области обрывает ожидание ответа, новые запросы отменённого вызова не отправляются"""
+    reset_http_clients()
+    server = start_server()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/search"
+        scope = CancelScope()
+        outcome = {}
+
+        def call():
+            start = time.monotonic()
+            try:
+                with cancel_scope(scope):
+                    get_http_client("tavily").post(url, json={"query": "hang"})
+            except Exception as e:
+                outcome["error"] = e
+            outcome["seconds"] = time.monotonic() - start
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        time.sleep(0.2)
+        scope.cancel()
+        thread.join(5)
+        assert "error" in outcome and outcome["seconds"] < 1.5, outcome
+
+        try:
+            with cancel_scope(scope):
+                get_http_client("tavily").post(url, json={"query": "q"})
+            assert False, "ожидалась CallCancelled"
+        except CallCancelled:
+            pass
+    finally:
+        server.shutdown()
+        reset_http_clients()
+
+
+if __name__ == "__main__":
+    test_connections_are_reused()
+    test_errors_are_mapped()
+    test_http_calls_are_traced()
+    test_one_client_per_upstream()
+    test_cancelled_call_closes_connection()
+    print("✅ Все тесты пула HTTP-соединений пройдены")
@@ -0,0 +1,191 @@
+import os
+import sys
+import time
+import subprocess
+import tempfile
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+os.environ["OPENAI_API_KEY"] = "test-key"
+# Журнал запросов и трассы не пишутся в каталог репозитория
+os.environ["QUERY_LOG"] = "off"
+os.environ["TRACE_EXPORTER"] = "none"
+
+from backend.admission import AdmissionRejected
+from backend.jobs import JobManager, JobStore, MemoryJobStore, SQLiteJobStore, SUCCEEDED, FAILED
+
+
+def slow_runner(query, mode, progress):
+    progress("agent")
+    time.sleep(0.1)
+    progress("sources")
+    return {"response": f"ответ на {query}", "mode": mode}
+
+
+def wait_finished(manager, job_id):
+    job = manager.get(job_id)
+    while job["status"] not in (SUCCEEDED, FAILED):
+        job = manager.get(job_id, wait=2.0, version=job["version"])
+    return job
+
+
+def test_memory_store_long_poll():
+    """Задание возвращается сразу, long-poll отдаёт прогресс и результат"""
+    manager = JobManager(MemoryJobStore(), slow_runner, workers=2, ttl=60)
+    job = manager.submit("тест", "deep")
+    assert job["status"] == "queued"
+
+    update = manager.get(job["id"], wait=2.0, version=job["version"])
+    assert update["version"] > job["version"]
+
+    done = wait_finished(manager, job["id"])
+    assert done["status"] == SUCCEEDED
+    assert done["result"]["response"] == "ответ на тест"
+    assert done["expires_at"] > time.time()
+
+
+def test_sqlite_store_shared_between_managers():
+    """Задание из одного процесса видно через другое подключение к тому же файлу"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "jobs.sqlite3")
+        manager = JobManager(SQLiteJobStore(path), slow_runner, workers=1, ttl=60)
+        job = manager.submit("тест", "fast")
+        wait_finished(manager, job["id"])
+
+        other = SQLiteJobStore(path)
+        assert other.get(job["id"])["status"] == SUCCEEDED
+
+
+def test_ttl_and_failures():
+    """Ошибка выполнения сохраняется, завершённые задания удаляются по TTL"""
+    def failing_runner(query, mode, progress):
+        raise ValueError("сбой")
+
+    manager = JobManager(MemoryJobStore(), failing_runner, workers=1, ttl=0.1)
+    job = manager.submit("тест", "fast")
+    done = wait_finished(manager, job["id"])
+    assert done["status"] == FAILED and done["error"] == "сбой"
+
+    time.sleep(0.2)
+    assert manager.get(job["id"]) is None
+    assert manager.store.purge_expired() == 1
+
+
+def test_admission_rejection_is_retried():
+    """Отказ допуска не проваливает задание, а откладывает его"""
+    attempts = []
+
+    def busy_runner(query, mode, progress):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise AdmissionRejected(mode, 429, 0, "занято")
+        return {"response": "ok"}
+
+    manager = JobManager(MemoryJobStore(), busy_runner, workers=1, ttl=60)
+    job = manager.submit("тест", "deep")
+    assert wait_finished(manager, job["id"])["status"] == SUCCEEDED
+    assert len(attempts) == 2
+
+
+def test_admission_rejection_gives_up():
+    """Задание, которому допуск отказывает дольше capacity_wait, завершается ошибкой"""
+    attempts = []
+
+    def overloaded_runner(query, mode, progress):
+        attempts.append(1)
+        raise AdmissionRejected(mode, 503, 0, "очередь переполнена")
+
+    manager = JobManager(MemoryJobStore(), overloaded_runner, workers=1, ttl=60, capacity_wait=0.5)
+    job = manager.submit("тест", "deep")
+    started = time.monotonic()
+    job = wait_finished(manager, job["id"])
+    assert job["status"] == FAILED and "очередь переполнена" in job["error"]
+    assert time.monotonic() - started < 2
+    assert 2 <= len(attempts) <= 10
+
+
+def test_heartbeat_keeps_long_job_alive():
+    """Пульс владельца не даёт долгому заданию считаться брошенным"""
+    def long_runner(query, mode, progress):
+        time.sleep(0.6)
+        return {"response": "ok"}
+
+    manager = JobManager(MemoryJobStore(), long_runner, workers=1, ttl=60, stale_after=0.2)
+    job = manager.submit("тест", "deep")
+    assert job["expires_at"] >= job["created_at"] + manager.capacity_wait
+    assert wait_finished(manager, job["id"])["status"] == SUCCEEDED
+
+
+def test_abandoned_jobs_fail():
+    """Задание завершившегося воркера или без пульса помечается failed"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteJobStore(os.path.join(tmp, "jobs.sqlite3"))
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        now = time.time()
+        base = {"mode": "fast", "query": "тест", "stage": "agent", "version": 3, "created_at": now,
+                "expires_at": now + 600, "result": None, "error": None, "trace_id": None}
+        store.create({**base, "id": "dead-owner", "status": "running", "updated_at": now, "owner_pid": dead.pid})
+        store.create({**base, "id": "no-heartbeat", "status": "queued", "updated_at": now - 120,
+                      "owner_pid": os.getpid()})
+        store.create({**base, "id": "alive", "status": "running", "updated_at": now, "owner_pid": os.getpid()})
+
+        manager = JobManager(store, slow_runner, workers=1, ttl=60, stale_after=60)
+        job = manager.get("dead-owner", wait=0.1, version=3)
+        assert job["status"] == FAILED and job["expires_at"] <= time.time() + 60
+        manager.purge()
+        assert store.get("no-heartbeat")["status"] == FAILED
+        assert store.get("alive")["status"] == "running"
+        assert [job["id"] for job in store.unfinished()] == ["alive"]
+
+
+def test_abstract_store():
+    """Хранилище без обязательных методов не создаётся"""
+    class Incomplete(JobStore):
+        def get(self, job_id):
+            return None
+
+    try:
+        Incomplete()
+        assert False, "ожидалась ошибка"
+    except TypeError:
+        pass
+
+
+def test_http_job_flow():
+    """POST /jobs отвечает 202, GET /jobs/<id> отдаёт результат"""
+    import app as app_module
+
+    original = app_module.job_manager.runner
+    app_module.job_manager.runner = slow_runner
+    try:
+        client = app_module.app.test_client()
+        response = client.post('/jobs', json={"query": "тест", "mode": "deep"})
+        assert response.status_code == 202
+        job_id = response.get_json()["job_id"]
+        assert response.headers["Location"] == f"/jobs/{job_id}"
+
+        job = wait_finished(app_module.job_manager, job_id)
+        body = client.get(f'/jobs/{job_id}?wait=1&version={job["version"]}').get_json()
+        assert body["status"] == SUCCEEDED
+
+        assert client.get('/jobs/unknown').status_code == 404
+        assert client.post('/jobs', json={"query": "тест", "mode": "bogus"}).status_code == 400
+    finally:
+        app_module.job_manager.runner = original
+
+
+if __name__ == "__main__":
+    test_memory_store_long_poll()
+    test_sqlite_store_shared_between_managers()
+    test_ttl_and_failures()
+    test_admission_rejection_is_retried()
+    test_admission_rejection_gives_up()
+    test_heartbeat_keeps_long_job_alive()
+    test_abandoned_jobs_fail()
+    test_abstract_store()
+    test_http_job_flow()
+    print("✅ Все тесты фоновых заданий пройдены")
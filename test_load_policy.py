@@ -0,0 +1,60 @@
+import os
+import sys
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backend.load_policy import current_load, plan_mode
+
+
+def make_load(in_flight=0, queue_depth=0, llm_p90=None, tavily_p90=None, llm_state="closed"):
+    """Снимок нагрузки с одним режимом deep (4 слота, очередь 8)"""
+    admission = {
+        "in_flight": in_flight,
+        "max_concurrent": 16,
+        "modes": {
+            "deep": {"concurrency": 4, "queue_limit": 8, "in_flight": in_flight, "queue_depth": queue_depth},
+            "academic": {"concurrency": 4, "queue_limit": 12, "in_flight": in_flight, "queue_depth": queue_depth}
+        }
+    }
+    llm = {"providers": {"llm:openai": {"state": llm_state, "p90": llm_p90}}}
+    tavily = {"breaker": {"state": "closed", "p90": tavily_p90}}
+    return current_load(admission, llm, tavily, "openai")
+
+
+def test_idle_keeps_mode():
+    """Без нагрузки режим не меняется"""
+    plan = plan_mode("deep", make_load())
+    assert plan == {"mode": "deep", "tool_budget": None, "degraded": False, "reason": None}
+    assert not plan_mode("fast", make_load(in_flight=16, queue_depth=10))["degraded"]
+
+
+def test_busy_deep_is_bounded():
+    """Занятые слоты deep - ограниченный deep с малым бюджетом инструментов"""
+    plan = plan_mode("deep", make_load(in_flight=4))
+    assert plan["mode"] == "deep"
+    assert plan["tool_budget"] == 3
+    assert plan["degraded"] and "in flight" in plan["reason"]
+
+
+def test_severe_load_downgrades_deep():
+    """Глубокая очередь или занятость при медленном LLM - понижение до fast"""
+    assert plan_mode("deep", make_load(in_flight=4, queue_depth=4))["mode"] == "fast"
+    plan = plan_mode("deep", make_load(in_flight=4, llm_p90=30.0))
+    assert plan["mode"] == "fast"
+    assert "LLM p90" in plan["reason"]
+
+
+def test_slow_upstream_bounds_academic():
+    """Медленный Tavily сокращает бюджет инструментов academic"""
+    plan = plan_mode("academic", make_load(tavily_p90=12.0))
+    assert plan["mode"] == "academic"
+    assert plan["tool_budget"] == 2
+
+
+if __name__ == "__main__":
+    test_idle_keeps_mode()
+    test_busy_deep_is_bounded()
+    test_severe_load_downgrades_deep()
+    test_slow_upstream_bounds_academic()
+    print("✅ Все тесты деградации под нагрузкой пройдены")
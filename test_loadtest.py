@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.loadtest import load_log, parse_mix, schedule, run_load, summarize, saturation_point
+
+
+class FakeSearchHandler(BaseHTTPRequestHandler):
+    """Сервис поиска: /search/deep отвечает 503, запрос "slow" - дольше таймаута клиента"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if body["query"] == "slow":
+            time.sleep(0.5)
+        status = 503 if self.path == "/search/deep" else 200
+        data = json.dumps({"response": "ok"}).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # Клиент уже закрыл соединение по таймауту
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def write_log(directory, records):
+    path = os.path.join(directory, "queries.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.write("не json\n")
+    return path
+
+
+def test_schedule_from_log():
+    """Интервалы журнала масштабируются, смесь режимов переопределяет режимы"""
+    with tempfile.TemporaryDirectory() as directory:
+        entries = load_log(write_log(directory, [
+            {"mode": "deep", "query": "второй", "timestamp": "2026-10-01T10:00:10Z"},
+            {"mode": "fast", "query": "первый", "timestamp": "2026-10-01T10:00:00Z"},
+            {"mode": "unknown", "query": "пропуск", "timestamp": 0},
+        ]))
+    assert [entry["query"] for entry in entries] == ["первый", "второй"]
+    plan = schedule(entries, time_scale=5)
+    assert plan == [(0.0, "fast", "первый"), (2.0, "deep", "второй")]
+
+    plan = schedule(entries, rate=50, duration=2, mix=parse_mix("fast=1"), seed=1)
+    assert 50 < len(plan) < 150
+    assert {mode for _, mode, _ in plan} == {"fast"}
+    assert all(plan[i][0] <= plan[i + 1][0] for i in range(len(plan) - 1))
+
+
+def test_run_load_reports_errors_and_timeouts():
+    """Отчёт по режимам: задержки успешных ответов, доля ошибок и таймаутов"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSearchHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        plan = [(0.0, "fast", "вопрос"), (0.01, "fast", "slow"), (0.02, "deep", "вопрос"), (0.03, "fast", "вопрос")]
+        started = time.monotonic()
+        results = run_load(url, plan, timeout=0.2)
+        summary = summarize(results, time.monotonic() - started)
+    finally:
+        server.shutdown()
+    assert summary["overall"]["requests"] == 4
+    assert summary["modes"]["fast"]["ok"] == 2
+    assert summary["modes"]["fast"]["timeout_rate"] == round(1 / 3, 4)
+    assert summary["modes"]["deep"]["statuses"] == {"503": 1}
+    assert summary["modes"]["deep"]["error_rate"] == 1.0
+
+
+def test_saturation_point():
+    """Точка насыщения - последняя ступень, которую сервис выдерживает"""
+    def stage(rate, throughput, p95, errors=0.0):
+        return {"rate": rate, "summary": {"overall": {"throughput_rps": throughput, "p95_ms": p95, "error_rate": errors}}}
+
+    stages = [stage(2, 2, 500), stage(4, 3.9, 800), stage(8, 5, 4000), stage(16, 5, 9000)]
+    assert saturation_point(stages, slo_p95_ms=2000, max_error_rate=0.01) == 4
+    assert saturation_point([stage(2, 2, 500, errors=0.2)], 2000, 0.01) is None
+
+
+if __name__ == "__main__":
+    test_schedule_from_log()
+    test_run_load_reports_errors_and_timeouts()
+    test_saturation_point()
+    print("✅ Все тесты нагрузочного теста пройдены")
@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import time
+import tempfile
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+os.environ["OPENAI_API_KEY"] = "test-key"
+# Журнал запросов и трассы не пишутся в каталог репозитория
+os.environ["QUERY_LOG"] = "off"
+os.environ["TRACE_EXPORTER"] = "none"
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.tools import tool
+
+from backend.agent import WebAgent
+from backend.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    search_metrics,
+    stage,
+    tool_call,
+    STAGE_SECONDS,
+    TOOL_CALLS,
+    TOOL_CALL_SECONDS,
+    TOOL_CALLS_PER_REQUEST,
+    LLM_TOKENS,
+    REQUEST_SECONDS,
+    ERRORS
+)
+
+RESULTS = {"results": [
+    {"title": "Столица Франции — Париж", "url": "https://a.example/1", "content": "Париж", "score": 0.9},
+    {"title": "Франция", "url": "https://b.example/2", "content": "столица Париж", "score": 0.8},
+]}
+
+
+@tool
+def tavily_search(query: str) -> str:
+    """Поиск в интернете"""
+    with tool_call("tavily_search"):
+        return json.dumps(RESULTS, ensure_ascii=False)
+
+
+class ScriptedModel:
+    """Один раунд поиска, затем ответ; ответы несут usage_metadata"""
+
+    def bind_tools(self, tools):
+        return self
+
+    def invoke(self, messages):
+        usage = {"input_tokens": 100, "output_tokens": 5, "total_tokens": 105}
+        if any(getattr(m, "type", "") == "tool" for m in messages):
+            return AIMessage(content="Париж", usage_metadata=usage)
+        return AIMessage(content="", usage_metadata=usage, tool_calls=[{
+            "name": "tavily_search", "args": {"query": "столица Франции"}, "id": "call_1"
+        }])
+
+
+def test_exposition_format():
+    """Счётчики и гистограммы выводятся в текстовом формате Prometheus"""
+    registry = Registry()
+    counter = registry.register(Counter("test_total", "Тестовый счётчик", ("kind",)))
+    histogram = registry.register(Histogram("test_seconds", "Тестовая гистограмма", ("kind",), buckets=(0.1, 1)))
+    counter.inc(kind='a"b')
+    histogram.observe(0.1, kind="x")
+    histogram.observe(5, kind="x")
+    text = registry.render()
+    assert "# TYPE test_total counter" in text
+    assert 'test_total{kind="a\\"b"} 1' in text
+    assert 'test_seconds_bucket{kind="x",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{kind="x",le="1"} 1' in text
+    assert 'test_seconds_bucket{kind="x",le="+Inf"} 2' in text
+    assert 'test_seconds_count{kind="x"} 2' in text
+
+
+def test_graph_stages_are_labeled():
+    """Этапы агента и вызовы инструментов в потоках LangGraph размечаются режимом и моделью поиска"""
+    agent = WebAgent(model_type="openai")
+    agent.get_model = lambda mode, step: ScriptedModel()
+    model = agent.model_spec("fast", "tools")["model"]
+    app = agent._build_tool_graph([tavily_search], "fast").compile()
+
+    with search_metrics("fast", model):
+        app.invoke({"messages": [SystemMessage(content="system"), HumanMessage(content="столица Франции")]})
+
+    labels = {"mode": "fast", "model": model}
+    assert TOOL_CALLS.value(tool="tavily_search", **labels) >= 1
+    assert TOOL_CALL_SECONDS.count(tool="tavily_search", **labels) >= 1
+    assert STAGE_SECONDS.count(stage="agent_iteration", **labels) >= 1
+    assert TOOL_CALLS_PER_REQUEST.count(**labels) >= 1
+    assert LLM_TOKENS.value(direction="input", **labels) >= 100
+
+
+def test_stage_errors_are_counted():
+    """Исключение этапа учитывается по типу и пробрасывается дальше"""
+    try:
+        with search_metrics("deep", "test-model"), stage("sources"):
+            raise TimeoutError("slow")
+    except TimeoutError:
+        pass
+    assert ERRORS.value(type="TimeoutError", stage="sources", mode="deep", model="test-model") == 1
+
+
+def test_workers_are_summed():
+    """С каталогом снимков render суммирует процессы; значения мастера не удваиваются после fork"""
+    with tempfile.TemporaryDirectory() as directory:
+        registry = Registry(directory=directory)
+        counter = registry.register(Counter("worker_total", "Тестовый счётчик", ("kind",)))
+        histogram = registry.register(Histogram("worker_seconds", "Тестовая гистограмма", buckets=(1,)))
+        gauge = registry.register(Gauge("worker_queue", "Тестовая шкала"))
+        counter.inc(kind="a")
+        gauge.set(3)
+        registry.write_snapshot()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                counter.inc(2, kind="a")
+                histogram.observe(0.5)
+                gauge.set(5)
+                registry.write_snapshot()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+        counter.inc(kind="a")
+        for _ in range(2):
+            text = registry.render()
+            assert 'worker_total{kind="a"} 4' in text, text
+            assert 'worker_seconds_count 1' in text
+            # Текущее значение завершившегося воркера не учитывается
+            assert 'worker_queue 3' in text, text
+        # Снимок завершившегося воркера свёрнут в общий файл
+        snapshots = [name for name in os.listdir(directory) if name.endswith(".json")]
+        assert sorted(snapshots) == sorted([Registry.AGGREGATE_FILE, os.path.basename(registry._snapshot_path)])
+
+
+def fake_run_search(query, mode, **kwargs):
+    with search_metrics(mode, "boundary-model"):
+        time.sleep(0.01)
+    return {"response": "ok", "sources": []}
+
+
+def test_request_seconds_at_request_boundary():
+    """search_request_seconds учитывает запрос целиком, в том числе отклонённый до поиска"""
+    import app as app_module
+    original = app_module.run_search
+    app_module.run_search = fake_run_search
+    try:
+        client = app_module.app.test_client()
+        searched = REQUEST_SECONDS.count(mode="fast", model="boundary-model")
+        rejected = REQUEST_SECONDS.count(mode="fast", model="")
+        client.post("/search/fast", json={"query": "вопрос"})
+        client.post("/search/fast", json={})
+    finally:
+        app_module.run_search = original
+    assert REQUEST_SECONDS.count(mode="fast", model="boundary-model") == searched + 1
+    assert REQUEST_SECONDS.count(mode="fast", model="") == rejected + 1
+
+
+if __name__ == "__main__":
+    test_exposition_format()
+    test_graph_stages_are_labeled()
+    test_stage_errors_are_counted()
+    test_workers_are_summed()
+    test_request_seconds_at_request_boundary()
+    print("✅ Все тесты метрик пройдены")
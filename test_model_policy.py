@@ -0,0 +1,63 @@
+import os
+import sys
+import json
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+os.environ["OPENAI_API_KEY"] = "test-key"
+os.environ["ANTHROPIC_API_KEY"] = "test-key"
+
+from backend.model_policy import load_model_policy, resolve_model
+from backend.agent import WebAgent
+
+
+def test_default_tiering():
+    """Сильная модель используется только для финального синтеза deep/academic"""
+    os.environ["NANO_MODEL"] = "nano-model"
+    os.environ["KIMIK2_MODEL"] = "strong-model"
+    try:
+        check_default_tiering()
+    finally:
+        del os.environ["NANO_MODEL"]
+        del os.environ["KIMIK2_MODEL"]
+
+
+def check_default_tiering():
+    policy = load_model_policy()
+    assert resolve_model(policy, "fast", "tools", "openai")["model"] == "nano-model"
+    assert resolve_model(policy, "fast", "final", "openai")["model"] == "nano-model"
+    assert resolve_model(policy, "deep", "tools", "openai")["model"] == "nano-model"
+    assert resolve_model(policy, "deep", "final", "openai")["model"] == "strong-model"
+    assert resolve_model(policy, "academic", "final", "openai")["model"] == "strong-model"
+    assert resolve_model(policy, "route", "route", "openai")["max_tokens"] == 256
+    # Ответ шага tools без пересинтеза и есть итоговый ответ
+    for mode in ("fast", "deep", "social", "academic", "finance"):
+        assert resolve_model(policy, mode, "tools", "openai")["max_tokens"] == 4096
+
+
+def test_policy_override_from_env():
+    """Политику можно изменить через MODEL_POLICY без изменения кода"""
+    os.environ["MODEL_POLICY"] = json.dumps({"fast": {"tools": {"model": "custom", "max_tokens": 300}}})
+    try:
+        policy = load_model_policy()
+    finally:
+        del os.environ["MODEL_POLICY"]
+    assert resolve_model(policy, "fast", "tools", "openai") == {"model": "custom", "max_tokens": 300}
+    assert resolve_model(policy, "deep", "final", "openai")["max_tokens"] == 4096
+
+
+def test_agent_reuses_models():
+    """Агент создаёт по одной модели на каждую пару (модель, лимит токенов)"""
+    agent = WebAgent(model_type="anthropic")
+    assert agent.get_model("social", "tools") is agent.get_model("finance", "tools")
+    assert agent.get_model("deep", "final") is not agent.get_model("deep", "tools")
+
+
+if __name__ == "__main__":
+    test_default_tiering()
+    test_policy_override_from_env()
+    test_agent_reuses_models()
+    print("✅ Все тесты политики моделей пройдены")
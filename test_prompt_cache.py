@@ -0,0 +1,75 @@
+import os
+import sys
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from backend.prompts import (
+    SIMPLE_PROMPT,
+    REASONING_PROMPT,
+    SOCIAL_PROMPT,
+    ACADEMIC_PROMPT,
+    FINANCE_PROMPT,
+    ROUTING_PROMPT,
+    current_date,
+    dynamic_suffix
+)
+from backend.prompt_cache import system_message, prepare_messages, prompt_cache_stats
+from backend.providers import KeyedChatModel
+
+
+class CapturingModel:
+    """Модель провайдера, запоминающая отправленные сообщения"""
+
+    def __init__(self):
+        self.sent = None
+
+    def invoke(self, messages, config=None, **kwargs):
+        self.sent = messages
+        return AIMessage(content="ok", usage_metadata={
+            "input_tokens": 1000, "output_tokens": 10, "total_tokens": 1010,
+            "input_token_details": {"cache_read": 800}
+        })
+
+
+def test_prompts_have_no_frozen_date():
+    """Стабильные промпты не содержат даты, она приходит в динамическом суффиксе"""
+    for prompt in (SIMPLE_PROMPT, REASONING_PROMPT, SOCIAL_PROMPT, ACADEMIC_PROMPT, FINANCE_PROMPT, ROUTING_PROMPT):
+        assert "Сегодняшняя дата" not in prompt
+    assert current_date() in dynamic_suffix()
+
+
+def test_provider_formats():
+    """Anthropic получает точку кэширования, OpenAI - одну строку с тем же префиксом"""
+    messages = [system_message(SIMPLE_PROMPT, dynamic_suffix()), HumanMessage(content="вопрос")]
+
+    anthropic = prepare_messages("anthropic", messages)
+    assert anthropic[0].content[0]["cache_control"] == {"type": "ephemeral"}
+    assert "cache_control" not in anthropic[0].content[1]
+
+    openai = prepare_messages("openai", messages)
+    assert isinstance(openai[0], SystemMessage)
+    assert openai[0].content.startswith(SIMPLE_PROMPT.strip())
+    assert openai[0].content.endswith(dynamic_suffix())
+    assert openai[1] is messages[1]
+
+
+def test_keyed_model_prepares_and_records():
+    """Модель провайдера получает сообщения в своём формате, доля кэша учитывается"""
+    captured = CapturingModel()
+    model = KeyedChatModel("test-prompt-cache", lambda api_key: captured)
+    model.invoke([system_message("префикс", "суффикс"), HumanMessage(content="вопрос")])
+    assert captured.sent[0].content == "префикс\n\nсуффикс"
+
+    stats = prompt_cache_stats()["test-prompt-cache"]
+    assert stats["calls"] == 1
+    assert stats["cached_ratio"] == 0.8
+
+
+if __name__ == "__main__":
+    test_prompts_have_no_frozen_date()
+    test_provider_formats()
+    test_keyed_model_prepares_and_records()
+    print("✅ Все тесты кэширования промптов пройдены")
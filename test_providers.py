@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backend.resilience import CircuitBreaker, CircuitOpenError, current_cancel_scope
+from backend.providers import FailoverChatModel, is_provider_failure, provider_breaker, provider_stats
+
+
+class StatusError(Exception):
+    """Имитация ошибки HTTP-статуса клиента провайдера"""
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        super().__init__(f"HTTP {status_code}")
+
+
+class FakeModel:
+    def __init__(self, answer, delay=0.0, fail=None):
+        self.answer = answer
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def invoke(self, messages, config=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise self.fail
+        return self.answer
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """Предохранитель размыкается по доле ошибок и пропускает пробный вызов"""
+    breaker = CircuitBreaker("test", min_calls=4, error_threshold=0.5, open_seconds=0.05)
+    for _ in range(4):
+        assert breaker.allow_request()
+        breaker.record(False, 0.01)
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # только один пробный вызов
+    breaker.record(True, 0.01)
+    assert breaker.state == "closed"
+
+
+def test_failover_to_secondary():
+    """Ошибка основного провайдера приводит к вызову резервного"""
+    primary = FakeModel("primary", fail=StatusError(503))
+    secondary = FakeModel("secondary")
+    model = FailoverChatModel([("test-failover-a", primary), ("test-failover-b", secondary)])
+    assert model.bind_tools([]).invoke([]) == "secondary"
+    assert provider_breaker("test-failover-a").total_errors == 1
+
+
+def test_client_error_is_not_failed_over():
+    """Ошибка запроса (4xx) отдаётся клиенту без переключения и не размыкает предохранитель"""
+    primary = FakeModel("primary", fail=StatusError(400))
+    secondary = FakeModel("secondary")
+    model = FailoverChatModel([("test-client-error-a", primary), ("test-client-error-b", secondary)])
+    try:
+        model.invoke([])
+        assert False, "ожидалась ошибка запроса"
+    except StatusError:
+        pass
+    assert secondary.calls == 0
+    assert provider_breaker("test-client-error-a").total_errors == 0
+    assert is_provider_failure(StatusError(429)) and is_provider_failure(StatusError(502))
+    assert is_provider_failure(TimeoutError()) and not is_provider_failure(ValueError())
+
+
+def test_open_circuit_fails_fast():
+    """Если все предохранители разомкнуты, вызов отклоняется без обращения к провайдеру"""
+    breaker = provider_breaker("test-open")
+    for _ in range(breaker.min_calls):
+        breaker.record(False, 0.01)
+    slow = FakeModel("never", delay=1.0)
+    try:
+        FailoverChatModel([("test-open", slow)]).invoke([])
+        assert False, "ожидалась CircuitOpenError"
+    except CircuitOpenError:
+        pass
+    assert slow.calls == 0
+
+
+def test_hedged_request():
+    """Медленный основной провайдер хеджируется резервным, побеждает быстрый ответ"""
+    primary = FakeModel("slow", delay=1.5)
+    secondary = FakeModel("fast", delay=0.01)
+    breaker = provider_breaker("test-hedge-a")
+    for _ in range(10):
+        breaker.record(True, 0.05)
+    model = FailoverChatModel([("test-hedge-a", primary), ("test-hedge-b", secondary)], hedge=True)
+    start = time.monotonic()
+    assert model.invoke([]) == "fast"
+    assert time.monotonic() - start < 1.2
+    assert provider_stats()["hedges"]["won_by_secondary"] >= 1
+
+
+class WaitingModel:
+    """Отвечает через delay секунд, если вызов не отменён раньше"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.cancelled = False
+
+    def invoke(self, messages, config=None, **kwargs):
+        scope = current_cancel_scope()
+        deadline = time.monotonic() + self.delay
+        while time.monotonic() < deadline:
+            if scope is not None and scope.cancelled:
+                self.cancelled = True
+                scope.check()
+            time.sleep(0.01)
+        return "slow"
+
+
+def test_losing_hedge_is_cancelled():
+    """Проигравший хеджированный вызов отменяется и не считается ошибкой провайдера"""
+    primary = WaitingModel(delay=2.0)
+    breaker = provider_breaker("test-cancel-a")
+    for _ in range(10):
+        breaker.record(True, 0.05)
+    model = FailoverChatModel([("test-cancel-a", primary), ("test-cancel-b", FakeModel("fast"))], hedge=True)
+    assert model.invoke([]) == "fast"
+    deadline = time.monotonic() + 1.0
+    while not primary.cancelled and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert primary.cancelled
+    time.sleep(0.05)
+    assert breaker.total_errors == 0
+
+
+if __name__ == "__main__":
+    test_circuit_breaker_opens_and_recovers()
+    test_failover_to_secondary()
+    test_client_error_is_not_failed_over()
+    test_open_circuit_fails_fast()
+    test_hedged_request()
+    test_losing_hedge_is_cancelled()
+    print("✅ Все тесты пула провайдеров пройдены")
@@ -0,0 +1,112 @@
+import os
+import sys
+import json
+import gzip
+import glob
+import time
+import tempfile
+import threading
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+os.environ["OPENAI_API_KEY"] = "test-key"
+# Журнал запросов и трассы не пишутся в каталог репозитория
+os.environ["QUERY_LOG"] = "off"
+os.environ["TRACE_EXPORTER"] = "none"
+
+from langchain_core.messages import AIMessage
+
+import app as app_module
+from backend.query_log import QueryLogSink, normalize_query, get_query_log
+from backend.metrics import stage, tool_call, record_tokens, record_cache
+
+
+def test_batched_rotation():
+    """Записи пишутся пачками, большой файл ротируется и сжимается, старые архивы удаляются"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "queries.jsonl")
+        sink = QueryLogSink(path, batch_size=10, flush_interval=0.05, max_bytes=500, backups=2)
+        for i in range(30):
+            assert sink.log({"query": f"запрос {i}", "padding": "x" * 50})
+            if i % 10 == 9:
+                sink.flush()
+        sink.close()
+        stats = sink.stats()
+        assert stats["written"] == 30 and stats["dropped"] == 0
+        assert stats["batches"] == 3 and stats["rotations"] == 3
+        archives = sorted(glob.glob(path + ".*.gz"))
+        assert len(archives) == 2
+        with gzip.open(archives[-1], "rt", encoding="utf-8") as f:
+            assert json.loads(f.readline())["query"] == "запрос 20"
+
+
+def test_full_buffer_drops_without_blocking():
+    """При заполненном буфере записи отбрасываются и считаются, log() не ждёт"""
+    with tempfile.TemporaryDirectory() as directory:
+        sink = QueryLogSink(os.path.join(directory, "queries.jsonl"), buffer_size=5, batch_size=1, flush_interval=0.01)
+        release = threading.Event()
+        write = sink._write
+        sink._write = lambda batch: (release.wait(5), write(batch))
+        sink.log({"query": "первый"})
+        time.sleep(0.1)
+
+        start = time.monotonic()
+        accepted = sum(sink.log({"query": f"запрос {i}"}) for i in range(20))
+        assert time.monotonic() - start < 0.1
+        assert accepted == 5
+        assert sink.stats()["dropped"] == 15
+
+        release.set()
+        sink.close()
+        assert sink.stats()["written"] == 6
+
+
+def test_request_is_logged():
+    """Обслуженный запрос попадает в журнал с режимом, временем этапов, инструментами, кэшами и токенами"""
+    def fake_run_search(query, mode, **kwargs):
+        with stage("agent_iteration"):
+            record_tokens(AIMessage(content="", usage_metadata={
+                "input_tokens": 100, "output_tokens": 20, "total_tokens": 120}))
+        with tool_call("tavily_search", query=query):
+            record_cache("tavily_stale", False)
+        time.sleep(0.2)
+        return {"response": "ok", "sources": []}
+
+    original = app_module.run_search
+    saved = os.environ.get("QUERY_LOG")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "queries.jsonl")
+        os.environ["QUERY_LOG"] = path
+        app_module.run_search = fake_run_search
+        try:
+            started = time.time()
+            app_module.app.test_client().post("/search/fast", json={"query": "  Какова  Столица Франции? "})
+            get_query_log().close()
+        finally:
+            app_module.run_search = original
+            if saved is None:
+                os.environ.pop("QUERY_LOG", None)
+            else:
+                os.environ["QUERY_LOG"] = saved
+        with open(path, encoding="utf-8") as f:
+            record = json.loads(f.readlines()[-1])
+
+    assert record["query"] == "какова столица франции?"
+    # Отметка времени - поступление запроса, а не его завершение
+    assert started <= record["timestamp"] < started + 0.1
+    assert record["mode"] == "fast" and record["status"] == 200
+    assert "agent" in record["stages_ms"] and "tools" in record["stages_ms"]
+    assert record["tool_calls"] == {"tavily_search": 1}
+    assert record["cache"] == {"tavily_stale.miss": 1}
+    assert record["tokens_in"] == 100 and record["tokens_out"] == 20
+    assert normalize_query(None) is None
+
+
+if __name__ == "__main__":
+    test_batched_rotation()
+    test_full_buffer_drops_without_blocking()
+    test_request_is_logged()
+    print("✅ Все тесты журнала запросов пройдены")
@@ -0,0 +1,130 @@
+import os
+import sys
+import time
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backend.ratelimit import KeyPool, RateLimitExceeded, TokenBucket, is_rate_limit_error, process_limits, mask_key
+from backend.metrics import UPSTREAM_KEY_REQUESTS, UPSTREAM_KEY_THROTTLED
+from backend.providers import KeyedChatModel
+
+
+class UsageLimitExceededError(Exception):
+    """Имитация ошибки 429 клиента Tavily"""
+
+
+def test_token_bucket():
+    """Токены расходуются и восполняются со скоростью rate"""
+    bucket = TokenBucket(rate=100, burst=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    time.sleep(0.02)
+    assert bucket.try_acquire()
+
+
+def test_round_robin_and_queueing():
+    """Ключи выбираются по кругу, при исчерпании лимита запрос коротко ждёт"""
+    pool = KeyPool("test", ["key-a", "key-b"], rate=20, burst=1, max_wait=1.0)
+    assert {pool.acquire(), pool.acquire()} == {"key-a", "key-b"}
+    start = time.monotonic()
+    pool.acquire()
+    assert 0.02 < time.monotonic() - start < 0.5
+    usage = pool.usage()
+    assert sum(stats["requests"] for stats in usage.values()) == 3
+    assert sum(stats["waits"] for stats in usage.values()) == 1
+
+
+def test_queue_deadline():
+    """Если ключ не освобождается за max_wait, вызов отклоняется"""
+    pool = KeyPool("test", ["key-a"], rate=0.5, burst=1, max_wait=0.05)
+    pool.acquire()
+    try:
+        pool.acquire()
+        assert False, "ожидалась RateLimitExceeded"
+    except RateLimitExceeded as e:
+        assert e.retry_after > 0
+
+
+def test_least_used_strategy():
+    """Стратегия least_used выбирает наименее загруженный ключ"""
+    pool = KeyPool("test", ["key-a", "key-b"], rate=100, burst=10, strategy="least_used")
+    keys = [pool.acquire() for _ in range(4)]
+    assert keys.count("key-a") == 2 and keys.count("key-b") == 2
+
+
+def test_throttled_key_is_skipped():
+    """После ответа 429 вызов повторяется с другим ключом"""
+    calls = []
+
+    class Model:
+        def __init__(self, key):
+            self.key = key
+
+        def invoke(self, messages, config=None, **kwargs):
+            calls.append(self.key)
+            if self.key == "key-a":
+                raise UsageLimitExceededError("429")
+            return "ok"
+
+    os.environ["LLMTEST_API_KEYS"] = "key-a,key-b"
+    try:
+        model = KeyedChatModel("llmtest", Model)
+        assert model.invoke([]) == "ok"
+        assert model.invoke([]) == "ok"
+    finally:
+        del os.environ["LLMTEST_API_KEYS"]
+    assert calls == ["key-a", "key-b", "key-b"]
+    assert is_rate_limit_error(UsageLimitExceededError())
+    assert sum(stats["throttled"] for stats in model.pool.usage().values()) == 1
+
+
+def test_quota_is_split_between_workers():
+    """Квота ключа делится между процессами, без RATE_LIMIT лимита нет"""
+    env = {"LIMITTEST_RATE_LIMIT": "10", "LIMITTEST_RATE_BURST": "5", "RATE_LIMIT_WORKERS": "4"}
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    try:
+        limits = process_limits("limittest")
+        assert limits == {"rate": 2.5, "burst": 2}
+        del os.environ["LIMITTEST_RATE_LIMIT"]
+        assert process_limits("limittest")["rate"] is None
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    pool = KeyPool("test", ["key-a"], rate=None, burst=1, max_wait=0.05)
+    assert all(pool.acquire() == "key-a" for _ in range(100))
+    pool.report_throttled("key-a", cooldown=1.0)
+    try:
+        pool.acquire()
+        assert False, "ожидалась RateLimitExceeded"
+    except RateLimitExceeded:
+        pass
+
+
+def test_key_usage_metrics():
+    """Вызовы и ответы 429 по ключам попадают в метрики"""
+    pool = KeyPool("metrictest", ["key-a"], rate=100, burst=10, export_metrics=True)
+    labels = {"upstream": "metrictest", "key": mask_key("key-a")}
+    before = UPSTREAM_KEY_REQUESTS.value(**labels)
+    pool.acquire()
+    pool.acquire()
+    pool.report_throttled("key-a", cooldown=0.01)
+    assert UPSTREAM_KEY_REQUESTS.value(**labels) == before + 2
+    assert UPSTREAM_KEY_THROTTLED.value(**labels) >= 1
+
+
+if __name__ == "__main__":
+    test_token_bucket()
+    test_round_robin_and_queueing()
+    test_queue_deadline()
+    test_least_used_strategy()
+    test_throttled_key_is_skipped()
+    test_quota_is_split_between_workers()
+    test_key_usage_metrics()
+    print("✅ Все тесты лимитов запросов пройдены")
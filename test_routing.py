@@ -1,41 +1,55 @@
 import os
 import sys
-from dotenv import load_dotenv
 
 # Add the current directory to the path so we can import backend modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Load environment variables
-load_dotenv()
-
-from backend.agent import WebAgent
-
-def test_routing():
-    """Test the routing functionality"""
-    print("Testing routing functionality...")
-    
-    # Create an agent
-    agent = WebAgent(model_type=os.getenv("MODEL_TYPE", "openai"))
-    
-    # Test queries for different modes
-    test_cases = [
-        ("Какова столица Франции?", "fast"),
-        ("Проанализируйте влияние искусственного интеллекта на мировую экономику", "deep"),
-        ("Какие новости в сообществе разработчиков Python на Reddit?", "social"),
-        ("Найдите последние исследования по трансформерам в области NLP", "academic"),
-        ("Какова текущая цена акций Apple?", "finance")
-    ]
-    
-    for query, expected_mode in test_cases:
-        print(f"\nQuery: {query}")
-        print(f"Expected mode: {expected_mode}")
-        
-        try:
-            selected_mode = agent.route_query(query)
-            print(f"Selected mode: {selected_mode}")
-            print(f"Result: {'✓ PASS' if selected_mode == expected_mode else '✗ FAIL'}")
-        except Exception as e:
-            print(f"Error: {str(e)}")
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+os.environ["OPENAI_API_KEY"] = "test-key"
+
+from benchmarks.routing import ROUTED_MODES, load_dataset, load_router, evaluate, misroute_cost, latency_weights
+
+# Нижняя граница точности маршрутизатора агента на размеченном наборе
+MIN_ACCURACY = 0.8
+
+
+def test_dataset():
+    """Набор размечен всеми режимами на русском и английском"""
+    dataset = load_dataset()
+    assert {row["mode"] for row in dataset} == set(ROUTED_MODES)
+    assert {row["lang"] for row in dataset} == {"ru", "en"}
+    assert len({row["query"] for row in dataset}) == len(dataset)
+
+
+def test_agent_router():
+    """Маршрутизатор агента не хуже MIN_ACCURACY; матрица ошибок покрывает весь набор"""
+    dataset = load_dataset()
+    report = evaluate(load_router("agent"), dataset, repeat=5)
+    print(f"accuracy={report['accuracy']} qps={report['queries_per_second']} cost={report['cost_per_query_s']} с")
+    assert report["accuracy"] >= MIN_ACCURACY, report["misroutes"]
+    assert sum(sum(line.values()) for line in report["confusion"].values()) == len(dataset)
+    assert report["queries_per_second"] > 0
+    assert len(report["misroutes"]) == len(dataset) - round(report["accuracy"] * len(dataset))
+
+
+def test_misroute_cost():
+    """Лишний deep стоит разницы длительностей, неподходящий режим - всего напрасного ответа"""
+    weights = latency_weights()
+    assert misroute_cost("fast", "fast", weights) == 0
+    assert misroute_cost("fast", "deep", weights) == weights["deep"] - weights["fast"]
+    assert misroute_cost("deep", "fast", weights) == weights["fast"]
+
+    # Маршрутизатор "всё в deep" точен только на deep и дорог на простых вопросах
+    dataset = load_dataset()
+    report = evaluate(lambda query: "deep", dataset, weights, repeat=1)
+    assert report["per_mode"]["deep"]["recall"] == 1.0
+    assert report["per_mode"]["fast"]["recall"] == 0.0
+    assert report["cost_per_query_s"] > evaluate(load_router("agent"), dataset, weights, repeat=1)["cost_per_query_s"]
+
 
 if __name__ == "__main__":
-    test_routing()
\ No newline at end of file
+    test_dataset()
+    test_agent_router()
+    test_misroute_cost()
+    print("✅ Все тесты маршрутизации пройдены")
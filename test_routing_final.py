@@ -1,100 +0,0 @@
-def route_query(query: str) -> str:
-    """
-    Rule-based query routing function (simplified version of the one in agent.py)
-    
-    Args:
-        query: User query
-        
-    Returns:
-        Recommended search mode ("fast", "deep", "social", "academic", "finance")
-    """
-    # Нормализуем запрос для сравнения
-    query_lower = query.lower()
-    
-    # 1. Проверяем социальные сети
-    social_keywords = [
-        "reddit", "twitter", "x.com", "vk.com", "habr", "сообщество", 
-        "пользователи", "посты", "тренды", "обсуждения", "мнения", 
-        "новости сообщества", "социальная сеть"
-    ]
-    if any(keyword in query_lower for keyword in social_keywords):
-        return "social"
-    
-    # 2. Проверяем академические термины
-    academic_keywords = [
-        "исследование", "научный", "публикация", "статья", "академический", 
-        "теория", "arxiv", "semantic scholar", "научная работа", "диссертация",
-        "рецензируемый", "журнал", "nlp", "трансформер", "нейронная сеть"
-    ]
-    if any(keyword in query_lower for keyword in academic_keywords):
-        return "academic"
-    
-    # 3. Проверяем финансовые термины
-    finance_keywords = [
-        "акции", "цена", "финансовый", "биржа", "инвестиции", "экономика", 
-        "доход", "yahoo finance", "bloomberg", "reuters", "трейдинг", 
-        "портфель", "дивиденды", "курс", "валюта", "криптовалют"
-    ]
-    if any(keyword in query_lower for keyword in finance_keywords):
-        return "finance"
-    
-    # 4. Проверяем сложные запросы (deep)
-    deep_keywords = [
-        "анализировать", "исследовать", "оценить", "изучить", "влияние",
-        "сравнить", "разобрать", "объяснить", "проанализировать", "влияние",
-        "многошаговый", "подробный", "комплексный", "всесторонний", "сравните",
-        "объясните", "разберите", "оцените", "исследуйте", "проанализируйте",
-        "влияние", "эффективность", "эффективен", "влияет", "зависимость"
-    ]
-    if any(keyword in query_lower for keyword in deep_keywords):
-        return "deep"
-    
-    # 5. По умолчанию - быстрый поиск
-    return "fast"
-
-def test_routing():
-    """Test the rule-based routing functionality"""
-    print("Testing rule-based routing functionality...")
-    print("=" * 50)
-    
-    # Test queries for different modes
-    test_cases = [
-        ("Какова столица Франции?", "fast"),
-        ("Расскажи мне о фотосинтезе", "fast"),
-        ("Что такое 15% от 200?", "fast"),
-        ("Проанализируйте влияние искусственного интеллекта на мировую экономику", "deep"),
-        ("Сравните различные подходы к машинному обучению", "deep"),
-        ("Объясните теорию относительности простыми словами", "deep"),
-        ("Какие новости в сообществе разработчиков Python на Reddit?", "social"),
-        ("Что обсуждают пользователи VK по поводу новой игры?", "social"),
-        ("Тренды в_twitter_ по теме климата", "social"),
-        ("Найдите последние исследования по трансформерам в области NLP", "academic"),
-        ("Опубликована_ли научная работа о квантовых вычислениях в этом году?", "academic"),
-        ("Актуальные публикации в arxiv по компьютерному зрению", "academic"),
-        ("Какова текущая цена акций Apple?", "finance"),
-        ("Инвестиции в криптовалюту - выгодно ли это сейчас?", "finance"),
-        ("Курс доллара к рублю сегодня", "finance")
-    ]
-    
-    passed = 0
-    total = len(test_cases)
-    
-    for query, expected_mode in test_cases:
-        selected_mode = route_query(query)
-        result = "✓ PASS" if selected_mode == expected_mode else "✗ FAIL"
-        print(f"  {query[:50]:<50} -> {selected_mode:<8} (expected: {expected_mode:<8}) {result}")
-        if selected_mode == expected_mode:
-            passed += 1
-    
-    print(f"\n=== SUMMARY ===")
-    print(f"Passed: {passed}/{total}")
-    print(f"Success rate: {passed/total*100:.1f}%")
-    
-    return passed == total
-
-if __name__ == "__main__":
-    success = test_routing()
-    if success:
-        print("\n🎉 All tests passed! The routing logic is working correctly.")
-    else:
-        print("\n❌ Some tests failed. The routing logic needs improvement.")
\ No newline at end of file
@@ -0,0 +1,84 @@
+import os
+import sys
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backend.search_policy import adaptive_search, assess_results
+
+
+class FakeTavilyClient:
+    """Возвращает заранее заданные ответы по очереди и запоминает параметры вызовов"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def search(self, query, **params):
+        self.calls.append(params)
+        return dict(self.responses.pop(0))
+
+
+STRONG = {"results": [
+    {"title": "Столица Франции — Париж", "url": "https://a.example/1", "content": "Париж", "score": 0.9},
+    {"title": "Франция", "url": "https://b.example/2", "content": "столица Париж", "score": 0.7},
+]}
+WEAK = {"results": [
+    {"title": "Something else", "url": "https://a.example/1", "content": "...", "score": 0.2},
+]}
+
+
+def test_assess_results():
+    """Оценка достаточности учитывает score и покрытие терминов запроса"""
+    assert assess_results("столица Франции", STRONG["results"])["sufficient"]
+    assert not assess_results("столица Франции", WEAK["results"])["sufficient"]
+    assert not assess_results("столица Франции", [])["sufficient"]
+
+
+def test_cheap_tier_is_enough():
+    """Достаточный дешёвый уровень не эскалируется"""
+    client = FakeTavilyClient([STRONG])
+    result = adaptive_search(client, "столица Франции", mode="fast")
+    assert len(client.calls) == 1
+    assert client.calls[0]["search_depth"] == "basic"
+    assert result["escalation"]["tier"] == 0
+
+
+def test_escalation_for_deep():
+    """Для deep при слабых результатах запрашиваются raw_content и advanced"""
+    client = FakeTavilyClient([WEAK, WEAK, STRONG])
+    result = adaptive_search(client, "столица Франции", mode="deep")
+    assert len(client.calls) == 3
+    assert client.calls[1]["include_raw_content"] is True
+    assert client.calls[2]["search_depth"] == "advanced"
+    assert result["escalation"]["tier"] == 2
+
+
+def test_deep_needs_raw_content():
+    """deep сразу запрашивает полный текст; результаты без raw_content эскалируются"""
+    with_raw = {"results": [dict(r, raw_content="Париж - столица Франции") for r in STRONG["results"]]}
+    client = FakeTavilyClient([with_raw])
+    result = adaptive_search(client, "столица Франции", mode="deep")
+    assert client.calls[0]["include_raw_content"] is True
+    assert result["escalation"]["tier"] == 0
+
+    client = FakeTavilyClient([STRONG, with_raw])
+    result = adaptive_search(client, "столица Франции", mode="deep")
+    assert len(client.calls) == 2
+    assert result["escalation"]["raw_content"] is True
+
+
+def test_mode_params_are_kept():
+    """Предметные параметры режима передаются на каждом уровне"""
+    client = FakeTavilyClient([WEAK, WEAK])
+    adaptive_search(client, "курс биткоина", mode="finance")
+    assert all(call["topic"] == "finance" for call in client.calls)
+
+
+if __name__ == "__main__":
+    test_assess_results()
+    test_cheap_tier_is_enough()
+    test_escalation_for_deep()
+    test_deep_needs_raw_content()
+    test_mode_params_are_kept()
+    print("✅ Все тесты политики поиска пройдены")
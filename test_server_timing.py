@@ -0,0 +1,78 @@
+import os
+import sys
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+os.environ["OPENAI_API_KEY"] = "test-key"
+# Журнал запросов и трассы не пишутся в каталог репозитория
+os.environ["QUERY_LOG"] = "off"
+os.environ["TRACE_EXPORTER"] = "none"
+
+import httpx
+from langchain_core.messages import AIMessage
+
+import app as app_module
+from backend.accounting import begin_account, end_account, current_account
+from backend.http_pool import _traced_transport
+from backend.metrics import stage, tool_call, record_tokens
+
+
+def fake_run_search(query, mode, **kwargs):
+    """Поиск, проходящий этапы агента, инструментов и источников"""
+    with stage("agent_iteration"):
+        record_tokens(AIMessage(content="", usage_metadata={
+            "input_tokens": 120, "output_tokens": 30, "total_tokens": 150}))
+    with tool_call("tavily_search", query=query):
+        pass
+    with stage("sources"):
+        pass
+    return {"response": "ok", "sources": []}
+
+
+def test_server_timing_header():
+    """Ответ поиска содержит Server-Timing с этапами и счётчиками, timings - только по запросу"""
+    original = app_module.run_search
+    app_module.run_search = fake_run_search
+    try:
+        client = app_module.app.test_client()
+        response = client.post("/search/fast", json={"query": "вопрос"})
+        header = response.headers["Server-Timing"]
+        for entry in ("agent;dur=", "tools;dur=", "sources;dur=", "serialize;dur=", "total;dur="):
+            assert entry in header, header
+        assert 'llm_calls;desc="1"' in header
+        assert 'tokens_in;desc="120"' in header
+        assert 'tokens_out;desc="30"' in header
+        assert "timings" not in response.get_json()
+
+        body = client.post("/search/fast?timings=1", json={"query": "вопрос"}).get_json()
+        assert body["timings"]["llm_calls"] == 1
+        assert set(body["timings"]["stages_ms"]) >= {"agent", "tools", "sources", "serialize"}
+        body = client.post("/search/fast", json={"query": "вопрос", "timings": True}).get_json()
+        assert "timings" in body
+
+        # Служебные эндпоинты не учитываются
+        assert "Server-Timing" not in client.get("/stats").headers
+    finally:
+        app_module.run_search = original
+
+
+def test_bytes_fetched():
+    """Байты тела ответов апстрима учитываются в запросе"""
+    payload = b'{"results": []}' * 10
+    upstream = httpx.MockTransport(lambda request: httpx.Response(200, stream=httpx.ByteStream(payload)))
+    client = httpx.Client(transport=_traced_transport("test", upstream))
+    token = begin_account()
+    try:
+        client.get("http://upstream.test/search")
+        assert current_account().timings()["bytes_fetched"] == len(payload)
+    finally:
+        end_account(token)
+
+
+if __name__ == "__main__":
+    test_server_timing_header()
+    test_bytes_fetched()
+    print("✅ Все тесты Server-Timing пройдены")
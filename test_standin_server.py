@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import urllib.request
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.messages import HumanMessage, ToolMessage
+# Из подмодуля: тесты маршрутизации подменяют langchain_openai.ChatOpenAI при импорте
+from langchain_openai.chat_models.base import ChatOpenAI
+from tavily.errors import UsageLimitExceededError
+
+from backend.tavily_client import PooledTavilyClient
+from benchmarks.standins import TavilyScenario, ChatScenario
+from benchmarks.standin_server import StandInServer, Faults
+
+
+def test_tavily_endpoints():
+    """Поиск, extract и crawl отвечают результатами заданного размера"""
+    with StandInServer(tavily=TavilyScenario("0", content_bytes=50, raw_content_bytes=2000)) as server:
+        client = PooledTavilyClient(api_key="test-key", base_url=server.env()["TAVILY_BASE_URL"])
+        result = client.search("вопрос", max_results=3, include_raw_content=True)
+        assert len(result["results"]) == 3
+        assert "вопрос" in result["results"][0]["content"]
+        assert len(result["results"][0]["raw_content"]) == 2000
+        assert client.extract(["https://a.example"])["results"][0]["url"] == "https://a.example"
+        assert len(client.crawl("https://a.example")["results"]) == 5
+
+
+def test_chat_completions_scripted_tool_calls():
+    """OpenAI-совместимый эндпоинт выполняет сценарий вызовов инструментов, затем отвечает"""
+    script = [{"name": "tavily_search", "args": {"query": "{query}"}},
+              {"name": "tavily_extract", "args": {"urls": ["https://a.example"]}}]
+    with StandInServer(chat=ChatScenario("0", answer_tokens=10, script=script)) as server:
+        model = ChatOpenAI(model="stand-in", api_key="test-key", base_url=server.env()["OPENAI_BASE_URL"])
+        tools = [{"type": "function", "function": {"name": name, "description": name, "parameters": {"type": "object"}}}
+                 for name in ("tavily_search", "tavily_extract")]
+        bound = model.bind_tools(tools)
+
+        messages = [HumanMessage(content="вопрос")]
+        first = bound.invoke(messages)
+        assert first.tool_calls[0]["name"] == "tavily_search"
+        assert first.tool_calls[0]["args"] == {"query": "вопрос"}
+        messages += [first, ToolMessage(content="[]", tool_call_id=first.tool_calls[0]["id"])]
+        second = bound.invoke(messages)
+        assert second.tool_calls[0]["name"] == "tavily_extract"
+        messages += [second, ToolMessage(content="[]", tool_call_id=second.tool_calls[0]["id"])]
+        final = bound.invoke(messages)
+        assert final.content and not final.tool_calls
+        assert final.usage_metadata["output_tokens"] == 10
+
+
+def test_injected_faults():
+    """Лимит запросов отвечает 429 (UsageLimitExceeded у Tavily), ошибки - заданным статусом"""
+    with StandInServer(tavily_faults=Faults(rate_limit=1), chat_faults=Faults(error_rate=1.0, error_status=500)) as server:
+        client = PooledTavilyClient(api_key="test-key", base_url=server.env()["TAVILY_BASE_URL"])
+        statuses = []
+        for _ in range(5):
+            try:
+                client.search("вопрос")
+                statuses.append(200)
+            except UsageLimitExceededError:
+                statuses.append(429)
+        assert 429 in statuses
+
+        request = urllib.request.Request(server.env()["OPENAI_BASE_URL"] + "/chat/completions",
+                                         data=json.dumps({"messages": []}).encode(), method="POST")
+        try:
+            urllib.request.urlopen(request)
+            assert False, "ожидалась ошибка"
+        except urllib.error.HTTPError as e:
+            assert e.code == 500
+            assert json.loads(e.read())["error"]["code"] == 500
+
+
+if __name__ == "__main__":
+    test_tavily_endpoints()
+    test_chat_completions_scripted_tool_calls()
+    test_injected_faults()
+    print("✅ Все тесты заменителя апстримов пройдены")
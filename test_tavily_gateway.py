@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+# Каждый вызов шлюза уходит в клиент теста: без кэша свежих ответов и общего кэша на диске
+os.environ["TAVILY_CACHE_TTL"] = "0"
+os.environ["CACHE_DISK_PATH"] = "off"
+
+from tavily.errors import BadRequestError
+
+from backend.tavily_gateway import TavilyGateway
+from backend.tavily_tools import GatewaySearchAPIWrapper
+from backend.resilience import CircuitOpenError
+import backend.tavily_gateway as tavily_gateway
+
+
+class FlakyTavilyClient:
+    """Клиент Tavily, который отвечает успешно, пока его не "уронят" """
+
+    def __init__(self):
+        self.down = False
+        self.calls = 0
+
+    def search(self, query, **params):
+        self.calls += 1
+        if query == "bad":
+            raise BadRequestError("некорректный запрос")
+        if self.down:
+            raise ConnectionError("Tavily недоступен")
+        return {"query": query, "results": [{"title": "t", "url": "https://a.example", "score": 0.9}]}
+
+
+def test_serve_stale_on_error():
+    """При ошибке Tavily отдаётся последний сохранённый ответ с пометкой stale"""
+    client = FlakyTavilyClient()
+    gateway = TavilyGateway(client=client)
+    fresh = gateway.search("погода", max_results=3)
+    assert "stale" not in fresh
+
+    client.down = True
+    stale = gateway.search("погода", max_results=3)
+    assert stale["stale"] is True
+    assert stale["stale_age"] >= 0
+    assert stale["results"] == fresh["results"]
+
+    # Для другого запроса сохранённого ответа нет - ошибка пробрасывается
+    try:
+        gateway.search("другой запрос")
+        assert False, "ожидалась ошибка"
+    except ConnectionError:
+        pass
+
+
+def test_breaker_fails_fast():
+    """После серии ошибок вызовы не уходят в Tavily, пока предохранитель разомкнут"""
+    client = FlakyTavilyClient()
+    gateway = TavilyGateway(client=client)
+    gateway.search("кэшированный")
+    client.down = True
+    for _ in range(gateway.breaker.min_calls):
+        try:
+            gateway.search("новый запрос")
+        except (ConnectionError, CircuitOpenError):
+            pass
+    assert gateway.breaker.state == "open"
+
+    calls = client.calls
+    try:
+        gateway.search("новый запрос")
+        assert False, "ожидалась CircuitOpenError"
+    except CircuitOpenError:
+        pass
+    assert gateway.search("кэшированный")["stale"] is True
+    assert client.calls == calls
+
+
+def test_bad_request_probe_is_neutral():
+    """Ошибка запроса в пробном вызове не замыкает предохранитель: пробным становится следующий"""
+    client = FlakyTavilyClient()
+    gateway = TavilyGateway(client=client)
+    gateway.breaker.open_seconds = 0.05
+    client.down = True
+    for _ in range(gateway.breaker.min_calls):
+        try:
+            gateway.search("новый запрос")
+        except (ConnectionError, CircuitOpenError):
+            pass
+    assert gateway.breaker.state == "open"
+    time.sleep(0.06)
+
+    try:
+        gateway.search("bad")
+        assert False, "ожидалась BadRequestError"
+    except BadRequestError:
+        pass
+    assert gateway.breaker.state == "half_open"
+
+    # Следующий вызов - пробный: апстрим всё ещё недоступен, предохранитель снова размыкается
+    try:
+        gateway.search("ещё запрос")
+    except ConnectionError:
+        pass
+    assert gateway.breaker.state == "open"
+
+
+def test_agent_tools_use_gateway():
+    """Инструменты агента ходят в Tavily через общий шлюз"""
+    client = FlakyTavilyClient()
+    tavily_gateway._gateway = TavilyGateway(client=client)
+    try:
+        result = GatewaySearchAPIWrapper().raw_results(query="новости", max_results=None, topic="news")
+    finally:
+        tavily_gateway._gateway = None
+    assert result["query"] == "новости"
+    assert client.calls == 1
+
+
+if __name__ == "__main__":
+    test_serve_stale_on_error()
+    test_breaker_fails_fast()
+    test_bad_request_probe_is_neutral()
+    test_agent_tools_use_gateway()
+    print("✅ Все тесты шлюза Tavily пройдены")
@@ -0,0 +1,146 @@
+import os
+import sys
+import glob
+import gzip
+import json
+import tempfile
+from unittest import mock
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+os.environ["OPENAI_API_KEY"] = "test-key"
+# Журнал запросов и трассы не пишутся в каталог репозитория
+os.environ["QUERY_LOG"] = "off"
+os.environ["TRACE_EXPORTER"] = "none"
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.tools import tool
+
+from backend.agent import WebAgent
+from backend.metrics import search_metrics, tool_call
+from backend.tracing import SpanExporter, JsonlFileExporter, set_exporter, start_trace, span
+
+RESULTS = {"results": [
+    {"title": "Столица Франции — Париж", "url": "https://a.example/1", "content": "Париж", "score": 0.9},
+    {"title": "Франция", "url": "https://b.example/2", "content": "столица Париж", "score": 0.8},
+]}
+
+
+class MemoryExporter(SpanExporter):
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+@tool
+def tavily_search(query: str) -> str:
+    """Поиск в интернете"""
+    with tool_call("tavily_search", query=query):
+        return json.dumps(RESULTS, ensure_ascii=False)
+
+
+class ScriptedModel:
+    """Один раунд поиска, затем ответ"""
+
+    def bind_tools(self, tools):
+        return self
+
+    def invoke(self, messages):
+        usage = {"input_tokens": 100, "output_tokens": 5, "total_tokens": 105}
+        if any(getattr(m, "type", "") == "tool" for m in messages):
+            return AIMessage(content="Париж", usage_metadata=usage)
+        return AIMessage(content="", usage_metadata=usage, tool_calls=[{
+            "name": "tavily_search", "args": {"query": "столица Франции"}, "id": "call_1"
+        }])
+
+
+def test_graph_spans():
+    """Узлы графа, итерации модели и вызовы инструментов (с аргументами) попадают в одну трассу"""
+    exporter = MemoryExporter()
+    set_exporter(exporter)
+    try:
+        agent = WebAgent(model_type="openai")
+        agent.get_model = lambda mode, step: ScriptedModel()
+        app = agent._build_tool_graph([tavily_search], "fast").compile()
+        with start_trace("test", trace_id="trace-graph-1"):
+            with search_metrics("fast", "test-model"):
+                app.invoke({"messages": [SystemMessage(content="system"), HumanMessage(content="столица Франции")]})
+    finally:
+        set_exporter(None)
+
+    by_name = {}
+    for s in exporter.spans:
+        by_name.setdefault(s["name"], []).append(s)
+    assert all(s["trace_id"] == "trace-graph-1" for s in exporter.spans)
+    assert {"test", "search", "node:agent", "node:tools", "node:evidence", "agent_iteration", "tool:tavily_search"} <= set(by_name)
+
+    tool_span = by_name["tool:tavily_search"][0]
+    assert tool_span["attributes"]["query"] == "столица Франции"
+    # Вызов инструмента вложен в узел tools, хотя выполняется в потоке ToolNode
+    tools_node_ids = {s["span_id"] for s in by_name["node:tools"]}
+    assert tool_span["parent_id"] in tools_node_ids
+    assert by_name["agent_iteration"][0]["attributes"]["input_tokens"] == 100
+
+
+def test_jsonl_rotation():
+    """Спаны пишутся фоновым потоком, файл ротируется по размеру, число архивов ограничено"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "traces.jsonl")
+        exporter = JsonlFileExporter(path, max_bytes=300, backups=2)
+        for i in range(10):
+            exporter.export([{"trace_id": f"t{i}", "name": "x" * 100}])
+            assert exporter.flush()
+        assert os.path.exists(path)
+        assert len(glob.glob(path + ".*.gz")) == 2
+        assert exporter.stats()["written"] == 10
+        with gzip.open(sorted(glob.glob(path + ".*.gz"))[-1], "rt", encoding="utf-8") as f:
+            assert json.loads(f.readlines()[-1])["trace_id"] == "t8"
+        with open(path, encoding="utf-8") as f:
+            assert json.loads(f.readlines()[-1])["trace_id"] == "t9"
+
+
+def test_trace_header_and_debug():
+    """Идентификатор трассы возвращается в заголовке, ?debug=trace при TRACE_DEBUG добавляет дерево спанов"""
+    import app as app_module
+    app = app_module.app
+
+    exporter = MemoryExporter()
+    set_exporter(exporter)
+    try:
+        client = app.test_client()
+        response = client.get("/stats", headers={"X-Trace-Id": "client-trace-42"})
+        assert response.headers["X-Trace-Id"] == "client-trace-42"
+        assert "trace" not in response.get_json()
+
+        # По умолчанию дерево спанов клиенту не отдаётся
+        assert "trace" not in client.get("/stats?debug=trace").get_json()
+
+        with mock.patch.object(app_module, "TRACE_DEBUG_ENABLED", True):
+            response = client.get("/stats?debug=trace")
+        body = response.get_json()
+        assert body["trace"]["trace_id"] == response.headers["X-Trace-Id"]
+        assert body["trace"]["spans"][0]["name"] == "GET /stats"
+
+        assert "X-Trace-Id" not in client.get("/health").headers
+    finally:
+        set_exporter(None)
+    assert {s["trace_id"] for s in exporter.spans} >= {"client-trace-42"}
+
+
+def test_span_outside_trace():
+    """Вне трассы спаны ничего не записывают"""
+    with span("orphan") as current:
+        assert current is None
+
+
+if __name__ == "__main__":
+    test_graph_spans()
+    test_jsonl_rotation()
+    test_trace_header_and_debug()
+    test_span_outside_trace()
+    print("✅ Все тесты трассировки пройдены")
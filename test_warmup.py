@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import runpy
+import subprocess
+
+# Add the current directory to the path so we can import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set dummy API keys for testing
+os.environ["TAVILY_API_KEY"] = "test-key"
+os.environ["OPENAI_API_KEY"] = "test-key"
+
+from backend.agent import WebAgent, get_agent, AGENT_MODES
+from backend.warmup import preload, start_background_warmup, warmup_state
+from backend.startup import parse_importtime
+
+
+def test_graphs_compiled_once():
+    """Граф режима компилируется один раз и переиспользуется"""
+    agent = WebAgent(model_type="openai")
+    graph, prompt = agent.compiled_graph("deep")
+    assert agent.compiled_graph("deep")[0] is graph
+    # Неизвестный режим обслуживается графом fast
+    assert agent.compiled_graph("unknown") is agent.compiled_graph("fast")
+
+
+def test_preload_shared_agent():
+    """preload компилирует графы всех режимов общего агента без обращений к сети"""
+    timings = preload("openai")
+    agent = get_agent("openai")
+    assert get_agent("openai") is agent
+    assert set(agent._graphs) == set(AGENT_MODES)
+    assert all(f"graph:{mode}" in timings for mode in AGENT_MODES)
+
+
+def test_gunicorn_config_from_env():
+    """Число воркеров, потоков и таймаут берутся из окружения"""
+    saved = dict(os.environ)
+    os.environ["WEB_CONCURRENCY"] = "3"
+    os.environ["GUNICORN_TIMEOUT"] = "60"
+    try:
+        config = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py"))
+        # Несколько воркеров делят задания через SQLite
+        assert os.environ["JOB_STORE"] == "sqlite"
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+    assert config["workers"] == 3
+    assert config["timeout"] == 60
+    assert config["preload_app"] is True
+    assert config["worker_class"] == "gthread"
+
+
+def test_provider_sdks_not_imported_at_startup():
+    """Импорт приложения не загружает SDK провайдеров и модули инструментов"""
+    code = ("import sys, json, app; print(json.dumps([m for m in "
+            "('langchain_openai', 'langchain_anthropic', 'langchain_tavily', 'tavily') if m in sys.modules]))")
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert completed.returncode == 0, completed.stderr
+    assert json.loads(completed.stdout.strip().splitlines()[-1]) == []
+
+
+def test_background_warmup_state():
+    """Фоновый прогрев завершается состоянием done с временем этапов"""
+    start_background_warmup("openai").join(timeout=30)
+    state = warmup_state()
+    assert state["status"] == "done"
+    assert "graph:deep" in state["timings"] and "total" in state["timings"]
+
+
+def test_parse_importtime():
+    """Разбор вывода python -X importtime"""
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   backend.cache\n"
+        "import time:      2500 |      40000 | app\n"
+    )
+    modules = parse_importtime(output)
+    assert modules == [
+        {"module": "backend.cache", "self": 0.00012, "cumulative": 0.00012},
+        {"module": "app", "self": 0.0025, "cumulative": 0.04}
+    ]
+
+
+if __name__ == "__main__":
+    test_graphs_compiled_once()
+    test_preload_shared_agent()
+    test_gunicorn_config_from_env()
+    test_provider_sdks_not_imported_at_startup()
+    test_background_warmup_state()
+    test_parse_importtime()
+    print("✅ Все тесты предзагрузки пройдены")
@@ -0,0 +1,16 @@
+"""
+Точка входа WSGI для продакшен-сервера
+
+Запуск: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app import app
+from backend.warmup import warmup_mode, warm_up
+
+# При preload_app модуль импортируется в мастер-процессе один раз: в режиме
+# прогрева sync SDK провайдеров и скомпилированные графы режимов загружаются
+# до fork и наследуются воркерами; в режиме background воркеры прогреваются
+# сами после запуска (см. gunicorn.conf.py)
+if warmup_mode() == "sync":
+    warm_up()
+
+__all__ = ['app']